@@ -0,0 +1,144 @@
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List
+
+from common.metrics import track_callback
+from common.rabbit import RabbitMQClient
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadSafeChannel:
+    """
+    Channel proxy handed to callbacks that run on worker threads.
+
+    pika's BlockingConnection is not thread-safe, so acks, nacks and rejects are
+    scheduled onto the connection thread with add_callback_threadsafe. Any other
+    attribute is forwarded to the underlying channel.
+    """
+
+    def __init__(self, connection, channel):
+        self._connection = connection
+        self._channel = channel
+
+    def _schedule(self, method, **kwargs):
+        def run():
+            if self._channel.is_open:
+                method(**kwargs)
+            else:
+                logger.warning(f"Channel closed before {method.__name__}; the message will be redelivered.")
+        try:
+            self._connection.add_callback_threadsafe(run)
+        except Exception as e:
+            logger.warning(f"Could not schedule {method.__name__} on the connection thread: {e}")
+
+    def basic_ack(self, delivery_tag=0, multiple=False):
+        self._schedule(self._channel.basic_ack, delivery_tag=delivery_tag, multiple=multiple)
+
+    def basic_nack(self, delivery_tag=0, multiple=False, requeue=True):
+        self._schedule(self._channel.basic_nack, delivery_tag=delivery_tag, multiple=multiple, requeue=requeue)
+
+    def basic_reject(self, delivery_tag=0, requeue=True):
+        self._schedule(self._channel.basic_reject, delivery_tag=delivery_tag, requeue=requeue)
+
+    def __getattr__(self, name):
+        return getattr(self._channel, name)
+
+
+class _QueueSpec:
+    def __init__(self, queue_name: str, callback: Callable, prefetch_count: int, workers: int):
+        self.queue_name = queue_name
+        self.callback = callback
+        self.prefetch_count = prefetch_count
+        self.workers = workers
+
+
+class ConsumerRuntime:
+    """
+    Consumes several queues over one connection and runs callbacks on thread pools.
+
+    Every queue gets its own channel (so prefetch is applied per queue) and its
+    own pool of `workers` threads. Callbacks keep the usual pika signature
+    (ch, method, properties, body); `ch` is a ThreadSafeChannel, so existing
+    callbacks that call ch.basic_ack / ch.basic_nack work unchanged. A lost
+    connection is re-established and consumption resumes; unacked messages are
+    redelivered by the broker, so deliveries still queued on a pool when the
+    connection drops are cancelled instead of being processed a second time.
+    """
+
+    def __init__(self, reconnect_delay: float = 5):
+        self.reconnect_delay = reconnect_delay
+        self._queues: List[_QueueSpec] = []
+
+    def add_queue(self, queue_name: str, callback: Callable, prefetch_count: int = 1, workers: int = 1):
+        self._queues.append(_QueueSpec(queue_name, callback, max(prefetch_count, workers), workers))
+        return self
+
+    def run(self):
+        """Blocks forever, consuming all registered queues."""
+        while True:
+            try:
+                self._run_once()
+            except KeyboardInterrupt:
+                logger.info("Consumer runtime stopped.")
+                return
+            except Exception as e:
+                logger.error(f"Consumer runtime lost its RabbitMQ connection. Reconnecting in {self.reconnect_delay} seconds... Error: {e}")
+                time.sleep(self.reconnect_delay)
+
+    def _run_once(self):
+        client = RabbitMQClient()
+        client._connect()
+        connection = client.connection
+        executors = []
+        # Set once the connection is going away; later deliveries are left to the broker to redeliver
+        closing = threading.Event()
+        try:
+            for spec in self._queues:
+                channel = connection.channel()
+                channel.queue_declare(queue=spec.queue_name, durable=True)
+                channel.basic_qos(prefetch_count=spec.prefetch_count)
+                executor = ThreadPoolExecutor(max_workers=spec.workers, thread_name_prefix=f"consumer-{spec.queue_name}")
+                executors.append(executor)
+                proxy = ThreadSafeChannel(connection, channel)
+                channel.basic_consume(
+                    queue=spec.queue_name,
+                    on_message_callback=functools.partial(self._on_message, spec, executor, proxy, closing),
+                )
+                logger.info(
+                    f"Waiting for messages in queue '{spec.queue_name}' "
+                    f"(prefetch={spec.prefetch_count}, workers={spec.workers})."
+                )
+            while connection.is_open:
+                connection.process_data_events(time_limit=1)
+        finally:
+            closing.set()
+            for executor in executors:
+                # Callbacks already running finish; queued ones are dropped (requires Python 3.9+)
+                executor.shutdown(wait=False, cancel_futures=True)
+            try:
+                client.close()
+            except Exception:
+                pass
+
+    def _on_message(self, spec: _QueueSpec, executor: ThreadPoolExecutor, proxy: ThreadSafeChannel,
+                    closing: threading.Event, ch, method, properties, body):
+        if closing.is_set() or not ch.is_open or not ch.connection.is_open:
+            logger.info(f"Connection is closing; leaving delivery {method.delivery_tag} on '{spec.queue_name}' for redelivery.")
+            return
+        executor.submit(self._dispatch, spec, proxy, closing, method, properties, body)
+
+    @staticmethod
+    def _dispatch(spec: _QueueSpec, proxy: ThreadSafeChannel, closing: threading.Event, method, properties, body):
+        if closing.is_set():
+            # Picked up after the connection dropped; the broker redelivers it on the new connection
+            return
+        try:
+            with track_callback(spec.queue_name):
+                spec.callback(proxy, method, properties, body)
+        except Exception as e:
+            logger.error(f"Unhandled error in callback for queue '{spec.queue_name}': {e}", exc_info=True)
+            proxy.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
@@ -1,7 +1,9 @@
 # FILE: ./common/database.py
 import os
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from dotenv import load_dotenv
 
@@ -14,10 +16,30 @@ DB_PORT = os.getenv("DB_PORT", 3306)
 DB_NAME = os.getenv("MYSQL_DATABASE")
 
 SQLALCHEMY_DATABASE_URL = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+ASYNC_SQLALCHEMY_DATABASE_URL = f"mysql+aiomysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
-# pool_pre_ping=True برای جلوگیری از خطای "MySQL server has gone away"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, pool_pre_ping=True)
+# تنظیمات Pool اتصال؛ برای هر دو engine همگام و ناهمگام استفاده می‌شود
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
+POOL_OPTIONS = dict(
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    # pool_pre_ping=True برای جلوگیری از خطای "MySQL server has gone away"
+    pool_pre_ping=DB_POOL_PRE_PING,
+)
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **POOL_OPTIONS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# engine ناهمگام (aiomysql) برای endpointهای async که نباید یک thread را هنگام انتظار برای MySQL اشغال کنند
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **POOL_OPTIONS)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 def get_db():
@@ -29,4 +51,43 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """
+    Dependency injector برای FastAPI جهت گرفتن یک session ناهمگام دیتابیس.
+    تضمین می‌کند که session پس از پایان درخواست بسته می‌شود.
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+class QueryCounter:
+    """تعداد و متن کوئری‌های اجرا شده روی یک یا چند engine را ثبت می‌کند."""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(*engines):
+    """
+    در طول بلوک with، کوئری‌های ارسال شده به دیتابیس را می‌شمارد.
+    به صورت پیش‌فرض هر دو engine همگام و ناهمگام را زیر نظر می‌گیرد.
+    """
+    counter = QueryCounter()
+    targets = engines or (engine, async_engine.sync_engine)
+    for target in targets:
+        event.listen(target, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        for target in targets:
+            event.remove(target, "before_cursor_execute", counter)
@@ -0,0 +1,102 @@
+# FILE: ./common/events.py
+import json
+import logging
+from typing import Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# با هر تغییر ناسازگار در فیلدهای data این عدد را بالا ببرید
+EVENT_SCHEMA_VERSION = 1
+
+# نام رویدادها (همان نام صف‌ها بدون پسوند _queue)
+POST_CREATED = "post_created"
+CONTENT_PROCESSING = "content_processing"
+REVIEW_NOTIFICATION = "review_notification"
+FINAL_APPROVAL_NOTIFICATION = "final_approval_notification"
+POST_APPROVED = "post_approved"
+POST_REJECTED = "post_rejected"
+
+# فیلدهایی از data که در as_post_details روی پست یا روی اولین ترجمه قرار می‌گیرند
+POST_FIELDS = ("source_id", "url_original", "title_original", "admin_message_id")
+TRANSLATION_FIELDS = (
+    "title_translated", "score", "featured_image_url",
+    "content_telegram", "content_instagram", "content_twitter",
+)
+
+
+class PostEvent:
+    """
+    پاکت نسخه‌دار رویدادهای مربوط به یک پست.
+
+    شکل پیام روی صف:
+        {"post_id": 12, "event": "post_created", "schema_version": 1, "data": {...}}
+
+    post_id همیشه در سطح بالا می‌ماند تا مصرف‌کننده‌های قدیمی که فقط آن را می‌خوانند کار کنند.
+    data فیلدهای لازم مصرف‌کننده‌ها را حمل می‌کند (عنوان، شناسه ترجمه، تصویر شاخص، امتیاز و ...)
+    تا دیگر برای هر پیام GET /posts/{id} لازم نباشد؛ اگر نسخه ناشناخته باشد یا فیلدی نباشد،
+    مصرف‌کننده باید مثل قبل جزئیات پست را از management-api بخواند.
+    """
+
+    def __init__(self, post_id: Optional[int], event: Optional[str] = None, data: Optional[dict] = None,
+                 schema_version: int = EVENT_SCHEMA_VERSION):
+        self.post_id = post_id
+        self.event = event
+        self.data = data or {}
+        self.schema_version = schema_version
+
+    def get(self, field: str, default: Any = None) -> Any:
+        return self.data.get(field, default)
+
+    def has(self, *fields: str) -> bool:
+        """True اگر همه فیلدهای خواسته‌شده با مقدار غیر None در پیام باشند."""
+        return all(self.data.get(field) is not None for field in fields)
+
+    def as_post_details(self) -> dict:
+        """
+        داده‌های رویداد را به همان شکل پاسخ GET /posts/{id} (فقط با فیلدهای موجود) درمی‌آورد
+        تا توابعی که post_details می‌گیرند بدون تغییر از آن استفاده کنند.
+        """
+        details = {"id": self.post_id}
+        details.update({field: self.data[field] for field in POST_FIELDS if field in self.data})
+        translation = {field: self.data[field] for field in TRANSLATION_FIELDS if field in self.data}
+        if "translation_id" in self.data:
+            translation["id"] = self.data["translation_id"]
+        details["translations"] = [translation] if translation else []
+        return details
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "post_id": self.post_id,
+            "event": self.event,
+            "schema_version": self.schema_version,
+            "data": {key: value for key, value in self.data.items() if value is not None},
+        }, ensure_ascii=False)
+
+
+def translation_event_fields(translation: dict) -> dict:
+    """فیلدهای یک ترجمه (پاسخ API) را برای قرار گرفتن در data رویداد آماده می‌کند."""
+    fields = {field: translation.get(field) for field in TRANSLATION_FIELDS}
+    fields["translation_id"] = translation.get("id")
+    return fields
+
+
+def make_post_event(event: str, post_id: int, **data: Any) -> str:
+    """یک رویداد نسخه‌دار می‌سازد و بدنه JSON آن را برمی‌گرداند؛ فیلدهای None حذف می‌شوند."""
+    return PostEvent(post_id, event, data).to_json()
+
+
+def parse_post_event(body: Union[bytes, str]) -> PostEvent:
+    """
+    بدنه پیام را به PostEvent تبدیل می‌کند.
+    پیام‌های قدیمی بدون نسخه (مثل {"post_id": 1, "platforms": [...]}) هم پذیرفته می‌شوند و
+    فیلدهای سطح بالایشان در data قرار می‌گیرد. پیام با نسخه جدیدتر از این کد، data خالی می‌گیرد.
+    """
+    message = json.loads(body)
+    version = message.get("schema_version")
+    if version is None:
+        data = {key: value for key, value in message.items() if key != "post_id"}
+        return PostEvent(message.get("post_id"), None, data, schema_version=0)
+    if version > EVENT_SCHEMA_VERSION:
+        logger.warning(f"Event schema version {version} is newer than supported {EVENT_SCHEMA_VERSION}; ignoring its data.")
+        return PostEvent(message.get("post_id"), message.get("event"), {}, schema_version=version)
+    return PostEvent(message.get("post_id"), message.get("event"), message.get("data") or {}, schema_version=version)
@@ -0,0 +1,5 @@
+# The asyncio variant needs httpx and lives in common.management_client.async_client.
+from common.management_client.client import ManagementClient, get_management_client
+from common.management_client.stats import EndpointStats
+
+__all__ = ["EndpointStats", "ManagementClient", "get_management_client"]
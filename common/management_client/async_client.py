@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import httpx
+
+from common.management_client.client import (
+    IDEMPOTENT_METHODS,
+    MANAGEMENT_API_CONNECT_TIMEOUT,
+    MANAGEMENT_API_POOL_SIZE,
+    MANAGEMENT_API_READ_TIMEOUT,
+    MANAGEMENT_API_RETRIES,
+    MANAGEMENT_API_URL,
+    RETRYABLE_STATUS_CODES,
+    backoff_with_jitter,
+)
+from common.management_client.stats import EndpointStats
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncManagementClient:
+    """
+    asyncio counterpart of ManagementClient over one pooled httpx.AsyncClient.
+
+    Same timeouts, retry policy and per-endpoint stats; use it as an async context manager
+    so the connection pool is closed with the event loop. Requires httpx.
+    """
+
+    def __init__(self, base_url: str = MANAGEMENT_API_URL, connect_timeout: float = MANAGEMENT_API_CONNECT_TIMEOUT,
+                 read_timeout: float = MANAGEMENT_API_READ_TIMEOUT, retries: int = MANAGEMENT_API_RETRIES,
+                 pool_size: int = MANAGEMENT_API_POOL_SIZE):
+        self.retries = retries
+        self.stats = EndpointStats()
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        )
+
+    async def __aenter__(self) -> "AsyncManagementClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._http.aclose()
+
+    async def request(self, method: str, route: str, path_params: Optional[dict] = None, params: Optional[dict] = None,
+                      json=None, retry: Optional[bool] = None) -> httpx.Response:
+        """See ManagementClient.request; raises httpx.TransportError when no response was received."""
+        method = method.upper()
+        endpoint = f"{method} {route}"
+        url = route.format(**(path_params or {}))
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        attempts = self.retries + 1 if retry else 1
+
+        for attempt in range(attempts):
+            started = time.monotonic()
+            try:
+                response = await self._http.request(method, url, params=params, json=json)
+            except httpx.TransportError as e:
+                self.stats.record(endpoint, time.monotonic() - started, ok=False)
+                if attempt + 1 >= attempts:
+                    raise
+                delay = backoff_with_jitter(attempt)
+                logger.warning(f"{endpoint} failed ({e}); retry {attempt + 1}/{attempts - 1} in {delay:.2f}s.")
+                await asyncio.sleep(delay)
+                continue
+
+            self.stats.record(endpoint, time.monotonic() - started, ok=response.status_code < 500)
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt + 1 < attempts:
+                delay = backoff_with_jitter(attempt)
+                logger.warning(f"{endpoint} returned {response.status_code}; "
+                               f"retry {attempt + 1}/{attempts - 1} in {delay:.2f}s.")
+                await asyncio.sleep(delay)
+                continue
+            return response
+
+    async def get_post(self, post_id: int) -> Optional[dict]:
+        try:
+            response = await self.request("GET", "/posts/{post_id}", {"post_id": post_id})
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            logger.error(f"Could not fetch details for post_id={post_id}: {e}")
+            return None
+
+    async def save_preprocessing_result(self, post_id: int, payload: dict) -> httpx.Response:
+        return await self.request("POST", "/posts/{post_id}/preprocessing-result", {"post_id": post_id},
+                                  json=payload, retry=True)
+
+    async def save_content_result(self, post_id: int, payload: dict) -> httpx.Response:
+        return await self.request("POST", "/posts/{post_id}/content-result", {"post_id": post_id},
+                                  json=payload, retry=True)
+
+    async def mark_pending(self, post_id: int) -> httpx.Response:
+        return await self.request("POST", "/posts/{post_id}/pending", {"post_id": post_id}, retry=True)
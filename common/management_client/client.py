@@ -0,0 +1,181 @@
+import logging
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.management_client.stats import EndpointStats
+
+logger = logging.getLogger(__name__)
+
+MANAGEMENT_API_URL = os.getenv("MANAGEMENT_API_URL", "http://management-api:8000")
+MANAGEMENT_API_CONNECT_TIMEOUT = float(os.getenv("MANAGEMENT_API_CONNECT_TIMEOUT", 3))
+MANAGEMENT_API_READ_TIMEOUT = float(os.getenv("MANAGEMENT_API_READ_TIMEOUT", 15))
+MANAGEMENT_API_RETRIES = int(os.getenv("MANAGEMENT_API_RETRIES", 3))
+MANAGEMENT_API_RETRY_BACKOFF = float(os.getenv("MANAGEMENT_API_RETRY_BACKOFF", 0.5))
+MANAGEMENT_API_POOL_SIZE = int(os.getenv("MANAGEMENT_API_POOL_SIZE", 20))
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+
+def backoff_with_jitter(attempt: int, base: float = MANAGEMENT_API_RETRY_BACKOFF) -> float:
+    """Full jitter: a random delay in [0, base * 2**attempt) so that retrying callers spread out."""
+    return random.uniform(0, base * (2 ** attempt))
+
+
+class ManagementClient:
+    """
+    Thread-safe client for management-api over one pooled requests.Session.
+
+    Connections are kept alive and reused across calls and threads, every call has a
+    connect/read timeout, and transient failures (connection errors, timeouts, 429/502/503/504)
+    are retried with jittered exponential backoff. Only idempotent methods are retried by
+    default; helpers for POST endpoints that are safe to repeat opt in explicitly. Status
+    transitions are compare-and-set on the server, so a repeated transition answers 409
+    instead of running twice.
+
+    `request` returns the final Response without raising for HTTP errors, so callers can
+    handle 404/409 themselves; it raises requests.RequestException when no response was received.
+    """
+
+    def __init__(self, base_url: str = MANAGEMENT_API_URL, connect_timeout: float = MANAGEMENT_API_CONNECT_TIMEOUT,
+                 read_timeout: float = MANAGEMENT_API_READ_TIMEOUT, retries: int = MANAGEMENT_API_RETRIES,
+                 pool_size: int = MANAGEMENT_API_POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.stats = EndpointStats()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method: str, route: str, path_params: Optional[dict] = None, params: Optional[dict] = None,
+                json=None, timeout: Optional[float] = None, retry: Optional[bool] = None) -> requests.Response:
+        """
+        Calls `route` (a template such as "/posts/{post_id}") on management-api.
+        The template, not the formatted URL, is the key for latency stats.
+        """
+        method = method.upper()
+        endpoint = f"{method} {route}"
+        url = self.base_url + route.format(**(path_params or {}))
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        attempts = self.retries + 1 if retry else 1
+        timeout = (self.timeout[0], timeout) if timeout else self.timeout
+
+        for attempt in range(attempts):
+            started = time.monotonic()
+            try:
+                response = self.session.request(method, url, params=params, json=json, timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.stats.record(endpoint, time.monotonic() - started, ok=False)
+                if attempt + 1 >= attempts:
+                    raise
+                delay = backoff_with_jitter(attempt)
+                logger.warning(f"{endpoint} failed ({e}); retry {attempt + 1}/{attempts - 1} in {delay:.2f}s.")
+                time.sleep(delay)
+                continue
+
+            self.stats.record(endpoint, time.monotonic() - started, ok=response.status_code < 500)
+            if response.status_code in RETRYABLE_STATUS_CODES and attempt + 1 < attempts:
+                delay = backoff_with_jitter(attempt)
+                logger.warning(f"{endpoint} returned {response.status_code}; "
+                               f"retry {attempt + 1}/{attempts - 1} in {delay:.2f}s.")
+                response.close()
+                time.sleep(delay)
+                continue
+            return response
+
+    # ---------------------------
+    # Posts
+    # ---------------------------
+    def get_post(self, post_id: int) -> Optional[dict]:
+        """Full post details as returned by GET /posts/{id}, or None if they could not be fetched."""
+        try:
+            response = self.request("GET", "/posts/{post_id}", {"post_id": post_id})
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Could not fetch details for post_id={post_id}: {e}")
+            return None
+
+    def recent_post_urls(self, limit: int) -> List[str]:
+        response = self.request("GET", "/posts/recent-urls", params={"limit": limit}, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+    def existing_post_urls(self, urls: List[str]) -> List[str]:
+        """Subset of `urls` already stored in management-api (read-only, so it is retried)."""
+        response = self.request("POST", "/posts/exists/batch", json={"urls": urls}, retry=True)
+        response.raise_for_status()
+        return response.json().get("existing", [])
+
+    def create_posts_batch(self, posts: List[dict]) -> requests.Response:
+        # The batch endpoint skips URLs that already exist, so repeating it is safe
+        return self.request("POST", "/posts/batch", json={"posts": posts}, timeout=60, retry=True)
+
+    def save_preprocessing_result(self, post_id: int, payload: dict) -> requests.Response:
+        return self.request("POST", "/posts/{post_id}/preprocessing-result", {"post_id": post_id},
+                            json=payload, retry=True)
+
+    def save_content_result(self, post_id: int, payload: dict) -> requests.Response:
+        return self.request("POST", "/posts/{post_id}/content-result", {"post_id": post_id},
+                            json=payload, retry=True)
+
+    def set_admin_messages(self, post_id: int, admin_messages: Dict[str, int]) -> requests.Response:
+        return self.request("POST", "/posts/{post_id}/admin-message-info", {"post_id": post_id},
+                            json={"admin_messages": admin_messages}, retry=True)
+
+    def mark_pending(self, post_id: int) -> requests.Response:
+        return self.request("POST", "/posts/{post_id}/pending", {"post_id": post_id}, retry=True)
+
+    def reject_post(self, post_id: int) -> requests.Response:
+        return self.request("POST", "/posts/{post_id}/reject", {"post_id": post_id}, retry=True)
+
+    def approve_post(self, post_id: int) -> requests.Response:
+        return self.request("POST", "/posts/{post_id}/approve", {"post_id": post_id}, retry=True)
+
+    def request_content_processing(self, post_id: int, platforms: List[str]) -> requests.Response:
+        return self.request("POST", "/posts/{post_id}/process-content", {"post_id": post_id},
+                            json={"platforms": platforms}, retry=True)
+
+    # ---------------------------
+    # Sources
+    # ---------------------------
+    def list_sources(self) -> List[dict]:
+        response = self.request("GET", "/sources")
+        response.raise_for_status()
+        return response.json()
+
+    def get_source(self, source_id: int) -> Optional[dict]:
+        """A source with its destinations, or None if it does not exist or could not be fetched."""
+        try:
+            response = self.request("GET", "/sources/{source_id}", {"source_id": source_id})
+            if response.status_code == 404:
+                logger.warning(f"Source with id {source_id} not found.")
+                return None
+            response.raise_for_status()
+            return response.json()
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Could not fetch source {source_id}. Error: {e}")
+            return None
+
+
+_client: Optional[ManagementClient] = None
+_client_lock = threading.Lock()
+
+
+def get_management_client() -> ManagementClient:
+    """Returns the process-wide ManagementClient, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = ManagementClient()
+    return _client
@@ -0,0 +1,38 @@
+import threading
+from typing import Dict
+
+from common.metrics import MANAGEMENT_CLIENT_LATENCY
+
+
+class EndpointStats:
+    """
+    Per-endpoint latency counters for calls to management-api.
+
+    Endpoints are keyed by method and route template ("GET /posts/{post_id}"), not by the
+    concrete URL, so the number of keys stays small. Every call is also observed in the
+    robopost_management_api_client_duration_seconds histogram.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, dict] = {}
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        MANAGEMENT_CLIENT_LATENCY.labels(endpoint, "ok" if ok else "error").observe(seconds)
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0}
+            stats["count"] += 1
+            stats["total_seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if not ok:
+                stats["errors"] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Returns a copy of the counters with the average latency filled in."""
+        with self._lock:
+            return {
+                endpoint: dict(stats, avg_seconds=stats["total_seconds"] / stats["count"])
+                for endpoint, stats in self._stats.items()
+            }
@@ -0,0 +1,130 @@
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest, start_http_server
+
+logger = logging.getLogger(__name__)
+
+# Port of the sidecar /metrics server for services without an HTTP API (fetcher, processor, publisher)
+METRICS_PORT = int(os.getenv("METRICS_PORT", 9100))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+# ---------------------------
+# RabbitMQ consumers
+# ---------------------------
+MESSAGES_CONSUMED = Counter(
+    "robopost_messages_consumed_total", "Messages delivered to a consumer callback.", ["queue"])
+CALLBACK_FAILURES = Counter(
+    "robopost_callback_failures_total", "Consumer callbacks that raised an exception.", ["queue"])
+CALLBACK_LATENCY = Histogram(
+    "robopost_callback_duration_seconds", "Time spent in a consumer callback.", ["queue"], buckets=SLOW_BUCKETS)
+
+# ---------------------------
+# Gemini
+# ---------------------------
+GEMINI_LATENCY = Histogram(
+    "robopost_gemini_request_duration_seconds", "Latency of Gemini generate_content calls.",
+    ["model", "outcome"], buckets=SLOW_BUCKETS)
+GEMINI_TOKENS = Counter(
+    "robopost_gemini_tokens_total", "Tokens reported by Gemini usage metadata.", ["model", "kind"])
+LLM_CACHE_LOOKUPS = Counter(
+    "robopost_llm_cache_lookups_total", "LLM result cache lookups.", ["result"])
+
+# ---------------------------
+# HTTP
+# ---------------------------
+HTTP_REQUEST_LATENCY = Histogram(
+    "robopost_http_request_duration_seconds", "Latency of requests served by a FastAPI app, by route template.",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS)
+MANAGEMENT_CLIENT_LATENCY = Histogram(
+    "robopost_management_api_client_duration_seconds", "Latency of calls to management-api, by endpoint.",
+    ["endpoint", "outcome"], buckets=LATENCY_BUCKETS)
+
+# ---------------------------
+# Database & feeds
+# ---------------------------
+DB_POOL_CONNECTIONS = Gauge(
+    "robopost_db_pool_connections", "SQLAlchemy connection pool usage.", ["engine", "state"])
+FEED_FETCH_DURATION = Histogram(
+    "robopost_feed_fetch_duration_seconds", "Time to fetch and process one feed source, by outcome (ok, partial, error, timeout).",
+    ["source", "outcome"], buckets=SLOW_BUCKETS)
+
+
+@contextmanager
+def track_callback(queue_name: str):
+    """Counts and times one consumer callback; exceptions are counted and re-raised."""
+    MESSAGES_CONSUMED.labels(queue_name).inc()
+    started = time.monotonic()
+    try:
+        yield
+    except BaseException:
+        CALLBACK_FAILURES.labels(queue_name).inc()
+        raise
+    finally:
+        CALLBACK_LATENCY.labels(queue_name).observe(time.monotonic() - started)
+
+
+def instrument_callback(queue_name: str, callback: Callable) -> Callable:
+    """Wraps a pika callback (ch, method, properties, body) with track_callback."""
+    def wrapper(ch, method, properties, body):
+        with track_callback(queue_name):
+            return callback(ch, method, properties, body)
+    return wrapper
+
+
+def record_gemini_call(model: str, seconds: float, response=None, ok: bool = True):
+    """Records the latency of one Gemini call and, when available, its prompt/output token counts."""
+    GEMINI_LATENCY.labels(model, "ok" if ok else "error").observe(seconds)
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    for kind, attribute in (("prompt", "prompt_token_count"), ("output", "candidates_token_count"),
+                            ("thoughts", "thoughts_token_count")):
+        count = getattr(usage, attribute, None)
+        if count:
+            GEMINI_TOKENS.labels(model, kind).inc(count)
+
+
+def register_db_pool(engine, name: str):
+    """Exposes size, checked-out and overflow connections of a (sync) SQLAlchemy engine's pool."""
+    pool = engine.pool
+    for state, read in (("size", pool.size), ("checked_out", pool.checkedout),
+                        ("checked_in", pool.checkedin), ("overflow", pool.overflow)):
+        DB_POOL_CONNECTIONS.labels(name, state).set_function(read)
+
+
+def start_metrics_server(port: Optional[int] = None):
+    """Serves /metrics on a sidecar port for worker services; a failure to bind is logged, not raised."""
+    port = port or METRICS_PORT
+    try:
+        start_http_server(port)
+        logger.info(f"Metrics server listening on port {port}.")
+    except OSError as e:
+        logger.error(f"Could not start metrics server on port {port}: {e}")
+
+
+def instrument_fastapi(app):
+    """Adds request latency by route template and a /metrics endpoint to a FastAPI app."""
+    from starlette.responses import Response
+
+    @app.middleware("http")
+    async def record_request_latency(request, call_next):
+        started = time.monotonic()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # The route template keeps label cardinality bounded (/posts/{post_id}, not /posts/12)
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            HTTP_REQUEST_LATENCY.labels(request.method, route, str(status)).observe(time.monotonic() - started)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -2,12 +2,18 @@
 import pika
 import os
 import logging
+import threading
 import time
+from typing import Iterable, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
+RABBITMQ_HEARTBEAT = int(os.getenv("RABBITMQ_HEARTBEAT", 60))
+RABBITMQ_PUBLISHER_CONFIRMS = os.getenv("RABBITMQ_PUBLISHER_CONFIRMS", "true").lower() in ("1", "true", "yes")
+RABBITMQ_PUBLISHER_CONNECT_RETRIES = int(os.getenv("RABBITMQ_PUBLISHER_CONNECT_RETRIES", 3))
+
 class RabbitMQClient:
     def __init__(self):
         self.host = os.getenv("RABBITMQ_HOST", "rabbitmq")
@@ -17,11 +23,10 @@ class RabbitMQClient:
         self.connection = None
         self.channel = None
 
-    def _connect(self):
+    def _connect(self, max_retries: int = 10):
         credentials = pika.PlainCredentials(self.user, self.password)
-        parameters = pika.ConnectionParameters(self.host, self.port, '/', credentials)
+        parameters = pika.ConnectionParameters(self.host, self.port, '/', credentials, heartbeat=RABBITMQ_HEARTBEAT)
         
-        max_retries = 10
         for i in range(max_retries):
             try:
                 self.connection = pika.BlockingConnection(parameters)
@@ -31,7 +36,8 @@ class RabbitMQClient:
             except pika.exceptions.AMQPConnectionError as e:
                 sleep_time = 2 ** i
                 logger.warning(f"RabbitMQ connection failed. Retrying in {sleep_time} seconds... (Attempt {i+1}/{max_retries})")
-                time.sleep(sleep_time)
+                if i + 1 < max_retries:
+                    time.sleep(sleep_time)
         
         logger.critical("❌ Could not connect to RabbitMQ after several retries.")
         raise pika.exceptions.AMQPConnectionError("Failed to connect to RabbitMQ.")
@@ -49,11 +55,11 @@ class RabbitMQClient:
         )
         logger.info(f"Message published to exchange '{exchange_name}' with key '{routing_key}'.")
 
-    def start_consuming(self, queue_name: str, callback):
+    def start_consuming(self, queue_name: str, callback, prefetch_count: int = 1):
         if not self.channel or self.channel.is_closed:
             self._connect()
         
-        self.channel.basic_qos(prefetch_count=1)
+        self.channel.basic_qos(prefetch_count=prefetch_count)
         
         self.channel.basic_consume(
             queue=queue_name,
@@ -78,4 +84,138 @@ class RabbitMQClient:
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.close()
\ No newline at end of file
+        self.close()
+
+
+class RabbitMQPublisher:
+    """
+    Thread-safe, process-wide publisher that keeps one long-lived connection and channel.
+
+    Queue declarations are cached per connection, a lost connection is re-opened
+    transparently on the next publish, and publisher confirms can be enabled so
+    that every publish returns only once the broker has accepted the message.
+    A background thread services heartbeats while the publisher is idle.
+    """
+
+    def __init__(self, confirm_delivery: bool = RABBITMQ_PUBLISHER_CONFIRMS):
+        self.confirm_delivery = confirm_delivery
+        self._client = RabbitMQClient()
+        self._lock = threading.RLock()
+        self._declared_queues = set()
+        self._declared_exchanges = set()
+        self._keepalive_thread = None
+
+    def _ensure_channel(self):
+        client = self._client
+        if client.connection and client.connection.is_open and client.channel and client.channel.is_open:
+            return client.channel
+        self._reset()
+        client._connect(max_retries=RABBITMQ_PUBLISHER_CONNECT_RETRIES)
+        if self.confirm_delivery:
+            client.channel.confirm_delivery()
+        self._start_keepalive()
+        return client.channel
+
+    def _reset(self):
+        self._declared_queues.clear()
+        self._declared_exchanges.clear()
+        try:
+            self._client.close()
+        except Exception:
+            pass
+        self._client.connection = None
+        self._client.channel = None
+
+    def _declare_queue(self, channel, queue_name: str, arguments: Optional[dict] = None):
+        if queue_name not in self._declared_queues:
+            channel.queue_declare(queue=queue_name, durable=True, arguments=arguments)
+            self._declared_queues.add(queue_name)
+
+    def _declare_fanout_exchange(self, channel, exchange_name: str):
+        if exchange_name not in self._declared_exchanges:
+            channel.exchange_declare(exchange=exchange_name, exchange_type="fanout", durable=True)
+            self._declared_exchanges.add(exchange_name)
+
+    def _start_keepalive(self):
+        if self._keepalive_thread and self._keepalive_thread.is_alive():
+            return
+        self._keepalive_thread = threading.Thread(target=self._keepalive, name="rabbitmq-publisher-keepalive", daemon=True)
+        self._keepalive_thread.start()
+
+    def _keepalive(self):
+        interval = max(RABBITMQ_HEARTBEAT / 2, 1) if RABBITMQ_HEARTBEAT else 30
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                connection = self._client.connection
+                if not connection or connection.is_closed:
+                    continue
+                try:
+                    connection.process_data_events(time_limit=0)
+                except Exception as e:
+                    logger.warning(f"RabbitMQ publisher connection dropped while idle; will reconnect on next publish. Error: {e}")
+                    self._reset()
+
+    def publish(self, queue_name: str, body: str, properties: Optional[pika.BasicProperties] = None,
+                queue_arguments: Optional[dict] = None):
+        """Publishes a single persistent message to a durable queue on the default exchange."""
+        self.publish_many(queue_name, [body], properties=properties, queue_arguments=queue_arguments)
+
+    def publish_many(self, queue_name: str, bodies: Iterable[str], properties: Optional[pika.BasicProperties] = None,
+                     queue_arguments: Optional[dict] = None):
+        """
+        Publishes several messages to the same queue over the shared channel.
+        `queue_arguments` are only used the first time the queue is declared on a connection.
+        """
+        bodies = list(bodies)
+        properties = properties or pika.BasicProperties(delivery_mode=2)
+        sent = 0
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    channel = self._ensure_channel()
+                    self._declare_queue(channel, queue_name, queue_arguments)
+                    while sent < len(bodies):
+                        channel.basic_publish(exchange="", routing_key=queue_name, body=bodies[sent], properties=properties)
+                        sent += 1
+                    break
+                except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError) as e:
+                    self._reset()
+                    if attempt == 2:
+                        raise
+                    logger.warning(f"RabbitMQ publisher lost its channel; reconnecting and resending {len(bodies) - sent} message(s). Error: {e}")
+        logger.info(f"Published {len(bodies)} message(s) to queue '{queue_name}'.")
+
+    def publish_fanout(self, exchange_name: str, body: str):
+        """Broadcasts a transient message to every queue bound to a durable fanout exchange."""
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    channel = self._ensure_channel()
+                    self._declare_fanout_exchange(channel, exchange_name)
+                    channel.basic_publish(exchange=exchange_name, routing_key="", body=body)
+                    break
+                except (pika.exceptions.AMQPConnectionError, pika.exceptions.AMQPChannelError) as e:
+                    self._reset()
+                    if attempt == 2:
+                        raise
+                    logger.warning(f"RabbitMQ publisher lost its channel; reconnecting to publish to '{exchange_name}'. Error: {e}")
+        logger.info(f"Message published to fanout exchange '{exchange_name}'.")
+
+    def close(self):
+        with self._lock:
+            self._reset()
+
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher() -> RabbitMQPublisher:
+    """Returns the process-wide RabbitMQPublisher, creating it on first use."""
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = RabbitMQPublisher()
+    return _publisher
@@ -0,0 +1,87 @@
+import logging
+import os
+from typing import NamedTuple, Optional
+
+import pika
+
+from common.rabbit import RabbitMQPublisher, get_publisher
+
+logger = logging.getLogger(__name__)
+
+RETRY_BASE_DELAY_MS = int(os.getenv("RETRY_BASE_DELAY_MS", 5000))
+RETRY_MAX_DELAY_MS = int(os.getenv("RETRY_MAX_DELAY_MS", 10 * 60 * 1000))
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", 6))
+RETRY_COUNT_HEADER = "x-retry-count"
+
+
+def retry_delay_ms(attempt: int) -> int:
+    """Exponential backoff: base, 2*base, 4*base, ... capped at RETRY_MAX_DELAY_MS."""
+    return min(RETRY_BASE_DELAY_MS * (2 ** max(attempt - 1, 0)), RETRY_MAX_DELAY_MS)
+
+
+def retry_queue_name(queue_name: str, delay_ms: int) -> str:
+    return f"{queue_name}.retry.{delay_ms}"
+
+
+def dead_letter_queue_name(queue_name: str) -> str:
+    return f"{queue_name}.dead"
+
+
+class RetryPlan(NamedTuple):
+    """Where a failed message should be published next and with which headers/queue arguments."""
+    queue_name: str
+    headers: dict
+    queue_arguments: Optional[dict]
+    attempt: int
+    parked: bool
+
+
+def plan_retry(queue_name: str, headers: Optional[dict]) -> RetryPlan:
+    """
+    Computes the next hop for a failed message of `queue_name`.
+
+    Retries go to a per-delay holding queue whose x-message-ttl dead-letters the
+    message back to `queue_name` once the delay has passed; using one queue per
+    delay avoids head-of-line blocking between short and long waits. After
+    RETRY_MAX_ATTEMPTS the message is parked in `<queue>.dead` instead.
+    """
+    headers = dict(headers or {})
+    attempt = int(headers.get(RETRY_COUNT_HEADER, 0)) + 1
+    headers[RETRY_COUNT_HEADER] = attempt
+    if attempt > RETRY_MAX_ATTEMPTS:
+        return RetryPlan(dead_letter_queue_name(queue_name), headers, None, attempt, True)
+
+    delay_ms = retry_delay_ms(attempt)
+    arguments = {
+        "x-message-ttl": delay_ms,
+        "x-dead-letter-exchange": "",
+        "x-dead-letter-routing-key": queue_name,
+    }
+    return RetryPlan(retry_queue_name(queue_name, delay_ms), headers, arguments, attempt, False)
+
+
+def log_retry(origin_queue: str, plan: RetryPlan):
+    if plan.parked:
+        logger.error(f"Message for queue '{origin_queue}' exhausted {RETRY_MAX_ATTEMPTS} attempts; parked in dead-letter queue.")
+    else:
+        logger.warning(f"Scheduled retry {plan.attempt}/{RETRY_MAX_ATTEMPTS} for queue '{origin_queue}' via '{plan.queue_name}'.")
+
+
+def schedule_retry(queue_name: str, body: bytes, properties: Optional[pika.BasicProperties] = None,
+                   publisher: Optional[RabbitMQPublisher] = None) -> bool:
+    """
+    Re-schedules a failed message for `queue_name` according to `plan_retry`.
+    The caller acks the original delivery once this returns.
+
+    Returns True when a retry was scheduled and False when the message was parked.
+    """
+    publisher = publisher or get_publisher()
+    plan = plan_retry(queue_name, properties.headers if properties else None)
+    retry_properties = pika.BasicProperties(
+        delivery_mode=2,
+        headers=plan.headers,
+        content_type=properties.content_type if properties else None,
+    )
+    publisher.publish(plan.queue_name, body, properties=retry_properties, queue_arguments=plan.queue_arguments)
+    log_retry(queue_name, plan)
+    return not plan.parked
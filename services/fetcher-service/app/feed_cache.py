@@ -0,0 +1,88 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional
+
+logger = logging.getLogger("fetcher-service.feed-cache")
+
+FEED_CACHE_PATH = os.getenv("FEED_CACHE_PATH", "/usr/src/app/data/feed_cache.json")
+
+
+def content_hash(body: bytes) -> str:
+    """Returns a stable fingerprint of a feed document."""
+    return hashlib.sha256(body).hexdigest()
+
+
+class FeedValidatorCache:
+    """
+    Persistent per-source HTTP validator cache (ETag, Last-Modified and body hash).
+
+    Entries are keyed by the feed URL and written back atomically as a single
+    JSON file at the end of each fetch cycle, so a restart keeps the validators.
+    """
+
+    def __init__(self, path: str = FEED_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        self._dirty = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries = json.load(f)
+            logger.info(f"Loaded feed validators for {len(self._entries)} sources from {self.path}.")
+        except FileNotFoundError:
+            self._entries = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read feed cache at {self.path}; starting empty. Error: {e}")
+            self._entries = {}
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = dict(self._entries)
+            self._dirty = False
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(snapshot, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.error(f"Could not persist feed cache to {self.path}. Error: {e}")
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        """Builds the conditional-GET headers for a feed URL."""
+        entry = self._entries.get(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url: str, body_hash: str) -> bool:
+        entry = self._entries.get(url) or {}
+        return entry.get("content_hash") == body_hash
+
+    def update(self, url: str, etag: Optional[str], last_modified: Optional[str], body_hash: str):
+        with self._lock:
+            self._entries[url] = {
+                "etag": etag,
+                "last_modified": last_modified,
+                "content_hash": body_hash,
+            }
+            self._dirty = True
+
+    def forget(self, url: str):
+        """Drops the validators of a feed so the next cycle parses it unconditionally."""
+        with self._lock:
+            if self._entries.pop(url, None) is not None:
+                self._dirty = True
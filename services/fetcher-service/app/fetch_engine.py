@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+import aiohttp
+import feedparser
+import trafilatura
+from newspaper import Article
+
+from common.metrics import FEED_FETCH_DURATION
+from app.feed_cache import FeedValidatorCache, content_hash
+
+logger = logging.getLogger("fetcher-service.engine")
+
+# ---------------------------
+# Tunables
+# ---------------------------
+FETCH_GLOBAL_CONCURRENCY = int(os.getenv("FETCH_GLOBAL_CONCURRENCY", 32))
+FETCH_PER_HOST_CONCURRENCY = int(os.getenv("FETCH_PER_HOST_CONCURRENCY", 2))
+FETCH_REQUEST_TIMEOUT = float(os.getenv("FETCH_REQUEST_TIMEOUT", 20))
+FETCH_CYCLE_TIMEOUT = float(os.getenv("FETCH_CYCLE_TIMEOUT", 900))
+FETCH_EXTRACT_WORKERS = int(os.getenv("FETCH_EXTRACT_WORKERS", os.cpu_count() or 2))
+FETCH_ENTRIES_PER_SOURCE = int(os.getenv("FETCH_ENTRIES_PER_SOURCE", 10))
+FETCH_POST_BATCH_SIZE = int(os.getenv("FETCH_POST_BATCH_SIZE", 10))
+FETCH_USER_AGENT = os.getenv(
+    "FETCH_USER_AGENT",
+    "Mozilla/5.0 (compatible; RoboPostFetcher/1.0; +https://bot.firstone.click)",
+)
+
+
+# ---------------------------
+# Helpers
+# ---------------------------
+def is_http_url(u: str) -> bool:
+    """Return True only for valid http/https URLs with a netloc."""
+    if not u or not isinstance(u, str):
+        return False
+    try:
+        p = urlparse(u.strip())
+        return p.scheme in ("http", "https") and bool(p.netloc)
+    except Exception:
+        return False
+
+
+# ---------------------------
+# Worker-pool functions (must stay top-level so they can be pickled)
+# ---------------------------
+def parse_feed_entries(body: bytes, limit: int) -> List[Tuple[str, str]]:
+    """Parses a raw feed document and returns (link, title) for the first `limit` entries."""
+    feed = feedparser.parse(body)
+    entries = []
+    for entry in feed.entries[:limit]:
+        entries.append((entry.get("link"), entry.get("title") or "No Title"))
+    return entries
+
+
+def extract_article(url: str, html: str) -> Optional[dict]:
+    """Extracts the main text and featured image from an already-downloaded article page."""
+    article = Article(url)
+    article.download(input_html=html)
+    article.parse()
+
+    content = (article.text or "").strip()
+    if not content:
+        return None
+
+    image_url = None
+
+    # مرحله ۱: تلاش با trafilatura (روش دقیق‌تر)
+    metadata = trafilatura.extract_metadata(html)
+    if metadata and metadata.image:
+        image_url = metadata.image
+
+    # مرحله ۲: اگر روش اول ناموفق بود، از newspaper3k استفاده می‌کنیم
+    if not image_url:
+        image_url = article.top_image
+
+    return {"content": content, "image_url": image_url}
+
+
+# ---------------------------
+# Engine
+# ---------------------------
+class FetchEngine:
+    """
+    Runs one fetch cycle concurrently.
+
+    Feeds and article pages are downloaded with a shared aiohttp session whose
+    connector bounds global and per-host concurrency; parsing and extraction
+    run on a process pool, and the blocking management-api helpers run in
+    threads so they never stall the event loop. When a feed cache is given,
+    feeds are fetched with conditional GETs and unchanged bodies are not parsed.
+    """
+
+    def __init__(
+        self,
+        filter_new_urls: Callable[[List[str]], List[str]],
+        create_posts: Callable[[List[dict]], Optional[List[dict]]],
+        feed_cache: Optional[FeedValidatorCache] = None,
+    ):
+        self.filter_new_urls = filter_new_urls
+        self.create_posts = create_posts
+        self.feed_cache = feed_cache
+        self._pool = None
+
+    async def run(self, sources: List[dict]) -> int:
+        """Fetches every source and returns the number of posts created within the cycle budget."""
+        started = time.monotonic()
+        timeout = aiohttp.ClientTimeout(total=FETCH_REQUEST_TIMEOUT)
+        connector = aiohttp.TCPConnector(
+            limit=FETCH_GLOBAL_CONCURRENCY,
+            limit_per_host=FETCH_PER_HOST_CONCURRENCY,
+            ttl_dns_cache=300,
+        )
+        headers = {"User-Agent": FETCH_USER_AGENT}
+
+        with ProcessPoolExecutor(max_workers=FETCH_EXTRACT_WORKERS) as pool:
+            self._pool = pool
+            async with aiohttp.ClientSession(timeout=timeout, connector=connector, headers=headers) as session:
+                tasks = [asyncio.create_task(self._timed_fetch_source(session, source)) for source in sources]
+                done, pending = await asyncio.wait(tasks, timeout=FETCH_CYCLE_TIMEOUT)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    logger.warning(
+                        f"Fetch cycle hit the {FETCH_CYCLE_TIMEOUT:.0f}s cap; "
+                        f"cancelled {len(pending)} of {len(tasks)} sources."
+                    )
+            self._pool = None
+
+        if self.feed_cache:
+            self.feed_cache.save()
+
+        created = sum(task.result() for task in done if not task.cancelled() and task.exception() is None)
+        logger.info(
+            f"Fetch cycle processed {len(done)}/{len(tasks)} sources and created {created} posts "
+            f"in {time.monotonic() - started:.1f}s."
+        )
+        return created
+
+    async def _run_in_pool(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, func, *args)
+
+    async def _timed_fetch_source(self, session: aiohttp.ClientSession, source: dict) -> int:
+        """
+        Runs _fetch_source and records its duration per source under the outcome it reports;
+        cancelled sources count as timeouts.
+        """
+        label = str(source.get("name") or source.get("id"))
+        started = time.monotonic()
+        outcome = "error"
+        try:
+            created, outcome = await self._fetch_source(session, source)
+            return created
+        except asyncio.CancelledError:
+            outcome = "timeout"
+            raise
+        finally:
+            FEED_FETCH_DURATION.labels(label, outcome).observe(time.monotonic() - started)
+
+    async def _fetch_source(self, session: aiohttp.ClientSession, source: dict) -> Tuple[int, str]:
+        """
+        Returns (posts created, outcome). The outcome is "ok", "partial" when some articles
+        could not be extracted, or "error" when the feed, the existence check or a post
+        batch failed.
+        """
+        source_id = source.get("id")
+        source_url = source.get("url")
+        source_name = source.get("name", "Unnamed Source")
+        logger.info(f"Fetching source: {source_name} ({source_url})")
+
+        try:
+            headers = self.feed_cache.request_headers(source_url) if self.feed_cache else {}
+            async with session.get(source_url, headers=headers) as response:
+                if response.status == 304:
+                    logger.info(f"Feed not modified (304), skipping: {source_name}")
+                    return 0, "ok"
+                response.raise_for_status()
+                body = await response.read()
+                etag = response.headers.get("ETag")
+                last_modified = response.headers.get("Last-Modified")
+
+            body_hash = content_hash(body)
+            if self.feed_cache and self.feed_cache.is_unchanged(source_url, body_hash):
+                logger.info(f"Feed body unchanged since last cycle, skipping: {source_name}")
+                self.feed_cache.update(source_url, etag, last_modified, body_hash)
+                return 0, "ok"
+
+            entries = await self._run_in_pool(parse_feed_entries, body, FETCH_ENTRIES_PER_SOURCE)
+        except Exception as e:
+            logger.error(f"Failed to fetch or parse feed: {source_url}. Error: {e}")
+            return 0, "error"
+
+        entries = [(link, title) for link, title in entries if is_http_url(link)]
+        try:
+            # Dedup for the whole feed in one step: local seen-set first, then a single batch call.
+            new_urls = set(await asyncio.to_thread(self.filter_new_urls, [link for link, _ in entries]))
+        except Exception as e:
+            logger.error(f"Could not check post existence for source '{source_name}'. Error: {e}")
+            if self.feed_cache:
+                self.feed_cache.forget(source_url)
+            return 0, "error"
+        entries = [(link, title) for link, title in entries if link in new_urls]
+
+        # Extracted articles are collected and flushed to management-api every
+        # FETCH_POST_BATCH_SIZE items, with a final flush for the rest of the source.
+        new_posts_found = 0
+        failed_entries = False
+        failed_batches = False
+        batch = []
+        for next_result in asyncio.as_completed(
+            [self._process_entry(session, source_id, link, title) for link, title in entries]
+        ):
+            post_data = await next_result
+            if post_data is None:
+                failed_entries = True
+            elif post_data:
+                batch.append(post_data)
+            if len(batch) >= FETCH_POST_BATCH_SIZE:
+                created = await asyncio.to_thread(self.create_posts, batch)
+                failed_batches = failed_batches or created is None
+                new_posts_found += len(created or [])
+                batch = []
+        if batch:
+            created = await asyncio.to_thread(self.create_posts, batch)
+            failed_batches = failed_batches or created is None
+            new_posts_found += len(created or [])
+        logger.info(f"Found {new_posts_found} new posts for source '{source_name}'.")
+
+        # Validators are only remembered once every entry was handled, so a
+        # transient failure makes the next cycle look at this feed again.
+        if self.feed_cache:
+            if failed_entries or failed_batches:
+                self.feed_cache.forget(source_url)
+            else:
+                self.feed_cache.update(source_url, etag, last_modified, body_hash)
+        if failed_batches:
+            return new_posts_found, "error"
+        return new_posts_found, "partial" if failed_entries else "ok"
+
+    async def _process_entry(self, session: aiohttp.ClientSession, source_id: int, post_url: str, title: str):
+        """Returns the post payload to create, False when the entry was skipped and None on failure."""
+        try:
+            async with session.get(post_url) as response:
+                response.raise_for_status()
+                html = await response.text(errors="replace")
+
+            extracted = await self._run_in_pool(extract_article, post_url, html)
+            if not extracted:
+                logger.warning(f"Newspaper3k could not extract main content from {post_url}. Skipping.")
+                return False
+
+            # اعتبارسنجی نهایی URL و آماده‌سازی لیست برای ارسال
+            images = []
+            image_url = extracted.get("image_url")
+            if image_url and is_http_url(image_url):
+                images.append(image_url)
+
+            post_data = {
+                "source_id": source_id,
+                "title_original": title,
+                "content_original": extracted["content"],
+                "url_original": post_url,
+                "image_urls_original": images,
+            }
+            return post_data
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Failed to process article {post_url}. Error: {e}", exc_info=True)
+            return None
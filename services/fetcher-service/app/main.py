@@ -1,16 +1,16 @@
+import asyncio
 import schedule
 import time
 import logging
-import os
 import requests
-import feedparser
-import json
-from urllib.parse import urlparse
-import trafilatura
-from newspaper import Article
+from typing import List, Optional
 from dotenv import load_dotenv
 from common.logging_config import setup_logging
-from common.rabbit import RabbitMQClient
+from common.management_client import get_management_client
+from common.metrics import start_metrics_server
+from app.fetch_engine import FetchEngine, is_http_url
+from app.feed_cache import FeedValidatorCache
+from app.seen_urls import SeenUrlSet, SEEN_URLS_CAPACITY
 
 # ---------------------------
 # Bootstrap
@@ -19,29 +19,23 @@ load_dotenv()
 setup_logging()
 logger = logging.getLogger("fetcher-service")
 
-MANAGEMENT_API_URL = os.getenv("MANAGEMENT_API_URL", "http://management-api:8000")
+# Pooled keep-alive session with timeouts and jittered retries.
+management_api = get_management_client()
+
+# Conditional-GET validators survive across cycles and restarts.
+feed_cache = FeedValidatorCache()
+# URLs already stored in management-api; hits never reach the network.
+seen_urls = SeenUrlSet()
 
 # ---------------------------
 # Helpers
 # ---------------------------
-def is_http_url(u: str) -> bool:
-    """Return True only for valid http/https URLs with a netloc."""
-    if not u or not isinstance(u, str):
-        return False
-    try:
-        p = urlparse(u.strip())
-        return p.scheme in ("http", "https") and bool(p.netloc)
-    except Exception:
-        return False
-
 def get_all_sources():
     """Fetches all sources from the management-api with a retry logic."""
     max_retries = 10
     for i in range(max_retries):
         try:
-            response = requests.get(f"{MANAGEMENT_API_URL}/sources", timeout=15)
-            response.raise_for_status()
-            sources = response.json()
+            sources = management_api.list_sources()
             logger.info(f"Successfully fetched {len(sources)} sources.")
             return sources
         except requests.exceptions.RequestException as e:
@@ -54,42 +48,52 @@ def get_all_sources():
     logger.error("Could not connect to management-api after several retries.")
     return []
 
-def is_post_new(post_url: str):
-    """Checks if a post with the given URL already exists."""
+def warm_seen_urls():
+    """Pre-loads the local seen-URL set with the most recent posts known to management-api."""
     try:
-        response = requests.get(f"{MANAGEMENT_API_URL}/posts/exists", params={"url_original": post_url}, timeout=15)
-        response.raise_for_status()
-        return not response.json().get("exists", True)
+        urls = management_api.recent_post_urls(SEEN_URLS_CAPACITY)
+        seen_urls.update(urls)
+        logger.info(f"Warmed seen-URL cache with {len(urls)} URLs.")
     except requests.exceptions.RequestException as e:
-        logger.error(f"Could not check post existence. URL: {post_url}. Error: {e}")
-        return False
-
-def create_post(post_data: dict):
-    """Creates a new post record and sends a message to RabbitMQ on success."""
-    # Final safety: ensure URL fields are valid before POST
-    post_url = post_data.get("url_original")
-    if not is_http_url(post_url):
-        logger.warning(f"Skipping post with invalid url_original: {post_url}")
-        return None
+        logger.warning(f"Could not warm seen-URL cache; it will fill up as feeds are checked. Error: {e}")
+
+def filter_new_urls(urls: List[str]) -> List[str]:
+    """
+    Returns the subset of `urls` that management-api does not know yet.
+    Locally seen URLs are dropped first; the rest are checked with a single batch call.
+    Raises requests.exceptions.RequestException when the check itself fails.
+    """
+    candidates = seen_urls.unknown(dict.fromkeys(urls))
+    if not candidates:
+        return []
+    existing = management_api.existing_post_urls(candidates)
+    seen_urls.update(existing)
+    existing = set(existing)
+    return [u for u in candidates if u not in existing]
+
+def create_posts_batch(posts: List[dict]) -> Optional[List[dict]]:
+    """
+    Creates many posts with a single call to management-api, which also publishes
+    their post_created events. Returns the created posts, or None on failure.
+    """
+    valid_posts = []
+    for post_data in posts:
+        # Final safety: ensure URL fields are valid before POST
+        post_url = post_data.get("url_original")
+        if not is_http_url(post_url):
+            logger.warning(f"Skipping post with invalid url_original: {post_url}")
+            continue
+        images = post_data.get("image_urls_original") or []
+        post_data["image_urls_original"] = [u for u in images if is_http_url(u)]
+        valid_posts.append(post_data)
 
-    images = post_data.get("image_urls_original") or []
-    images = [u for u in images if is_http_url(u)]
-    post_data["image_urls_original"] = images
+    if not valid_posts:
+        return []
 
     try:
-        response = requests.post(f"{MANAGEMENT_API_URL}/posts", json=post_data, timeout=20)
+        response = management_api.create_posts_batch(valid_posts)
         response.raise_for_status()
-        new_post = response.json()
-        logger.info(f"✅ Created post: {new_post.get('title_original')} (id={new_post.get('id')})")
-        try:
-            with RabbitMQClient() as client:
-                message_body = json.dumps({"post_id": new_post.get("id")})
-                client.channel.queue_declare(queue='post_created_queue', durable=True)
-                client.publish(exchange_name="", routing_key="post_created_queue", body=message_body)
-                logger.info(f"📤 Notified post_created for post_id={new_post.get('id')}")
-        except Exception as e:
-            logger.error(f"Failed to send creation notification for post_id: {new_post.get('id')}. Error: {e}")
-        return new_post
+        result = response.json()
     except requests.exceptions.HTTPError as e:
         # Log response body for 4xx/5xx diagnostics
         body = ""
@@ -97,12 +101,19 @@ def create_post(post_data: dict):
             body = response.text[:2000]
         except Exception:
             pass
-        logger.error(f"Could not create post. Data: {post_data}. Error: {e}. Body: {body}")
+        logger.error(f"Could not create batch of {len(valid_posts)} posts. Error: {e}. Body: {body}")
         return None
     except requests.exceptions.RequestException as e:
-        logger.error(f"Could not create post. Data: {post_data}. Error: {e}")
+        logger.error(f"Could not create batch of {len(valid_posts)} posts. Error: {e}")
         return None
 
+    created = result.get("created", [])
+    for new_post in created:
+        logger.info(f"✅ Created post: {new_post.get('title_original')} (id={new_post.get('id')})")
+    seen_urls.update(p.get("url_original") for p in created)
+    seen_urls.update(result.get("skipped", []))
+    return created
+
 # ---------------------------
 # Fetch job
 # ---------------------------
@@ -113,78 +124,8 @@ def fetch_job():
         logger.info("No sources found to fetch. Job finished.")
         return
 
-    for source in sources:
-        source_id = source.get("id")
-        source_url = source.get("url")
-        source_name = source.get("name", "Unnamed Source")
-        logger.info(f"Fetching source: {source_name} ({source_url})")
-
-        try:
-            feed = feedparser.parse(source_url)
-        except Exception as e:
-            logger.error(f"Failed to parse feed: {source_url}. Error: {e}")
-            continue
-
-        new_posts_found = 0
-
-        for entry in feed.entries[:10]:
-            post_url = entry.get("link")
-            if not is_http_url(post_url):
-                logger.debug(f"Skipping entry with invalid link: {post_url}")
-                continue
-
-            try:
-                # Skip if already exists
-                if not is_post_new(post_url):
-                    logger.debug(f"Already exists (skipping): {post_url}")
-                    continue
-
-                # Title (fallback to feed title if needed)
-                title = entry.get("title") or "No Title"
-
-                # Use newspaper3k to fetch full article & images
-                article = Article(post_url)
-                article.download()
-                article.parse()
-
-                content = (article.text or "").strip()
-                if not content:
-                    logger.warning(f"Newspaper3k could not extract main content from {post_url}. Skipping.")
-                    continue
-
-                image_url = None
-                
-                # مرحله ۱: تلاش با trafilatura (روش دقیق‌تر)
-                metadata = trafilatura.extract_metadata(article.html)
-                if metadata and metadata.image:
-                    image_url = metadata.image
-
-                # مرحله ۲: اگر روش اول ناموفق بود، از newspaper3k استفاده می‌کنیم
-                if not image_url:
-                    image_url = article.top_image
-
-                # اعتبارسنجی نهایی URL و آماده‌سازی لیست برای ارسال
-                images = []
-                if image_url and is_http_url(image_url):
-                    images.append(image_url)
-                # --- END: پایان بخش اصلاح شده ---
-                # ^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^^
-
-                post_data = {
-                    "source_id": source_id,
-                    "title_original": title,
-                    "content_original": content,
-                    "url_original": post_url,
-                    "image_urls_original": images,
-                }
-
-                if create_post(post_data):
-                    new_posts_found += 1
-
-            except Exception as e:
-                logger.error(f"Failed to process article {post_url}. Error: {e}", exc_info=True)
-
-        logger.info(f"Found {new_posts_found} new posts for source '{source_name}'.")
+    engine = FetchEngine(filter_new_urls=filter_new_urls, create_posts=create_posts_batch, feed_cache=feed_cache)
+    asyncio.run(engine.run(sources))
 
     logger.info("✅ Fetcher job finished.")
 
@@ -193,10 +134,12 @@ def fetch_job():
 # ---------------------------
 def main():
     logger.info("--- 🤖 Fetcher Service Started ---")
+    start_metrics_server()
     schedule.every(60).minutes.do(fetch_job)
 
     logger.info("Initial fetch run will start after a short delay...")
     time.sleep(15)
+    warm_seen_urls()
     fetch_job()
 
     while True:
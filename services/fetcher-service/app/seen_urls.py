@@ -0,0 +1,47 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Iterable, List
+
+SEEN_URLS_CAPACITY = int(os.getenv("SEEN_URLS_CAPACITY", 50000))
+
+
+class SeenUrlSet:
+    """
+    Bounded, thread-safe LRU set of post URLs known to exist in management-api.
+
+    Membership is exact (no false positives), so a hit can safely skip the
+    network check; the least recently seen URLs are evicted past `capacity`.
+    """
+
+    def __init__(self, capacity: int = SEEN_URLS_CAPACITY):
+        self.capacity = capacity
+        self._urls = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            if url in self._urls:
+                self._urls.move_to_end(url)
+                return True
+            return False
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def add(self, url: str):
+        self.update((url,))
+
+    def update(self, urls: Iterable[str]):
+        with self._lock:
+            for url in urls:
+                if not url:
+                    continue
+                self._urls[url] = None
+                self._urls.move_to_end(url)
+            while len(self._urls) > self.capacity:
+                self._urls.popitem(last=False)
+
+    def unknown(self, urls: Iterable[str]) -> List[str]:
+        """Returns the URLs that are not in the set, preserving order."""
+        return [url for url in urls if url not in self]
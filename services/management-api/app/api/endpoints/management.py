@@ -1,25 +1,104 @@
 # FILE: ./services/management-api/app/api/endpoints/management.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only, raiseload, selectinload
+from typing import List, Optional, Union
+from datetime import datetime
+import base64
 import json
 import logging
-from common.rabbit import RabbitMQClient
-from common.database import get_db
+from common.rabbit import get_publisher
+from common import events
+from app.core import outbox
+from app.core.outbox import outbox_relay
+from common.database import get_db, get_async_db
 from app.models import management as models
 from app.schemas import management as schemas
-import json
 
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+SOURCES_CHANGED_EXCHANGE = "sources_changed"
+
+# روابطی که PostInDB سریالایز می‌کند؛ در مسیر async باید از قبل بارگذاری شوند
+POST_DETAIL_OPTIONS = (selectinload(models.Post.translations), selectinload(models.Post.images))
+# ستون‌هایی که PostSummary سریالایز می‌کند؛ روابط اصلاً بارگذاری نمی‌شوند
+POST_SUMMARY_OPTIONS = (
+    load_only(
+        models.Post.id, models.Post.source_id, models.Post.status, models.Post.version, models.Post.created_at,
+        models.Post.title_original, models.Post.url_original, models.Post.admin_message_id,
+    ),
+    raiseload(models.Post.translations),
+    raiseload(models.Post.images),
+)
+
+
+async def _get_post_or_404(db: AsyncSession, post_id: int) -> models.Post:
+    """پست را به همراه ترجمه‌ها و تصاویرش بارگذاری می‌کند یا خطای 404 برمی‌گرداند."""
+    result = await db.execute(select(models.Post).options(*POST_DETAIL_OPTIONS).where(models.Post.id == post_id))
+    db_post = result.scalars().first()
+    if not db_post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    return db_post
+
+
+async def _transition_post(db: AsyncSession, db_post: models.Post, target: models.PostStatus,
+                           expected_version: Optional[int] = None):
+    """
+    وضعیت پست را با compare-and-set تغییر می‌دهد: UPDATE ... WHERE status IN (وضعیت‌های مجاز مبدأ)
+    و در صورت ارسال expected_version، فقط اگر نسخه پست همان باشد. version یک واحد زیاد می‌شود.
+    انتقال غیرمجاز، تکراری یا همزمان با خطای 409 و بدون هیچ تغییر یا رویدادی رد می‌شود.
+    """
+    allowed = [status.value for status in models.ALLOWED_TRANSITIONS[target]]
+    criteria = [models.Post.id == db_post.id, models.Post.status.in_(allowed)]
+    if expected_version is not None:
+        criteria.append(models.Post.version == expected_version)
+    result = await db.execute(
+        update(models.Post)
+        .where(*criteria)
+        .values(status=target.value, version=models.Post.version + 1)
+    )
+    if result.rowcount != 1:
+        current = db_post.status
+        await db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Post {db_post.id} cannot move from '{current}' to '{target.value}'",
+        )
+
+
+def _notify_sources_changed(source_id: Optional[int] = None):
+    """
+    تغییر در منابع، مقصدها یا ارتباط بین آن‌ها را روی یک exchange از نوع fanout اعلام می‌کند
+    تا سرویس‌هایی که منابع را کش کرده‌اند (مثل publisher-service) کش خود را باطل کنند.
+    """
+    try:
+        get_publisher().publish_fanout(SOURCES_CHANGED_EXCHANGE, json.dumps({"source_id": source_id}))
+    except Exception as e:
+        logger.error(f"Failed to publish 'sources_changed' event for source_id: {source_id}. Error: {e}")
+
+
 # --- مدیریت منابع (Sources) ---
 @router.get("/sources", response_model=List[schemas.SourceInDB])
-def get_all_sources(db: Session = Depends(get_db)):
+async def get_all_sources(db: AsyncSession = Depends(get_async_db)):
     """لیست تمام منابع ثبت شده را برمی‌گرداند."""
-    return db.query(models.Source).all()
+    result = await db.execute(select(models.Source).options(selectinload(models.Source.destinations)))
+    return result.scalars().all()
+
+@router.get("/sources/{source_id}", response_model=schemas.SourceInDB)
+async def get_source(source_id: int, db: AsyncSession = Depends(get_async_db)):
+    """یک منبع را به همراه مقصدهای متصل به آن برمی‌گرداند."""
+    result = await db.execute(
+        select(models.Source).options(selectinload(models.Source.destinations)).where(models.Source.id == source_id)
+    )
+    db_source = result.scalars().first()
+    if not db_source:
+        raise HTTPException(status_code=404, detail="Source not found")
+    return db_source
 
 @router.post("/sources", response_model=schemas.SourceInDB, status_code=201)
 def create_source(source: schemas.SourceCreate, db: Session = Depends(get_db)):
@@ -31,6 +110,7 @@ def create_source(source: schemas.SourceCreate, db: Session = Depends(get_db)):
     db.add(new_source)
     db.commit()
     db.refresh(new_source)
+    _notify_sources_changed(new_source.id)
     return new_source
 
 @router.delete("/sources/{source_id}", status_code=204)
@@ -41,13 +121,14 @@ def delete_source(source_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_source)
     db.commit()
+    _notify_sources_changed(source_id)
     return
 
 # --- مدیریت مقصدها (Destinations) ---
 @router.get("/destinations", response_model=List[schemas.DestinationInDB])
 def get_all_destinations(db: Session = Depends(get_db)):
     """لیست تمام مقصدهای ثبت شده را برمی‌گرداند."""
-    return db.query(models.Destination).all()
+    return db.query(models.Destination).options(selectinload(models.Destination.sources)).all()
 
 @router.post("/destinations", response_model=schemas.DestinationInDB, status_code=201)
 def create_destination(dest: schemas.DestinationCreate, db: Session = Depends(get_db)):
@@ -59,6 +140,7 @@ def create_destination(dest: schemas.DestinationCreate, db: Session = Depends(ge
     db.add(new_dest)
     db.commit()
     db.refresh(new_dest)
+    _notify_sources_changed()
     return new_dest
 
 @router.delete("/destinations/{destination_id}", status_code=204)
@@ -69,44 +151,29 @@ def delete_destination(destination_id: int, db: Session = Depends(get_db)):
         
     db.delete(db_dest)
     db.commit()
+    _notify_sources_changed()
     return
 
 @router.post("/posts/{post_id}/reject", response_model=schemas.PostInDB)
-def reject_post(post_id: int, db: Session = Depends(get_db)):
-    """یک پست را رد می‌کند، وضعیت آن را تغییر می‌دهد و یک رویداد 'post_rejected' منتشر می‌کند."""
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
-    if not db_post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    # ۱. وضعیت پست در دیتابیس تغییر می‌کند
-    db_post.status = models.PostStatus.REJECTED
-    db.commit()
-    
-    # ۲. یک رویداد برای اطلاع‌رسانی به سرویس‌های دیگر منتشر می‌شود
-    # --- START: منطق اصلاح شده ---
-    # ما مستقیما رشته JSON ذخیره شده در admin_message_id را می خوانیم
+async def reject_post(post_id: int, expected_version: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
+    """
+    یک پست را رد می‌کند، وضعیت آن را تغییر می‌دهد و یک رویداد 'post_rejected' منتشر می‌کند.
+    رویداد در همان تراکنش در outbox نوشته و توسط relay پس‌زمینه ارسال می‌شود.
+    """
+    db_post = await _get_post_or_404(db, post_id)
+
+    # ۱. وضعیت پست در دیتابیس تغییر می‌کند (رد تکراری با 409 برمی‌گردد)
+    await _transition_post(db, db_post, models.PostStatus.REJECTED, expected_version)
+
+    # ۲. رویداد اطلاع‌رسانی به سرویس‌های دیگر؛ admin_message_id خودش یک رشته JSON است
     if db_post.admin_message_id:
-        try:
-            with RabbitMQClient() as client:
-                queue_name = 'post_rejected_queue'
-                
-                # پیام باید شامل خود رشته JSON باشد که در دیتابیس ذخیره شده
-                # توجه کنید که در اینجا مقدار db_post.admin_message_id خودش یک رشته JSON است،
-                # اما ما آن را در یک دیکشنری دیگر قرار می دهیم تا ساختار پیام کلی معتبر باشد.
-                message_body = json.dumps({
-                    "post_id": db_post.id,
-                    "admin_message_id": db_post.admin_message_id 
-                })
-                
-                client.channel.queue_declare(queue=queue_name, durable=True)
-                client.publish(exchange_name="", routing_key=queue_name, body=message_body)
-                logger.info(f"Published 'post_rejected' event for post_id: {post_id}")
-        except Exception as e:
-            logger.error(f"Failed to publish 'post_rejected' event for post_id: {post_id}. Error: {e}")
-            
-    # --- END: منطق اصلاح شده ---
-            
-    db.refresh(db_post)
+        outbox.enqueue(db, "post_rejected_queue", events.make_post_event(
+            events.POST_REJECTED, db_post.id,
+            admin_message_id=db_post.admin_message_id,
+        ))
+
+    await db.commit()
+    outbox_relay.notify()
     return db_post
 
 # --- مدیریت ارتباط بین منابع و مقصدها ---
@@ -124,6 +191,7 @@ def link_source_to_destination(source_id: int, destination_id: int, db: Session
         db_source.destinations.append(db_dest)
         db.commit()
         db.refresh(db_source)
+        _notify_sources_changed(source_id)
     return db_source
 
 # --- مدیریت پست‌ها (Posts) ---
@@ -160,16 +228,173 @@ def create_post(post: schemas.PostCreate, db: Session = Depends(get_db)):
     return new_post
 
 
+@router.post("/posts/batch", response_model=schemas.PostBatchResult, status_code=201)
+def create_posts_batch(batch: schemas.PostBatchCreate, db: Session = Depends(get_db)):
+    """
+    چندین پست را به همراه تصاویرشان در یک تراکنش و با insertهای گروهی ثبت می‌کند
+    و رویدادهای 'post_created' همه آن‌ها را در همان تراکنش در outbox ثبت می‌کند.
+    پست‌هایی که URL تکراری دارند نادیده گرفته شده و در 'skipped' برگردانده می‌شوند.
+    """
+    post_rows = []
+    images_by_url = {}
+    skipped = []
+    for post in batch.posts:
+        post_data_dict = post.model_dump(exclude={"image_urls_original"})
+        if post_data_dict.get("url_original") is None:
+            continue
+        url = str(post_data_dict["url_original"])
+        if url in images_by_url:
+            skipped.append(url)
+            continue
+        post_data_dict["url_original"] = url
+        post_rows.append(post_data_dict)
+        images_by_url[url] = [str(img_url) for img_url in (post.image_urls_original or [])]
+
+    if not post_rows:
+        return {"created": [], "skipped": skipped}
+
+    # پست‌هایی که از قبل در دیتابیس وجود دارند با یک کوئری IN کنار گذاشته می‌شوند
+    existing = {
+        row.url_original
+        for row in db.query(models.Post.url_original).filter(models.Post.url_original.in_(list(images_by_url))).all()
+    }
+    skipped.extend(existing)
+    post_rows = [row for row in post_rows if row["url_original"] not in existing]
+    if not post_rows:
+        return {"created": [], "skipped": skipped}
+
+    new_urls = [row["url_original"] for row in post_rows]
+    try:
+        db.execute(insert(models.Post), post_rows)
+        created = (
+            db.query(models.Post.id, models.Post.url_original, models.Post.title_original)
+            .filter(models.Post.url_original.in_(new_urls))
+            .all()
+        )
+        image_rows = [
+            {"url": img_url, "post_id": row.id}
+            for row in created
+            for img_url in images_by_url[row.url_original]
+        ]
+        if image_rows:
+            db.execute(insert(models.PostImage), image_rows)
+        # رویدادهای 'post_created' در همان تراکنش در outbox نوشته می‌شوند
+        outbox.enqueue_many(db, "post_created_queue", [
+            events.make_post_event(
+                events.POST_CREATED, row.id,
+                title_original=row.title_original,
+                featured_image_url=(images_by_url[row.url_original] or [None])[0],
+            )
+            for row in created
+        ])
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="One or more posts were created concurrently; retry the batch")
+
+    outbox_relay.notify()
+
+    return {
+        "created": [{"id": row.id, "url_original": row.url_original, "title_original": row.title_original} for row in created],
+        "skipped": skipped,
+    }
+
 @router.get("/posts/exists")
-def post_exists(url_original: str, db: Session = Depends(get_db)):
+async def post_exists(url_original: str, db: AsyncSession = Depends(get_async_db)):
     """بررسی می‌کند آیا پستی با URL مشخص شده وجود دارد یا خیر."""
-    db_post = db.query(models.Post).filter(models.Post.url_original == url_original).first()
-    return {"exists": db_post is not None}
+    result = await db.execute(select(models.Post.id).where(models.Post.url_original == url_original).limit(1))
+    return {"exists": result.first() is not None}
+
+@router.post("/posts/exists/batch", response_model=schemas.PostExistsBatchResponse)
+async def posts_exist_batch(request: schemas.PostExistsBatchRequest, db: AsyncSession = Depends(get_async_db)):
+    """از میان لیست URLهای ورودی، آن‌هایی را که قبلاً ثبت شده‌اند با یک کوئری IN برمی‌گرداند."""
+    urls = list(dict.fromkeys(u for u in request.urls if u))
+    if not urls:
+        return {"existing": []}
+    result = await db.execute(select(models.Post.url_original).where(models.Post.url_original.in_(urls)))
+    return {"existing": list(result.scalars().all())}
+
+@router.get("/posts/recent-urls", response_model=List[str])
+def get_recent_post_urls(limit: int = Query(5000, ge=1, le=50000), db: Session = Depends(get_db)):
+    """URL آخرین پست‌های ثبت شده را برای گرم کردن کش محلی fetcher برمی‌گرداند."""
+    rows = (
+        db.query(models.Post.url_original)
+        .filter(models.Post.url_original.isnot(None))
+        .order_by(models.Post.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [row.url_original for row in rows]
+
+def _encode_cursor(db_post: models.Post) -> str:
+    raw = f"{db_post.created_at.isoformat()}|{db_post.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, post_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+@router.get("/posts", response_model=Union[schemas.PostPage, schemas.PostSummaryPage])
+async def list_posts(
+    status: Optional[List[models.PostStatus]] = Query(None),
+    source_id: Optional[int] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    summary: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    لیست پست‌ها با صفحه‌بندی keyset روی (created_at, id) به ترتیب نزولی.
+    برای صفحه بعد، مقدار next_cursor را در پارامتر cursor ارسال کنید.
+    با summary=true فقط ستون‌های PostSummary خوانده می‌شوند: نه content_original و نه کوئری‌های
+    ترجمه‌ها و تصاویر (raiseload تضمین می‌کند که بارگذاری تصادفی آنها به جای کوئری اضافه خطا بدهد).
+    """
+    if summary:
+        stmt = select(models.Post).options(*POST_SUMMARY_OPTIONS)
+    else:
+        stmt = select(models.Post).options(*POST_DETAIL_OPTIONS)
+    if status:
+        stmt = stmt.where(models.Post.status.in_([s.value for s in status]))
+    if source_id is not None:
+        stmt = stmt.where(models.Post.source_id == source_id)
+    if created_after is not None:
+        stmt = stmt.where(models.Post.created_at >= created_after)
+    if created_before is not None:
+        stmt = stmt.where(models.Post.created_at < created_before)
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        stmt = stmt.where(
+            or_(
+                models.Post.created_at < cursor_created_at,
+                and_(models.Post.created_at == cursor_created_at, models.Post.id < cursor_id),
+            )
+        )
+    stmt = stmt.order_by(models.Post.created_at.desc(), models.Post.id.desc()).limit(limit + 1)
+
+    posts = (await db.execute(stmt)).scalars().all()
+    next_cursor = _encode_cursor(posts[limit - 1]) if len(posts) > limit else None
+    posts = posts[:limit]
+
+    if summary:
+        return schemas.PostSummaryPage(items=[schemas.PostSummary.model_validate(p) for p in posts], next_cursor=next_cursor)
+    return schemas.PostPage(items=[schemas.PostInDB.model_validate(p) for p in posts], next_cursor=next_cursor)
 
 @router.get("/posts/pending", response_model=List[schemas.PostInDB])
 def get_pending_posts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """لیست پست‌های در انتظار تایید را برمی‌گرداند."""
-    posts = db.query(models.Post).filter(models.Post.status == models.PostStatus.PENDING_APPROVAL).offset(skip).limit(limit).all()
+    posts = (
+        db.query(models.Post)
+        .options(*POST_DETAIL_OPTIONS)
+        .filter(models.Post.status == models.PostStatus.PENDING_APPROVAL)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
     return posts
 
 @router.post("/posts/{post_id}/admin-message-info", response_model=schemas.PostInDB)
@@ -182,8 +407,8 @@ def set_admin_message_info(post_id: int, info: schemas.AdminMessageInfoUpdate, d
     db_post.admin_message_id = json.dumps(info.admin_messages)
     db_post.admin_chat_id = None 
     db.commit()
-    db.refresh(db_post)
-    return db_post
+    # پست را به همراه روابطش دوباره می‌خوانیم تا سریالایز PostInDB کوئری اضافه نزند
+    return db.query(models.Post).options(*POST_DETAIL_OPTIONS).filter(models.Post.id == post_id).first()
 
 @router.get("/posts/fetched", response_model=List[schemas.PostInDB])
 def get_fetched_posts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
@@ -194,6 +419,7 @@ def get_fetched_posts(skip: int = 0, limit: int = 100, db: Session = Depends(get
     posts = (
         db.query(models.Post)
         .join(models.Post.translations)  # <-- اتصال به جدول ترجمه‌ها
+        .options(*POST_DETAIL_OPTIONS)
         .filter(models.Post.status == models.PostStatus.FETCHED)
         .offset(skip)
         .limit(limit)
@@ -204,93 +430,152 @@ def get_fetched_posts(skip: int = 0, limit: int = 100, db: Session = Depends(get
 @router.get("/posts/status/preprocessed", response_model=List[schemas.PostInDB])
 def get_preprocessed_posts(db: Session = Depends(get_db)):
     """پست‌هایی که پیش‌پردازش شده و منتظر بازبینی اولیه مدیر هستند را برمی‌گرداند."""
-    return db.query(models.Post).filter(models.Post.status == models.PostStatus.PREPROCESSED).all()
+    return db.query(models.Post).options(*POST_DETAIL_OPTIONS).filter(models.Post.status == models.PostStatus.PREPROCESSED).all()
 
 @router.get("/posts/status/ready-for-final-approval", response_model=List[schemas.PostInDB])
 def get_posts_ready_for_final_approval(db: Session = Depends(get_db)):
     """پست‌هایی که پردازش محتوای آنها تمام شده و منتظر تایید نهایی هستند را برمی‌گرداند."""
-    return db.query(models.Post).filter(models.Post.status == models.PostStatus.READY_FOR_FINAL_APPROVAL).all()
+    return (
+        db.query(models.Post)
+        .options(*POST_DETAIL_OPTIONS)
+        .filter(models.Post.status == models.PostStatus.READY_FOR_FINAL_APPROVAL)
+        .all()
+    )
 
 @router.post("/posts/{post_id}/approve", response_model=schemas.PostInDB)
-def approve_post(post_id: int, db: Session = Depends(get_db)):
+async def approve_post(post_id: int, expected_version: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """یک پست را تایید می‌کند، وضعیت آن را به 'approved' تغییر می‌دهد و پیامی به RabbitMQ ارسال می‌کند."""
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
-    if not db_post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    db_post.status = models.PostStatus.APPROVED
-    db.commit()
-    
-    try:
-        with RabbitMQClient() as client:
-            message_body = json.dumps({"post_id": db_post.id})
-            client.channel.queue_declare(queue='post_approval_queue', durable=True)
-            client.publish(exchange_name="", routing_key="post_approval_queue", body=message_body)
-            logger.info(f"Successfully sent approval message for post_id: {post_id} to RabbitMQ.")
-    except Exception as e:
-        logger.error(f"Failed to send message to RabbitMQ for post_id: {post_id}. Error: {e}")
-    
-    db.refresh(db_post)
+    db_post = await _get_post_or_404(db, post_id)
+
+    await _transition_post(db, db_post, models.PostStatus.APPROVED, expected_version)
+    translation = db_post.translations[0] if db_post.translations else None
+    outbox.enqueue(db, "post_approval_queue", events.make_post_event(
+        events.POST_APPROVED, db_post.id,
+        source_id=db_post.source_id,
+        url_original=db_post.url_original,
+        translation_id=translation.id if translation else None,
+        title_translated=translation.title_translated if translation else None,
+        content_telegram=translation.content_telegram if translation else None,
+        featured_image_url=translation.featured_image_url if translation else None,
+    ))
+    await db.commit()
+    outbox_relay.notify()
+
     return db_post
 
 @router.post("/posts/{post_id}/process-content", status_code=202)
-def request_content_processing(post_id: int, request_body: schemas.ContentProcessingRequest, db: Session = Depends(get_db)):
+async def request_content_processing(post_id: int, request_body: schemas.ContentProcessingRequest,
+                                     expected_version: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """
     درخواست برای پردازش محتوای یک پست برای پلتفرم‌های مشخص.
-    وضعیت پست را به 'processing_content' تغییر می‌دهد و یک رویداد به RabbitMQ ارسال می‌کند.
+    وضعیت پست را به 'processing_content' تغییر می‌دهد و در همان تراکنش یک رویداد در outbox ثبت می‌کند.
     """
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
+    db_post = await db.get(models.Post, post_id)
     if not db_post:
         raise HTTPException(status_code=404, detail="Post not found")
 
-    db_post.status = models.PostStatus.PROCESSING_CONTENT
-    db.commit()
+    # پستی که تایید، رد یا منتشر شده با 409 رد می‌شود و کار LLM بی‌فایده راه نمی‌اندازد
+    await _transition_post(db, db_post, models.PostStatus.PROCESSING_CONTENT, expected_version)
+    # از request_body.platforms برای دسترسی به لیست پلتفرم‌ها استفاده می‌کنیم
+    outbox.enqueue(db, "content_processing_queue",
+                   events.make_post_event(events.CONTENT_PROCESSING, post_id, platforms=request_body.platforms))
+    await db.commit()
+    outbox_relay.notify()
+    logger.info(f"Queued content processing request for post_id: {post_id} for platforms: {request_body.platforms}")
 
-    try:
-        with RabbitMQClient() as client:
-            queue_name = 'content_processing_queue'
-            # از request_body.platforms برای دسترسی به لیست پلتفرم‌ها استفاده می‌کنیم
-            message_body = json.dumps({"post_id": post_id, "platforms": request_body.platforms})
-            client.channel.queue_declare(queue=queue_name, durable=True)
-            client.publish(exchange_name="", routing_key=queue_name, body=message_body)
-            logger.info(f"Sent content processing request for post_id: {post_id} for platforms: {request_body.platforms}")
-    except Exception as e:
-        logger.error(f"Failed to send message to RabbitMQ for post_id: {post_id}. Error: {e}")
-        db_post.status = models.PostStatus.PENDING_APPROVAL 
-        db.commit()
-        raise HTTPException(status_code=500, detail="Could not send processing request")
-
-    db.refresh(db_post)
     return {"message": "Content processing requested successfully."}
 
 
 
 @router.post("/posts/{post_id}/ready-for-final-approval", response_model=schemas.PostInDB)
-def set_post_status_to_ready(post_id: int, db: Session = Depends(get_db)):
+async def set_post_status_to_ready(post_id: int, expected_version: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """وضعیت پست را به 'ready_for_final_approval' تغییر می‌دهد (معمولاً توسط processor-service فراخوانی می‌شود)."""
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
-    if not db_post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    db_post.status = models.PostStatus.READY_FOR_FINAL_APPROVAL
-    db.commit()
-    db.refresh(db_post)
+    db_post = await _get_post_or_404(db, post_id)
+
+    await _transition_post(db, db_post, models.PostStatus.READY_FOR_FINAL_APPROVAL, expected_version)
+    await db.commit()
     logger.info(f"Post {post_id} status changed to READY_FOR_FINAL_APPROVAL.")
     return db_post
 
 @router.post("/posts/{post_id}/preprocessed", response_model=schemas.PostInDB)
-def set_post_status_to_preprocessed(post_id: int, db: Session = Depends(get_db)):
+async def set_post_status_to_preprocessed(post_id: int, expected_version: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """وضعیت پست را به 'preprocessed' تغییر می‌دهد (توسط processor-service فراخوانی می‌شود)."""
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
-    if not db_post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    db_post.status = models.PostStatus.PREPROCESSED
-    db.commit()
-    db.refresh(db_post)
+    db_post = await _get_post_or_404(db, post_id)
+
+    await _transition_post(db, db_post, models.PostStatus.PREPROCESSED, expected_version)
+    await db.commit()
     logger.info(f"Post {post_id} status changed to PREPROCESSED.")
     return db_post
 
+def _translation_event_fields(translation: models.PostTranslation) -> dict:
+    return events.translation_event_fields(
+        schemas.PostTranslationInDB.model_validate(translation).model_dump(mode="json")
+    )
+
+@router.post("/posts/{post_id}/preprocessing-result", response_model=schemas.PostTranslationInDB, status_code=201)
+async def save_preprocessing_result(post_id: int, result: schemas.PreprocessingResult, db: AsyncSession = Depends(get_async_db)):
+    """
+    نتیجه مرحله ۱ processor را در یک تراکنش ثبت می‌کند: ترجمه عنوان ذخیره، وضعیت پست 'preprocessed'
+    و رویداد بازبینی برای telegram-manager در outbox نوشته می‌شود.
+    """
+    db_post = await db.get(models.Post, post_id)
+    if not db_post:
+        raise HTTPException(status_code=404, detail="Post not found")
+    # پیام تکراری (redelivery) پس از ثبت نتیجه با 409 رد می‌شود و ترجمه دوم ساخته نمی‌شود
+    await _transition_post(db, db_post, models.PostStatus.PREPROCESSED)
+
+    translation = models.PostTranslation(
+        post_id=post_id,
+        language=result.language,
+        title_translated=result.title_translated,
+        score=result.score,
+        featured_image_url=str(result.featured_image_url) if result.featured_image_url else None,
+        # همه ستون‌ها مقدار صریح می‌گیرند تا پس از flush، خواندن آنها در حالت async به lazy load نیفتد
+        content_translated=None,
+        content_telegram=None,
+        content_instagram=None,
+        content_twitter=None,
+    )
+    db.add(translation)
+    await db.flush()
+
+    outbox.enqueue(db, "review_notifications_queue", events.make_post_event(
+        events.REVIEW_NOTIFICATION, post_id, **_translation_event_fields(translation),
+    ))
+    await db.commit()
+    outbox_relay.notify()
+    logger.info(f"Saved preprocessing result for post {post_id}; status changed to PREPROCESSED.")
+    return translation
+
+@router.post("/posts/{post_id}/content-result", response_model=schemas.PostTranslationInDB)
+async def save_content_result(post_id: int, result: schemas.ContentResult, db: AsyncSession = Depends(get_async_db)):
+    """
+    نتیجه مرحله ۲ processor را در یک تراکنش ثبت می‌کند: ترجمه با محتوای جدید به‌روز، وضعیت پست
+    'ready_for_final_approval' و رویداد تایید نهایی برای telegram-manager در outbox نوشته می‌شود.
+    فیلدهای None نادیده گرفته می‌شوند تا ترجمه یا خلاصه‌های قبلی پاک نشوند.
+    """
+    db_post = await _get_post_or_404(db, post_id)
+    translation = next(
+        (t for t in db_post.translations if result.translation_id in (None, t.id)),
+        None,
+    )
+    if not translation:
+        raise HTTPException(status_code=404, detail="Translation not found")
+    await _transition_post(db, db_post, models.PostStatus.READY_FOR_FINAL_APPROVAL)
+
+    for key, value in result.model_dump(exclude_unset=True, exclude_none=True, exclude={"translation_id"}).items():
+        setattr(translation, key, value)
+
+    outbox.enqueue(db, "final_approval_notifications_queue", events.make_post_event(
+        events.FINAL_APPROVAL_NOTIFICATION, post_id,
+        admin_message_id=db_post.admin_message_id,
+        **_translation_event_fields(translation),
+    ))
+    await db.commit()
+    outbox_relay.notify()
+    logger.info(f"Saved content result for post {post_id}; status changed to READY_FOR_FINAL_APPROVAL.")
+    return translation
+
 @router.patch("/translations/{translation_id}", response_model=schemas.PostTranslationInDB)
 def update_translation(translation_id: int, translation_update: schemas.PostTranslationCreate, db: Session = Depends(get_db)):
     """یک رکورد ترجمه موجود را با خلاصه‌های محتوا به‌روزرسانی می‌کند."""
@@ -309,25 +594,19 @@ def update_translation(translation_id: int, translation_update: schemas.PostTran
 
 
 @router.post("/posts/{post_id}/pending", response_model=schemas.PostInDB)
-def set_post_status_to_pending(post_id: int, db: Session = Depends(get_db)):
+async def set_post_status_to_pending(post_id: int, expected_version: Optional[int] = None, db: AsyncSession = Depends(get_async_db)):
     """وضعیت یک پست را به 'pending_approval' تغییر می‌دهد."""
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
-    if not db_post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    
-    db_post.status = models.PostStatus.PENDING_APPROVAL
-    db.commit()
-    db.refresh(db_post)
+    db_post = await _get_post_or_404(db, post_id)
+
+    await _transition_post(db, db_post, models.PostStatus.PENDING_APPROVAL, expected_version)
+    await db.commit()
     logger.info(f"Post {post_id} status changed to PENDING_APPROVAL by Telegram Manager.")
     return db_post
 
 @router.get("/posts/{post_id}", response_model=schemas.PostInDB)
-def get_post(post_id: int, db: Session = Depends(get_db)):
+async def get_post(post_id: int, db: AsyncSession = Depends(get_async_db)):
     """اطلاعات یک پست مشخص را بر اساس شناسه آن برمی‌گرداند."""
-    db_post = db.query(models.Post).filter(models.Post.id == post_id).first()
-    if not db_post:
-        raise HTTPException(status_code=404, detail="Post not found")
-    return db_post
+    return await _get_post_or_404(db, post_id)
 
 @router.post("/posts/{post_id}/translations", response_model=schemas.PostTranslationInDB, status_code=201)
 def create_translation_for_post(post_id: int, translation: schemas.PostTranslationCreate, db: Session = Depends(get_db)):
@@ -0,0 +1,190 @@
+# FILE: ./services/management-api/app/core/outbox.py
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Iterable, List
+
+import pika
+from sqlalchemy import delete, select, update
+
+from common.database import SessionLocal
+from common.rabbit import get_publisher
+from app.models.management import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 1.0))
+OUTBOX_MAX_BACKOFF = float(os.getenv("OUTBOX_MAX_BACKOFF", 30))
+OUTBOX_RETENTION_HOURS = int(os.getenv("OUTBOX_RETENTION_HOURS", 24))
+# رویدادی که این تعداد بار ارسالش شکست بخورد پارک می‌شود (در جدول می‌ماند ولی دیگر برداشته نمی‌شود)
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 10))
+
+
+def enqueue(db, routing_key: str, payload: str, exchange: str = ""):
+    """
+    یک رویداد را در outbox همان session قرار می‌دهد؛ با commit تراکنشِ درخواست ذخیره می‌شود.
+    با Session و AsyncSession هر دو کار می‌کند.
+    """
+    db.add(OutboxEvent(exchange=exchange, routing_key=routing_key, payload=payload, attempts=0))
+
+
+def enqueue_many(db, routing_key: str, payloads: Iterable[str], exchange: str = ""):
+    db.add_all([OutboxEvent(exchange=exchange, routing_key=routing_key, payload=payload, attempts=0)
+                for payload in payloads])
+
+
+class OutboxRelay:
+    """
+    رویدادهای منتشرنشده outbox را به‌صورت دسته‌ای روی کانال مشترک RabbitMQ می‌فرستد.
+
+    سطرها با SELECT ... FOR UPDATE SKIP LOCKED برداشته می‌شوند تا چند worker یا چند نسخه
+    از management-api بتوانند همزمان relay اجرا کنند. هر رویداد پس از تایید broker علامت
+    published می‌خورد (تحویل حداقل-یک‌بار). اگر broker در دسترس نباشد، دسته بدون تغییر attempts
+    رها و با backoff دوباره تلاش می‌شود. اگر خود رویداد ارسال نشود، attempts آن زیاد می‌شود، بقیه
+    رویدادهای همان مقصد (برای حفظ ترتیب) به دور بعد می‌روند و مقصدهای دیگر ادامه می‌یابند؛ رویدادی که
+    به OUTBOX_MAX_ATTEMPTS برسد پارک و لاگ می‌شود تا پشت سرش گیر نکند.
+    `notify()` پس از commit، relay را بدون انتظار برای poll بیدار می‌کند.
+    """
+
+    def __init__(self, batch_size: int = OUTBOX_BATCH_SIZE, poll_interval: float = OUTBOX_POLL_INTERVAL,
+                 max_attempts: int = OUTBOX_MAX_ATTEMPTS):
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._last_cleanup = datetime.min
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="outbox-relay", daemon=True)
+        self._thread.start()
+        logger.info("Outbox relay started.")
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def notify(self):
+        self._wakeup.set()
+
+    def _run(self):
+        backoff = self.poll_interval
+        while not self._stopped.is_set():
+            try:
+                published = self.relay_once()
+                backoff = self.poll_interval
+                self._cleanup()
+                if published >= self.batch_size:
+                    # هنوز رویداد در صف است؛ بدون انتظار ادامه می‌دهیم
+                    continue
+            except Exception as e:
+                backoff = min(backoff * 2, OUTBOX_MAX_BACKOFF)
+                logger.error(f"Outbox relay failed; retrying in {backoff:.1f} seconds. Error: {e}")
+            self._wakeup.wait(backoff)
+            self._wakeup.clear()
+
+    def relay_once(self) -> int:
+        """یک دسته را منتشر می‌کند و تعداد رویدادهای منتشرشده را برمی‌گرداند."""
+        with SessionLocal() as db:
+            rows: List[OutboxEvent] = db.execute(
+                select(OutboxEvent)
+                .where(OutboxEvent.published_at.is_(None), OutboxEvent.attempts < self.max_attempts)
+                .order_by(OutboxEvent.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not rows:
+                db.rollback()
+                return 0
+
+            publisher = get_publisher()
+            published_ids = []
+            failed_rows = []
+            blocked = set()
+            error = None
+            try:
+                # رویدادهای پشت‌سرهم با مقصد یکسان با یک publish_many ارسال می‌شوند و ترتیب حفظ می‌شود
+                for key, group in groupby(rows, key=lambda row: (row.exchange, row.routing_key)):
+                    if key in blocked:
+                        continue
+                    group = list(group)
+                    try:
+                        self._publish(publisher, key, group)
+                        published_ids.extend(row.id for row in group)
+                        continue
+                    except pika.exceptions.AMQPConnectionError:
+                        raise
+                    except Exception as e:
+                        logger.warning(f"Outbox publish to {key} failed ({e}); retrying its events one by one.")
+                    # یک رویداد خراب نباید کل گروه را پارک کند؛ رویدادهای بعد از آن در همین مقصد به دور بعد می‌روند
+                    for row in group:
+                        try:
+                            self._publish(publisher, key, [row])
+                        except pika.exceptions.AMQPConnectionError:
+                            raise
+                        except Exception as e:
+                            logger.error(f"Outbox event {row.id} to {key} failed (attempt {row.attempts + 1}): {e}")
+                            failed_rows.append(row)
+                            blocked.add(key)
+                            break
+                        published_ids.append(row.id)
+            except pika.exceptions.AMQPConnectionError as e:
+                # broker در دسترس نیست؛ تقصیر رویدادها نیست و attempts آنها زیاد نمی‌شود
+                error = e
+
+            parked = [f"{row.id} ({row.exchange or row.routing_key})" for row in failed_rows
+                      if row.attempts + 1 >= self.max_attempts]
+            now = datetime.utcnow()
+            if published_ids:
+                db.execute(update(OutboxEvent).where(OutboxEvent.id.in_(published_ids)).values(published_at=now))
+            if failed_rows:
+                db.execute(update(OutboxEvent).where(OutboxEvent.id.in_([row.id for row in failed_rows]))
+                           .values(attempts=OutboxEvent.attempts + 1))
+            db.commit()
+
+        if parked:
+            logger.error(f"Outbox events parked after {self.max_attempts} failed attempts: {', '.join(parked)}")
+        if error is not None:
+            raise error
+        if failed_rows and not published_ids:
+            # هیچ رویدادی نرفت؛ با خطا به _run برمی‌گردیم تا دور بعد با backoff اجرا شود
+            raise RuntimeError(f"{len(failed_rows)} outbox event(s) could not be published")
+        logger.info(f"Outbox relay published {len(published_ids)} events.")
+        return len(published_ids)
+
+    @staticmethod
+    def _publish(publisher, key, rows: List[OutboxEvent]):
+        exchange, routing_key = key
+        if exchange:
+            for row in rows:
+                publisher.publish_fanout(exchange, row.payload)
+        else:
+            publisher.publish_many(routing_key, [row.payload for row in rows])
+
+    def _cleanup(self):
+        """رویدادهای منتشرشده قدیمی‌تر از OUTBOX_RETENTION_HOURS را (حداکثر ساعتی یک‌بار) پاک می‌کند."""
+        now = datetime.utcnow()
+        if now - self._last_cleanup < timedelta(hours=1):
+            return
+        self._last_cleanup = now
+        with SessionLocal() as db:
+            result = db.execute(delete(OutboxEvent).where(
+                OutboxEvent.published_at.is_not(None),
+                OutboxEvent.published_at < now - timedelta(hours=OUTBOX_RETENTION_HOURS),
+            ))
+            db.commit()
+        if result.rowcount:
+            logger.info(f"Outbox cleanup removed {result.rowcount} published events.")
+
+
+outbox_relay = OutboxRelay()
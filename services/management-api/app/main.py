@@ -3,19 +3,61 @@ import time
 from fastapi import FastAPI, Depends
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 
 from common.logging_config import setup_logging
-from common.database import get_db, engine
+from common.database import get_db, engine, async_engine
 from common.rabbit import RabbitMQClient
+from common.metrics import instrument_fastapi, register_db_pool
 
 from app.models import management as management_models
 from app.api.router import api_router
+from app.core.outbox import outbox_relay
 
 setup_logging()
 logger = logging.getLogger(__name__)
 
 
+def ensure_indexes():
+    """
+    create_all ایندکس‌های جدید را روی جداولی که از قبل وجود دارند نمی‌سازد؛
+    این تابع ایندکس‌های تعریف شده در مدل‌ها که در دیتابیس نیستند را اضافه می‌کند.
+    """
+    inspector = inspect(engine)
+    for table in management_models.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=engine)
+                logger.info(f"ایندکس {index.name} روی جدول {table.name} ایجاد شد.")
+
+
+def ensure_columns():
+    """
+    create_all ستون‌های جدید را هم به جداول موجود اضافه نمی‌کند؛ این تابع ستون‌های تعریف شده
+    در مدل‌ها (مثل posts.version) را که در دیتابیس نیستند با مقدار پیش‌فرض سرور اضافه می‌کند.
+    """
+    inspector = inspect(engine)
+    for table in management_models.Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=engine.dialect)
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+            if not column.nullable:
+                ddl += " NOT NULL"
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+            with engine.begin() as connection:
+                connection.execute(text(ddl))
+            logger.info(f"ستون {column.name} به جدول {table.name} اضافه شد.")
+
+
 def init_db():
     """برای اتصال به دیتابیس با منطق تلاش مجدد و لاگ دقیق خطا تلاش می‌کند."""
     db_connected = False
@@ -26,6 +68,8 @@ def init_db():
                 connection.execute(text('SELECT 1'))
             
             management_models.Base.metadata.create_all(bind=engine)
+            ensure_columns()
+            ensure_indexes()
             logger.info("✅ اتصال به پایگاه داده با موفقیت برقرار و جداول ایجاد شدند!")
             db_connected = True
             break
@@ -48,6 +92,10 @@ def init_db():
 init_db()
 
 app = FastAPI(title="RoboPost - Management API")
+# /metrics، تاخیر درخواست‌ها به تفکیک route و وضعیت pool اتصال‌های هر دو engine
+instrument_fastapi(app)
+register_db_pool(engine, "sync")
+register_db_pool(async_engine.sync_engine, "async")
 
 @app.on_event("startup")
 def startup_event():
@@ -57,6 +105,13 @@ def startup_event():
             logger.info("تست اتصال به RabbitMQ در هنگام راه‌اندازی موفقیت‌آمیز بود.")
     except Exception as e:
         logger.error(f"اتصال به RabbitMQ در هنگام راه‌اندازی با خطا مواجه شد: {e}")
+    # رویدادهای ثبت‌شده در outbox (از جمله رویدادهای باقی‌مانده از اجرای قبلی) در پس‌زمینه منتشر می‌شوند
+    outbox_relay.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    outbox_relay.stop()
+    await async_engine.dispose()
 
 app.include_router(api_router)
 
@@ -1,6 +1,6 @@
 # FILE: ./services/management-api/app/models/management.py
 
-from sqlalchemy import Column, Integer, String, JSON, Table, ForeignKey, Text, Enum, DateTime, Float
+from sqlalchemy import Column, Integer, String, JSON, Table, ForeignKey, Text, Enum, DateTime, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from common.database import Base
@@ -49,6 +49,33 @@ class PostStatus(str, enum.Enum):
     PUBLISHED = "published"
     REJECTED = "rejected"
 
+# ماشین حالت پست: برای هر وضعیت مقصد، وضعیت‌هایی که می‌توان از آنها به آن رسید.
+# تغییر وضعیت فقط با UPDATE ... WHERE status IN (...) انجام می‌شود؛ انتقال غیرمجاز یا تکراری رد می‌شود.
+ALLOWED_TRANSITIONS = {
+    PostStatus.FETCHED: frozenset(),
+    PostStatus.PREPROCESSED: frozenset({PostStatus.FETCHED}),
+    # پس از ارسال پیام بازبینی اولیه، پس از به‌روزرسانی پیام تایید نهایی، و وقتی کار پردازش محتوا
+    # پس از همه تلاش‌ها در صف dead پارک شود (تا مدیر بتواند دوباره درخواست دهد)
+    PostStatus.PENDING_APPROVAL: frozenset({
+        PostStatus.PREPROCESSED, PostStatus.READY_FOR_FINAL_APPROVAL, PostStatus.PROCESSING_CONTENT,
+    }),
+    # درخواست پلتفرم دوم در حین پردازش پلتفرم اول هم پذیرفته می‌شود
+    PostStatus.PROCESSING_CONTENT: frozenset({
+        PostStatus.PREPROCESSED, PostStatus.PENDING_APPROVAL, PostStatus.READY_FOR_FINAL_APPROVAL,
+        PostStatus.PROCESSING_CONTENT,
+    }),
+    # نتیجه هر کار پردازش محتوا تا پیش از تایید یا رد پست ذخیره می‌شود، حتی اگر کار دیگری زودتر تمام شده باشد
+    PostStatus.READY_FOR_FINAL_APPROVAL: frozenset({
+        PostStatus.PROCESSING_CONTENT, PostStatus.READY_FOR_FINAL_APPROVAL, PostStatus.PENDING_APPROVAL,
+    }),
+    PostStatus.APPROVED: frozenset({PostStatus.PENDING_APPROVAL, PostStatus.READY_FOR_FINAL_APPROVAL}),
+    PostStatus.PUBLISHED: frozenset({PostStatus.APPROVED}),
+    PostStatus.REJECTED: frozenset({
+        PostStatus.FETCHED, PostStatus.PREPROCESSED, PostStatus.PENDING_APPROVAL,
+        PostStatus.PROCESSING_CONTENT, PostStatus.READY_FOR_FINAL_APPROVAL,
+    }),
+}
+
 class PostImage(Base):
     __tablename__ = "post_images"
     id = Column(Integer, primary_key=True, index=True)
@@ -59,10 +86,16 @@ class PostImage(Base):
 
 class Post(Base):
     __tablename__ = "posts"
+    # ایندکس‌های ترکیبی برای صفحه‌بندی keyset روی (created_at, id) با فیلتر وضعیت یا منبع
+    __table_args__ = (
+        Index("ix_posts_status_created_at", "status", "created_at"),
+        Index("ix_posts_source_id_created_at", "source_id", "created_at"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     url_original = Column(String(767), unique=True, index=True)
     source_id = Column(Integer, ForeignKey("sources.id"))
     status = Column(String(50), default=PostStatus.FETCHED.value, nullable=False)
+    version = Column(Integer, nullable=False, default=1, server_default="1") # با هر تغییر وضعیت یک واحد زیاد می‌شود
     created_at = Column(DateTime(timezone=True), server_default=func.now()) # تاریخ ایجاد خودکار
     admin_chat_id = Column(String(255)) # شناسه چت مدیر
     admin_message_id = Column(String(255)) # شناسه پیام مدیریتی
@@ -84,4 +117,22 @@ class PostTranslation(Base):
     content_telegram = Column(Text)
     content_instagram = Column(Text)
     content_twitter = Column(Text)
-    post = relationship("Post", back_populates="translations")
\ No newline at end of file
+    post = relationship("Post", back_populates="translations")
+
+class OutboxEvent(Base):
+    """
+    رویدادهایی که باید به RabbitMQ ارسال شوند؛ در همان تراکنش تغییر وضعیت نوشته می‌شوند
+    و relay پس‌زمینه (app/core/outbox.py) آنها را منتشر و published_at را پر می‌کند.
+    exchange خالی یعنی exchange پیش‌فرض و routing_key همان نام صف است.
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index("ix_outbox_events_published_at_id", "published_at", "id"),
+    )
+    id = Column(Integer, primary_key=True)
+    exchange = Column(String(255), nullable=False, default="")
+    routing_key = Column(String(255), nullable=False)
+    payload = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    published_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
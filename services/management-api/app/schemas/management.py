@@ -48,6 +48,22 @@ class PostTranslationInDB(PostTranslationBase):
     post_id: int
     model_config = ConfigDict(from_attributes=True)
 
+# --- Processor Result Schemas ---
+# نتیجه هر مرحله processor که با یک درخواست ذخیره، وضعیت پست را جابه‌جا و رویداد بعدی را ثبت می‌کند
+class PreprocessingResult(BaseModel):
+    language: str = "fa"
+    title_translated: str
+    score: Optional[float] = None
+    featured_image_url: Optional[HttpUrl] = None
+
+class ContentResult(BaseModel):
+    language: str = "fa"
+    translation_id: Optional[int] = None  # پیش‌فرض: اولین ترجمه پست
+    content_translated: Optional[str] = None
+    content_telegram: Optional[str] = None
+    content_instagram: Optional[str] = None
+    content_twitter: Optional[str] = None
+
 # --- Post Schemas ---
 class PostBase(BaseModel):
     title_original: Optional[str] = None
@@ -75,6 +91,7 @@ class PostInDB(PostBase):
     id: int
     source_id: int
     status: PostStatus
+    version: int = 1
     created_at: datetime
     admin_chat_id: Optional[str] = None
     admin_message_id: Optional[str] = None
@@ -82,6 +99,26 @@ class PostInDB(PostBase):
     images: List[PostImageInDB] = []
     model_config = ConfigDict(from_attributes=True)
 
+class PostSummary(BaseModel):
+    """نمای سبک پست برای لیست‌ها؛ فقط ستون‌های خود پست، بدون content_original، ترجمه‌ها و تصاویر."""
+    id: int
+    source_id: int
+    status: PostStatus
+    version: int = 1
+    created_at: datetime
+    title_original: Optional[str] = None
+    url_original: Optional[HttpUrl] = None
+    admin_message_id: Optional[str] = None
+    model_config = ConfigDict(from_attributes=True)
+
+class PostPage(BaseModel):
+    items: List[PostInDB]
+    next_cursor: Optional[str] = None
+
+class PostSummaryPage(BaseModel):
+    items: List[PostSummary]
+    next_cursor: Optional[str] = None
+
 # --- اسکماهای نهایی برای نمایش روابط ---
 class SourceInDB(SourceInDBBase):
     destinations: List[DestinationInDBBase] = []
@@ -96,6 +133,25 @@ class PostTranslationCreate(PostTranslationBase):
     pass
 
 
+class PostBatchCreate(BaseModel):
+    posts: List[PostCreate]
+
+class PostBatchItem(BaseModel):
+    id: int
+    url_original: str
+    title_original: Optional[str] = None
+
+class PostBatchResult(BaseModel):
+    created: List[PostBatchItem] = []
+    skipped: List[str] = []
+
+class PostExistsBatchRequest(BaseModel):
+    urls: List[str]
+
+class PostExistsBatchResponse(BaseModel):
+    existing: List[str]
+
+
 class PostUpdate(BaseModel):
     status: Optional[PostStatus] = None
     admin_chat_id: Optional[str] = None
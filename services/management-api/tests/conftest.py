@@ -0,0 +1,115 @@
+import uuid
+from contextlib import contextmanager
+
+import pytest
+
+# سقف تعداد کوئری مجاز برای endpointهای پرترافیک؛ هر رگرسیون N+1 از این سقف عبور می‌کند
+QUERY_BUDGETS = {
+    "GET /posts/{post_id}": 3,
+    "GET /posts": 3,
+    "GET /posts?summary=true": 1,
+    "GET /posts/pending": 3,
+    "GET /posts/fetched": 3,
+    "GET /posts/status/preprocessed": 3,
+    "GET /posts/status/ready-for-final-approval": 3,
+    "GET /sources": 2,
+    "GET /destinations": 2,
+}
+
+
+@pytest.fixture
+def assert_max_queries():
+    """
+    یک context manager برمی‌گرداند که اگر کوئری‌های داخل بلوک از سقف مشخص شده
+    بیشتر شوند، تست را fail می‌کند. سقف می‌تواند عدد یا کلیدی از QUERY_BUDGETS باشد:
+
+        with assert_max_queries("GET /posts/{post_id}"):
+            client.get("/posts/1")
+    """
+    from common.database import count_queries
+
+    @contextmanager
+    def _assert_max_queries(budget):
+        max_queries = QUERY_BUDGETS[budget] if isinstance(budget, str) else budget
+        with count_queries() as counter:
+            yield counter
+        assert counter.count <= max_queries, (
+            f"Expected at most {max_queries} queries for {budget!r}, got {counter.count}:\n"
+            + "\n".join(counter.statements)
+        )
+
+    return _assert_max_queries
+
+
+@pytest.fixture(scope="module")
+def client():
+    """
+    TestClient روی روترهای management-api و دیتابیس تنظیم شده در متغیرهای محیطی (MYSQL_*, DB_HOST).
+    app.main عمداً import نمی‌شود تا init_db و اتصال به RabbitMQ اجرا نشوند؛ اگر دیتابیس در دسترس
+    نباشد تست‌ها skip می‌شوند.
+    """
+    pytest.importorskip("fastapi")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+
+    from common.database import engine
+    from app.api.router import api_router
+    from app.models import management as models
+
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+    except Exception as e:
+        pytest.skip(f"Database is not reachable: {e}")
+    models.Base.metadata.create_all(bind=engine)
+
+    app = FastAPI()
+    app.include_router(api_router)
+    # یک TestClient برای کل ماژول تا اتصال‌های pool ناهمگام به یک event loop تعلق داشته باشند
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def seed_posts(client):
+    """
+    یک factory برمی‌گرداند که چند پست با وضعیت داده شده، هر کدام با دو ترجمه و دو تصویر، به همراه
+    یک منبع و مقصد متصل به آن می‌سازد. همه ردیف‌ها پس از تست حذف می‌شوند.
+    """
+    from common.database import SessionLocal
+    from app.models import management as models
+
+    db = SessionLocal()
+    created = []
+
+    def _seed(status: models.PostStatus, count: int = 5):
+        tag = uuid.uuid4().hex[:12]
+        destination = models.Destination(name=f"test-dest-{tag}", platform="telegram", credentials={})
+        source = models.Source(name=f"test-source-{tag}", url=f"https://example.com/{tag}/feed",
+                               destinations=[destination])
+        for i in range(count):
+            source.posts.append(models.Post(
+                url_original=f"https://example.com/{tag}/{i}",
+                status=status.value,
+                title_original=f"Title {i}",
+                content_original="Body " * 50,
+                translations=[
+                    models.PostTranslation(language=language, score=7.5, title_translated=f"عنوان {i}",
+                                           content_translated="متن")
+                    for language in ("fa", "ar")
+                ],
+                images=[models.PostImage(url=f"https://example.com/{tag}/{i}/{n}.jpg") for n in range(2)],
+            ))
+        db.add(source)
+        db.commit()
+        created.append((source, destination))
+        return [post.id for post in source.posts]
+
+    yield _seed
+
+    for source, destination in created:
+        db.delete(source)
+        db.delete(destination)
+    db.commit()
+    db.close()
@@ -0,0 +1,73 @@
+import pytest
+
+from tests.conftest import QUERY_BUDGETS
+
+# endpoint -> وضعیت پست‌هایی که در پاسخ آن ظاهر می‌شوند
+LIST_ENDPOINT_STATUSES = {
+    "GET /posts/pending": "PENDING_APPROVAL",
+    "GET /posts/fetched": "FETCHED",
+    "GET /posts/status/preprocessed": "PREPROCESSED",
+    "GET /posts/status/ready-for-final-approval": "READY_FOR_FINAL_APPROVAL",
+}
+
+
+def test_every_budget_is_covered():
+    covered = set(LIST_ENDPOINT_STATUSES) | {
+        "GET /posts/{post_id}", "GET /posts", "GET /posts?summary=true", "GET /sources", "GET /destinations",
+    }
+    assert covered == set(QUERY_BUDGETS)
+
+
+def test_get_post_query_budget(client, seed_posts, assert_max_queries):
+    from app.models.management import PostStatus
+
+    post_id = seed_posts(PostStatus.PENDING_APPROVAL)[0]
+    with assert_max_queries("GET /posts/{post_id}"):
+        response = client.get(f"/posts/{post_id}")
+    assert response.status_code == 200
+    body = response.json()
+    assert len(body["translations"]) == 2
+    assert len(body["images"]) == 2
+
+
+@pytest.mark.parametrize("budget", sorted(LIST_ENDPOINT_STATUSES))
+def test_post_list_query_budget(client, seed_posts, assert_max_queries, budget):
+    from app.models.management import PostStatus
+
+    post_ids = set(seed_posts(PostStatus[LIST_ENDPOINT_STATUSES[budget]]))
+    path = budget.split(" ", 1)[1]
+    with assert_max_queries(budget):
+        response = client.get(path, params={"limit": 1000} if path in ("/posts/pending", "/posts/fetched") else None)
+    assert response.status_code == 200
+    returned = [post for post in response.json() if post["id"] in post_ids]
+    assert {post["id"] for post in returned} == post_ids
+    assert all(len(post["translations"]) == 2 and len(post["images"]) == 2 for post in returned)
+
+
+@pytest.mark.parametrize("budget", ["GET /posts", "GET /posts?summary=true"])
+def test_paginated_post_list_query_budget(client, seed_posts, assert_max_queries, budget):
+    from app.models.management import PostStatus
+
+    seed_posts(PostStatus.PENDING_APPROVAL)
+    summary = budget.endswith("summary=true")
+    with assert_max_queries(budget):
+        response = client.get("/posts", params={"limit": 5, "summary": summary})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert len(items) == 5
+    if summary:
+        assert all("translations" not in post and "content_original" not in post for post in items)
+    else:
+        assert all("translations" in post and "images" in post for post in items)
+
+
+@pytest.mark.parametrize("budget", ["GET /sources", "GET /destinations"])
+def test_source_and_destination_query_budget(client, seed_posts, assert_max_queries, budget):
+    from app.models.management import PostStatus
+
+    for _ in range(3):
+        seed_posts(PostStatus.FETCHED, count=1)
+    with assert_max_queries(budget):
+        response = client.get(budget.split(" ", 1)[1])
+    assert response.status_code == 200
+    assert len(response.json()) >= 3
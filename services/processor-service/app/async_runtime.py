@@ -0,0 +1,246 @@
+# FILE: ./services/processor-service/app/async_runtime.py
+# اجرای asyncio برای processor-service (PROCESSOR_RUNTIME=async)
+
+import asyncio
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Optional, Set, Type
+
+import aio_pika
+from pydantic import BaseModel
+
+from common import events
+from common.rabbit import RABBITMQ_HEARTBEAT
+from common.management_client.async_client import AsyncManagementClient
+from common.metrics import record_gemini_call, track_callback
+from common.retry import log_retry, plan_retry
+from app.llm_cache import LLMResultCache
+from app.rate_limiter import AdaptiveRateLimiter
+from app.prompts import (
+    CONTENT_TEMPERATURE, PREPROCESS_TEMPERATURE,
+    ChunkTranslationOutput, ContentProcessOutput, PreProcessOutput, build_preprocess_prompt, safety_settings,
+)
+from app.pipeline import (
+    CONTENT_PROCESSING_QUEUE, GEMINI_MODEL, POST_CREATED_QUEUE, ContentPlan, check_release_response,
+    content_request, content_result_payload, join_chunk_translations, merge_map_reduce, needs_post_details,
+    parked_post_id, plan_content_request, preprocessing_payload, should_release_parked_job,
+    title_and_featured_image,
+)
+
+logger = logging.getLogger("processor-service-v2.async")
+
+
+class AsyncProcessorRuntime:
+    """
+    هر دو صف پردازشگر را روی یک event loop مصرف می‌کند.
+
+    دریافت پیام از RabbitMQ (aio-pika)، خواندن و نوشتن در management-api (AsyncManagementClient روی httpx)
+    و فراخوانی Gemini (client.aio) هیچ‌کدام thread را مسدود نمی‌کنند، پس با یک
+    پروسه تا `max_in_flight` پیام همزمان در جریان است. برنامه‌ریزی هر مرحله و ساخت payloadها
+    از app/pipeline.py می‌آید و این کلاس فقط I/O را انجام می‌دهد؛ کش نتایج، محدودکننده نرخ و صف‌های
+    retry همان‌هایی هستند که اجرای thread-based استفاده می‌کند.
+    حالت دسته‌ای عنوان‌ها (PREPROCESS_BATCH_SIZE) در این حالت استفاده نمی‌شود.
+    """
+
+    def __init__(self, client, limiter: AdaptiveRateLimiter, generation_config: Callable,
+                 is_throttling_error: Callable[[Exception], bool],
+                 llm_cache: Optional[LLMResultCache] = None, max_in_flight: int = 32):
+        self.client = client
+        self.limiter = limiter
+        self.llm_cache = llm_cache
+        self.max_in_flight = max(1, max_in_flight)
+        self.is_throttling_error = is_throttling_error
+        self.generation_config = generation_config
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._api: Optional[AsyncManagementClient] = None
+        self._channel: Optional[aio_pika.abc.AbstractChannel] = None
+        self._declared_queues: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        connection = await aio_pika.connect_robust(
+            host=os.getenv("RABBITMQ_HOST", "rabbitmq"),
+            port=int(os.getenv("RABBITMQ_PORT", 5672)),
+            login=os.getenv("RABBITMQ_DEFAULT_USER", "guest"),
+            password=os.getenv("RABBITMQ_DEFAULT_PASS", "guest"),
+            heartbeat=RABBITMQ_HEARTBEAT,
+        )
+        async with connection, AsyncManagementClient(pool_size=self.max_in_flight) as api:
+            self._api = api
+            self._channel = await connection.channel()
+            # پس از reconnect، aio-pika کانال را دوباره می‌سازد؛ صف‌های retry باید دوباره declare شوند
+            self._channel.reopen_callbacks.add(lambda *args: self._declared_queues.clear())
+            await self._channel.set_qos(prefetch_count=self.max_in_flight)
+            for queue_name, handler in ((POST_CREATED_QUEUE, self.handle_post_created),
+                                        (CONTENT_PROCESSING_QUEUE, self.handle_content_processing)):
+                queue = await self._channel.declare_queue(queue_name, durable=True)
+                await queue.consume(self._make_consumer(queue_name, handler))
+                logger.info(f"Waiting for messages in queue '{queue_name}' (async, max_in_flight={self.max_in_flight}).")
+            await asyncio.Future()
+
+    def _make_consumer(self, queue_name: str, handler: Callable[[events.PostEvent], Awaitable[bool]]):
+        async def on_message(message: aio_pika.abc.AbstractIncomingMessage):
+            task = asyncio.create_task(self._handle(queue_name, handler, message))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        return on_message
+
+    async def _handle(self, queue_name: str, handler: Callable[[events.PostEvent], Awaitable[bool]],
+                      message: aio_pika.abc.AbstractIncomingMessage):
+        async with self._semaphore:
+            try:
+                with track_callback(queue_name):
+                    done = await handler(events.parse_post_event(message.body))
+                if done:
+                    await message.ack()
+                else:
+                    await self._retry_later(queue_name, message)
+            except Exception as e:
+                logger.error(f"Failed to handle message from '{queue_name}': {e}", exc_info=True)
+                await self._retry_later(queue_name, message)
+
+    # ---------------------------
+    # RabbitMQ helpers
+    # ---------------------------
+    async def _publish(self, queue_name: str, body: bytes, headers: Optional[dict] = None,
+                       queue_arguments: Optional[dict] = None):
+        if queue_name not in self._declared_queues:
+            await self._channel.declare_queue(queue_name, durable=True, arguments=queue_arguments)
+            self._declared_queues.add(queue_name)
+        await self._channel.default_exchange.publish(
+            aio_pika.Message(body, headers=headers, delivery_mode=aio_pika.DeliveryMode.PERSISTENT),
+            routing_key=queue_name,
+        )
+
+    async def _retry_later(self, queue_name: str, message: aio_pika.abc.AbstractIncomingMessage):
+        """معادل retry_later در main.py: پیام با تأخیر نمایی دوباره زمان‌بندی و سپس ack می‌شود."""
+        try:
+            plan = plan_retry(queue_name, message.headers)
+            await self._publish(plan.queue_name, message.body, headers=plan.headers,
+                                queue_arguments=plan.queue_arguments)
+            log_retry(queue_name, plan)
+            await message.ack()
+        except Exception as e:
+            logger.error(f"Could not schedule a delayed retry for queue '{queue_name}': {e}")
+            await message.nack(requeue=True)
+            return
+        if should_release_parked_job(queue_name, plan.parked):
+            await self._release_parked_content_job(message.body)
+
+    async def _release_parked_content_job(self, body: bytes):
+        """معادل release_parked_content_job در main.py: پست پارک‌شده به PENDING_APPROVAL برمی‌گردد."""
+        try:
+            post_id = parked_post_id(body)
+            check_release_response(post_id, await self._api.mark_pending(post_id))
+        except Exception as e:
+            logger.error(f"Could not release parked content job: {e}")
+
+    # ---------------------------
+    # Gemini
+    # ---------------------------
+    async def _generate_structured(self, sys_instruction: str, prompt: str, schema: Type[BaseModel],
+                                   temperature: float, safety=None):
+        cache_key = None
+        if self.llm_cache:
+            cache_key = self.llm_cache.make_key(GEMINI_MODEL, sys_instruction, prompt, schema, temperature)
+            cached = await asyncio.to_thread(self.llm_cache.get, cache_key)
+            if cached is not None:
+                return schema.model_validate_json(cached)
+
+        await self.limiter.acquire_async()
+        started = time.monotonic()
+        try:
+            resp = await self.client.aio.models.generate_content(
+                model=GEMINI_MODEL,
+                contents=prompt,
+                config=self.generation_config(sys_instruction, schema, temperature, safety),
+            )
+        except Exception as e:
+            record_gemini_call(GEMINI_MODEL, time.monotonic() - started, ok=False)
+            if self.is_throttling_error(e):
+                self.limiter.on_throttle()
+            raise
+        record_gemini_call(GEMINI_MODEL, time.monotonic() - started, resp)
+        self.limiter.on_success()
+        result = resp.parsed
+        if cache_key and result is not None:
+            await asyncio.to_thread(self.llm_cache.put, cache_key, GEMINI_MODEL,
+                                    result.model_dump_json(exclude_unset=True), time.monotonic() - started)
+        return result
+
+    async def _process_content(self, content: str, platforms: list, translation: Optional[dict] = None) -> ContentProcessOutput:
+        """معادل process_content_for_platforms در main.py؛ تکه‌های مقاله طولانی با asyncio.gather ترجمه می‌شوند."""
+        plan = plan_content_request(content, platforms, translation)
+        if plan.kind == ContentPlan.SKIP:
+            return ContentProcessOutput()
+        if plan.kind == ContentPlan.DIRECT:
+            return await self._generate_structured(*plan.prompt, ContentProcessOutput, CONTENT_TEMPERATURE)
+
+        logger.info(f"Translating long content in {len(plan.chunk_prompts)} chunks (~{plan.content_tokens} tokens)")
+        parts = await asyncio.gather(*(
+            self._generate_structured(*chunk_prompt, ChunkTranslationOutput, CONTENT_TEMPERATURE)
+            for chunk_prompt in plan.chunk_prompts
+        ))
+        translated = join_chunk_translations(parts)
+        summaries = await self._generate_structured(*plan.summary_prompt(translated), ContentProcessOutput,
+                                                    CONTENT_TEMPERATURE)
+        return merge_map_reduce(translated, summaries)
+
+    # ---------------------------
+    # Handlers
+    # ---------------------------
+    async def handle_post_created(self, event: events.PostEvent) -> bool:
+        """مرحله ۱: پیش‌پردازش عنوان. False یعنی پیام باید با تأخیر دوباره تلاش شود."""
+        post_id = event.post_id
+        if not post_id:
+            logger.warning("Received message without post_id; acking.")
+            return True
+
+        logger.info(f"📬 [PREPROCESS] Received post_created for post_id={post_id}")
+        post_details = None
+        if needs_post_details(event):
+            post_details = await self._api.get_post(post_id)
+            if not post_details:
+                return False
+        title, featured_image_url = title_and_featured_image(event, post_details)
+
+        sys_instruction, prompt = build_preprocess_prompt(title)
+        result: PreProcessOutput = await self._generate_structured(
+            sys_instruction, prompt, PreProcessOutput, PREPROCESS_TEMPERATURE, safety_settings())
+
+        # ذخیره ترجمه، تغییر وضعیت و رویداد بازبینی در یک درخواست و یک تراکنش
+        resp = await self._api.save_preprocessing_result(post_id, preprocessing_payload(result, featured_image_url))
+        if resp.status_code == 409:
+            logger.info(f"Post {post_id} was already preprocessed or moved on; skipping.")
+            return True
+        resp.raise_for_status()
+        logger.info(f"✅ [PREPROCESS] Finished for post_id={post_id}")
+        return True
+
+    async def handle_content_processing(self, event: events.PostEvent) -> bool:
+        """مرحله ۲: پردازش محتوا برای پلتفرم‌های درخواستی."""
+        post_id, platforms = content_request(event)
+        if not post_id or not platforms:
+            logger.warning("Received invalid content processing request; acking.")
+            return True
+
+        logger.info(f"📬 [PROCESS CONTENT] Received request for post_id={post_id}, platforms={platforms}")
+        post_details = await self._api.get_post(post_id)
+        if not post_details or not post_details.get("translations"):
+            return False
+
+        translation = post_details["translations"][0]
+        result = await self._process_content(post_details.get("content_original"), platforms, translation)
+
+        resp = await self._api.save_content_result(post_id, content_result_payload(result, translation["id"]))
+        if resp.status_code == 409:
+            logger.info(f"Post {post_id} is no longer processing content; result discarded.")
+            return True
+        resp.raise_for_status()
+        logger.info(f"✅ [PROCESS CONTENT] Finished for post_id={post_id}")
+        return True
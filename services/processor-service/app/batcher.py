@@ -0,0 +1,58 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Groups items submitted from many threads into batches of up to `max_items`,
+    flushing early once the oldest item has waited `max_wait_ms`.
+
+    Each batch is handed to `process_batch` on a small thread pool, so a slow
+    batch does not stop the next one from being collected. `process_batch` is
+    responsible for acking or nacking every item it receives.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], None], max_items: int, max_wait_ms: int, workers: int = 2):
+        self.process_batch = process_batch
+        self.max_items = max(1, max_items)
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self._items: List[Any] = []
+        self._first_item_at = 0.0
+        self._cond = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="micro-batcher")
+        threading.Thread(target=self._run, name="micro-batcher-collector", daemon=True).start()
+
+    def submit(self, item: Any):
+        with self._cond:
+            if not self._items:
+                self._first_item_at = time.monotonic()
+            self._items.append(item)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._items:
+                    self._cond.wait()
+                deadline = self._first_item_at + self.max_wait
+                while len(self._items) < self.max_items:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._items[:self.max_items]
+                del self._items[:self.max_items]
+                if self._items:
+                    self._first_item_at = time.monotonic()
+            self._executor.submit(self._flush, batch)
+
+    def _flush(self, batch: List[Any]):
+        try:
+            self.process_batch(batch)
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} items failed: {e}", exc_info=True)
@@ -0,0 +1,114 @@
+# FILE: ./services/processor-service/app/content_prep.py
+# آماده‌سازی متن مقاله پیش از ارسال به مدل: پاک‌سازی، تخمین توکن، محدودیت طول و تکه‌بندی
+
+import logging
+import os
+import re
+from typing import List
+
+logger = logging.getLogger(__name__)
+
+CONTENT_MAX_CHARS = int(os.getenv("CONTENT_MAX_CHARS", 40000))
+CONTENT_CHUNK_TOKENS = int(os.getenv("CONTENT_CHUNK_TOKENS", 2500))
+CHARS_PER_TOKEN = 4
+
+# خطوطی که newspaper3k معمولاً از تبلیغ و فوتر صفحه در متن جا می‌گذارد؛ هر طولی داشته باشند حذف می‌شوند
+BOILERPLATE_LINE = re.compile(
+    r"^\s*("
+    r"advertisement|sponsored( content)?|story continues below|"
+    r"all rights reserved\b.*|(copyright\s*)?(©|\(c\))\s*\d{4}\b.*|copyright\s+\d{4}\b.*"
+    r")\s*$",
+    re.IGNORECASE,
+)
+# دعوت به اشتراک‌گذاری، لینک‌های «بیشتر بخوانید» و اعتبار تصویر؛ فقط در خطوط کوتاه، چون جمله‌ای که
+# با همین کلمات شروع شود (مثلاً "Read more about the ruling in...") جزو متن خبر است
+BOILERPLATE_PHRASE = re.compile(
+    r"^\s*("
+    r"(read|see) (more|also)\b.*|related( articles?| stories)?:.*|recommended:.*|"
+    r"(sign up|subscribe)\b.*(newsletter|updates|inbox).*|"
+    r"(follow|like) us on\b.*|share (this|on)\b.*|click here\b.*|"
+    r"(image|photo|picture)( credit)?:.*"
+    r")\s*$",
+    re.IGNORECASE,
+)
+BOILERPLATE_PHRASE_MAX_CHARS = 80
+SENTENCE_END = re.compile(r"(?<=[.!?؟])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    """تخمین سریع تعداد توکن (حدود ۴ کاراکتر برای هر توکن متن انگلیسی)."""
+    return (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def is_boilerplate(line: str) -> bool:
+    if BOILERPLATE_LINE.match(line):
+        return True
+    return len(line) < BOILERPLATE_PHRASE_MAX_CHARS and bool(BOILERPLATE_PHRASE.match(line))
+
+
+def normalize_content(text: str) -> str:
+    """
+    خطوط boilerplate و خطی که عیناً تکرار خط قبلی است را حذف و فاصله‌ها را یکدست می‌کند؛ مرز پاراگراف‌ها
+    حفظ می‌شود. تکرار غیرمتوالی (مثلاً نقل‌قول یا جمله کوتاهی که در جای دیگری از متن آمده) حذف نمی‌شود.
+    """
+    paragraphs = []
+    stripped = 0
+    for line in (text or "").splitlines():
+        line = re.sub(r"\s+", " ", line).strip()
+        if not line:
+            continue
+        if is_boilerplate(line) or (paragraphs and line == paragraphs[-1]):
+            stripped += 1
+            continue
+        paragraphs.append(line)
+    if stripped:
+        logger.info(f"Stripped {stripped} boilerplate or repeated line(s) from article content.")
+    return "\n\n".join(paragraphs)
+
+
+def cap_length(text: str, max_chars: int = CONTENT_MAX_CHARS) -> str:
+    """متن را حداکثر تا max_chars و ترجیحاً روی مرز پاراگراف یا جمله کوتاه می‌کند."""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    for boundary in ("\n\n", ". "):
+        position = cut.rfind(boundary)
+        if position > max_chars // 2:
+            return cut[:position + 1].rstrip()
+    return cut.rstrip()
+
+
+def prepare_content(text: str) -> str:
+    return cap_length(normalize_content(text))
+
+
+def split_into_chunks(text: str, max_tokens: int = CONTENT_CHUNK_TOKENS) -> List[str]:
+    """
+    متن را روی مرز پاراگراف‌ها به تکه‌هایی با حداکثر max_tokens توکن تقسیم می‌کند.
+    پاراگرافی که به تنهایی بزرگ‌تر باشد روی مرز جمله‌ها شکسته می‌شود.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = []
+    for paragraph in text.split("\n\n"):
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        sentence_group = ""
+        for sentence in SENTENCE_END.split(paragraph):
+            if sentence_group and len(sentence_group) + len(sentence) + 1 > max_chars:
+                pieces.append(sentence_group)
+                sentence_group = ""
+            sentence_group = f"{sentence_group} {sentence}".strip()
+        if sentence_group:
+            pieces.append(sentence_group)
+
+    chunks: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + len(piece) + 2 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{piece}" if current else piece
+    if current:
+        chunks.append(current)
+    return chunks
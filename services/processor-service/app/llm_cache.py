@@ -0,0 +1,123 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Type
+
+from pydantic import BaseModel
+
+from common.metrics import LLM_CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "/usr/src/app/data/llm_cache.sqlite3")
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+LLM_CACHE_STATS_EVERY = int(os.getenv("LLM_CACHE_STATS_EVERY", 100))
+
+
+class LLMResultCache:
+    """
+    Persistent, content-addressed cache of structured LLM responses (SQLite).
+
+    The key is a SHA-256 over the model, system instruction, prompt, response
+    schema and temperature, so an identical request returns the stored JSON
+    instead of calling the model again. When the stored responses grow past
+    `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_bytes: int = LLM_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_results ("
+            " key TEXT PRIMARY KEY,"
+            " model TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " latency REAL NOT NULL DEFAULT 0,"
+            " created_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_llm_results_last_access ON llm_results(last_access)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_results").fetchone()[0]
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(model: str, system_instruction: str, prompt: str, schema: Type[BaseModel], temperature: float) -> str:
+        payload = json.dumps(
+            [model, system_instruction, prompt, schema.model_json_schema(), temperature],
+            ensure_ascii=False,
+            sort_keys=True,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT response, latency FROM llm_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                LLM_CACHE_LOOKUPS.labels("miss").inc()
+            else:
+                self.hits += 1
+                LLM_CACHE_LOOKUPS.labels("hit").inc()
+                self.saved_seconds += row[1]
+                self._conn.execute("UPDATE llm_results SET last_access = ? WHERE key = ?", (time.time(), key))
+            lookups = self.hits + self.misses
+        if LLM_CACHE_STATS_EVERY and lookups % LLM_CACHE_STATS_EVERY == 0:
+            logger.info("LLM cache stats", extra=self.stats())
+        return row[0] if row else None
+
+    def put(self, key: str, model: str, response: str, latency: float):
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM llm_results WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_results (key, model, response, size, latency, created_at, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, response, size, latency, now, now),
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        evicted = 0
+        while self._total_bytes > target:
+            rows = self._conn.execute(
+                "SELECT key, size FROM llm_results ORDER BY last_access LIMIT 100"
+            ).fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM llm_results WHERE key = ?", (key,))
+                self._total_bytes -= size
+                evicted += 1
+                if self._total_bytes <= target:
+                    break
+        logger.info(f"LLM cache evicted {evicted} entries; {self._total_bytes} bytes remain.")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "llm_cache_hits": self.hits,
+            "llm_cache_misses": self.misses,
+            "llm_cache_hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "llm_cache_saved_seconds": round(self.saved_seconds, 1),
+            "llm_cache_bytes": self._total_bytes,
+        }
@@ -3,54 +3,79 @@
 
 import logging
 import os
-import json
+import time
 import requests
-from typing import Optional, List
-import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List, Type
 
 from dotenv import load_dotenv
 
 # Google Gen AI SDK
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 from pydantic import BaseModel
 
 # Project-shared utilities
 from common.logging_config import setup_logging
-from common.rabbit import RabbitMQClient
+from common.consumer import ConsumerRuntime
+from common.retry import schedule_retry
+from common.management_client import get_management_client
+from common.metrics import record_gemini_call, start_metrics_server
+from common import events
+from app.llm_cache import LLMResultCache
+from app.batcher import MicroBatcher
+from app.rate_limiter import AdaptiveRateLimiter
+from app.prompts import (
+    CONTENT_TEMPERATURE, PREPROCESS_TEMPERATURE,
+    ChunkTranslationOutput, ContentProcessOutput, PreProcessBatchOutput, PreProcessOutput,
+    build_preprocess_batch_prompt, build_preprocess_prompt, collect_batch_results, safety_settings,
+)
+from app.pipeline import (
+    CONTENT_PROCESSING_QUEUE, GEMINI_MODEL, POST_CREATED_QUEUE, ContentPlan, check_release_response,
+    content_request, content_result_payload, join_chunk_translations, merge_map_reduce, needs_post_details,
+    parked_post_id, plan_content_request, preprocessing_payload, should_release_parked_job,
+    title_and_featured_image,
+)
 
 # ---------------------------
 # Environment & Config
 # ---------------------------
 load_dotenv()
 
-# --- نام صف‌های جدید ---
-POST_CREATED_QUEUE = os.getenv("POST_CREATED_QUEUE", "post_created_queue")
-CONTENT_PROCESSING_QUEUE = os.getenv("CONTENT_PROCESSING_QUEUE", "content_processing_queue")
-REVIEW_NOTIFICATIONS_QUEUE = "review_notifications_queue" 
-FINAL_APPROVAL_NOTIFICATIONS_QUEUE = "final_approval_notifications_queue"
-MANAGEMENT_API_URL = os.getenv("MANAGEMENT_API_URL", "http://management-api:8000")
+# نام صف‌ها، CONTENT_MAP_REDUCE و CONTENT_FILL_ALL_MISSING در app/pipeline.py (مشترک با اجرای async) هستند
+
+# --- همزمانی مصرف‌کننده‌ها ---
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", 4))
+PREPROCESS_PREFETCH = int(os.getenv("PREPROCESS_PREFETCH", PREPROCESS_WORKERS * 2))
+CONTENT_WORKERS = int(os.getenv("CONTENT_WORKERS", 2))
+CONTENT_PREFETCH = int(os.getenv("CONTENT_PREFETCH", CONTENT_WORKERS * 2))
+
+# --- دسته‌بندی عنوان‌ها در مرحله پیش‌پردازش (۱ یعنی غیرفعال) ---
+PREPROCESS_BATCH_SIZE = int(os.getenv("PREPROCESS_BATCH_SIZE", 1))
+PREPROCESS_BATCH_WAIT_MS = int(os.getenv("PREPROCESS_BATCH_WAIT_MS", 2000))
+if PREPROCESS_BATCH_SIZE > 1:
+    # پیام‌ها تا پر شدن دسته ack نمی‌شوند، پس prefetch باید جای چند دسته را داشته باشد
+    PREPROCESS_PREFETCH = max(PREPROCESS_PREFETCH, PREPROCESS_BATCH_SIZE * 2)
+
+# --- تعداد تکه‌های مقاله طولانی که همزمان ترجمه می‌شوند (map-reduce) ---
+CONTENT_CHUNK_WORKERS = int(os.getenv("CONTENT_CHUNK_WORKERS", 4))
+
+# --- نوع اجرا: threads (پیش‌فرض) یا async؛ در حالت async تعداد پیام‌های همزمان محدود می‌شود ---
+PROCESSOR_RUNTIME = os.getenv("PROCESSOR_RUNTIME", "threads").lower()
+PROCESSOR_MAX_IN_FLIGHT = int(os.getenv("PROCESSOR_MAX_IN_FLIGHT", 32))
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# --- محدودیت نرخ درخواست‌های Gemini (درخواست در ثانیه) ---
+GEMINI_MAX_RPS = float(os.getenv("GEMINI_MAX_RPS", 2))
+GEMINI_MIN_RPS = float(os.getenv("GEMINI_MIN_RPS", 0.1))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", 4))
+GEMINI_RPS_INCREASE = float(os.getenv("GEMINI_RPS_INCREASE", 0.05))
 
 setup_logging()
 logger = logging.getLogger("processor-service-v2")
 
-# ---------------------------
-# Structured Output Schemas
-# ---------------------------
-# خروجی مرحله اول: پیش‌پردازش
-class PreProcessOutput(BaseModel):
-    title_translated: str
-    quality_score: float  # 0..10
-
-# خروجی مرحله دوم: پردازش محتوا
-class ContentProcessOutput(BaseModel):
-    content_translated: Optional[str] = None
-    content_telegram: Optional[str] = None
-    content_instagram: Optional[str] = None
-    content_twitter: Optional[str] = None
-
 # ---------------------------
 # Gemini Client
 # ---------------------------
@@ -61,202 +86,276 @@ except Exception as e:
     client = None
     logger.critical(f"❌ Failed to initialize Gemini client: {e}", exc_info=True)
 
+# سرعت درخواست‌ها با خطای 429/5xx نصف و با هر پاسخ موفق کم‌کم بیشتر می‌شود
+gemini_limiter = AdaptiveRateLimiter(max_rate=GEMINI_MAX_RPS, min_rate=GEMINI_MIN_RPS,
+                                     burst=GEMINI_BURST, increase_step=GEMINI_RPS_INCREASE)
+
+# ---------------------------
+# LLM Result Cache
+# ---------------------------
+llm_cache = None
+if LLM_CACHE_ENABLED:
+    try:
+        llm_cache = LLMResultCache()
+        logger.info(f"✅ LLM result cache enabled at {llm_cache.path}")
+    except Exception as e:
+        logger.error(f"Could not open LLM result cache; continuing without it. Error: {e}")
+
 # ---------------------------
 # HTTP Helpers
 # ---------------------------
+# یک session مشترک با keep-alive، timeout و تلاش مجدد برای همه workerها
+management_api = get_management_client()
+
 def get_post_details(post_id: int):
-    # ... (بدون تغییر) ...
-    try:
-        resp = requests.get(f"{MANAGEMENT_API_URL}/posts/{post_id}")
-        resp.raise_for_status()
-        return resp.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not fetch details for post_id={post_id}: {e}")
-        return None
+    return management_api.get_post(post_id)
 
 def save_preprocessing_result(post_id: int, result: PreProcessOutput, featured_image_url: Optional[str]):
-    """نتایج پیش‌پردازش را ذخیره و یک پیام برای اطلاع‌رسانی به مدیر ارسال می‌کند."""
-    payload = {
-        "language": "fa",
-        "title_translated": result.title_translated,
-        "score": result.quality_score,
-        "featured_image_url": featured_image_url
-    }
+    """
+    نتایج پیش‌پردازش را با یک درخواست ذخیره می‌کند؛ management-api در همان تراکنش وضعیت پست را
+    'preprocessed' می‌کند و رویداد اطلاع‌رسانی به مدیر را منتشر می‌کند.
+    """
+    payload = preprocessing_payload(result, featured_image_url)
     try:
-        # ۱. ذخیره نتیجه در دیتابیس
-        requests.post(f"{MANAGEMENT_API_URL}/posts/{post_id}/translations", json=payload).raise_for_status()
-        logger.info(f"✅ Saved preprocessing result for post_id={post_id}")
-        
-        # ۲. تغییر وضعیت پست
-        requests.post(f"{MANAGEMENT_API_URL}/posts/{post_id}/preprocessed").raise_for_status()
-        logger.info(f"✅ Post status set to PREPROCESSED for post_id={post_id}")
-
-        # ۳. اطلاع‌رسانی به مدیر تلگرام از طریق RabbitMQ
-        with RabbitMQClient() as rmq:
-            message_body = json.dumps({"post_id": post_id})
-            rmq.channel.queue_declare(queue=REVIEW_NOTIFICATIONS_QUEUE, durable=True)
-            rmq.publish(exchange_name="", routing_key=REVIEW_NOTIFICATIONS_QUEUE, body=message_body)
-            logger.info(f"📤 Sent review notification for post_id={post_id}")
-            
+        resp = management_api.save_preprocessing_result(post_id, payload)
+        if resp.status_code == 409:
+            # پیام تکراری یا پستی که دیگر در وضعیت fetched نیست؛ کاری باقی نمانده است
+            logger.info(f"Post {post_id} was already preprocessed or moved on; skipping. {resp.text}")
+            return True
+        resp.raise_for_status()
+        logger.info(f"✅ Saved preprocessing result for post_id={post_id}; status set to PREPROCESSED")
         return True
-    except Exception as e:
-        logger.error(f"Could not save preprocessing result or notify for post_id={post_id}: {e}")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Could not save preprocessing result for post_id={post_id}: {e}")
         return False
 
 def update_translation_with_content(translation_id: int, post_id: int, result: ContentProcessOutput):
-    """ترجمه را با محتوای جدید آپدیت کرده و پیامی برای تایید نهایی مدیر ارسال می‌کند."""
-    
-    # --- START: این بخش اصلاح شده است ---
-    payload = result.model_dump(exclude_unset=True)
-    payload['language'] = 'fa' # فیلد اجباری زبان را اضافه می‌کنیم
-    # --- END: پایان بخش اصلاح شده ---
-
+    """
+    ترجمه را با یک درخواست با محتوای جدید آپدیت می‌کند؛ management-api در همان تراکنش وضعیت پست را
+    'ready_for_final_approval' می‌کند و پیام تایید نهایی مدیر را منتشر می‌کند.
+    """
+    payload = content_result_payload(result, translation_id)
     try:
-        # ۱. آپدیت ترجمه در دیتابیس
-        requests.patch(f"{MANAGEMENT_API_URL}/translations/{translation_id}", json=payload).raise_for_status()
-        logger.info(f"✅ Updated translation with content for translation_id={translation_id}")
-        
-        # ۲. تغییر وضعیت پست
-        requests.post(f"{MANAGEMENT_API_URL}/posts/{post_id}/ready-for-final-approval").raise_for_status()
-        logger.info(f"✅ Post status set to READY_FOR_FINAL_APPROVAL for post_id={post_id}")
-        
-        # ۳. اطلاع‌رسانی به مدیر تلگرام برای تایید نهایی
-        with RabbitMQClient() as rmq:
-            message_body = json.dumps({"post_id": post_id})
-            rmq.channel.queue_declare(queue=FINAL_APPROVAL_NOTIFICATIONS_QUEUE, durable=True)
-            rmq.publish(exchange_name="", routing_key=FINAL_APPROVAL_NOTIFICATIONS_QUEUE, body=message_body)
-            logger.info(f"📤 Sent final approval notification for post_id={post_id}")
-            
+        resp = management_api.save_content_result(post_id, payload)
+        if resp.status_code == 409:
+            # پست دیگر در وضعیت processing_content نیست (پیام تکراری یا رد شدن همزمان توسط مدیر)
+            logger.info(f"Post {post_id} is no longer processing content; result discarded. {resp.text}")
+            return True
+        resp.raise_for_status()
+        logger.info(f"✅ Updated translation_id={translation_id} with content; status set to READY_FOR_FINAL_APPROVAL")
         return True
     except requests.exceptions.RequestException as e:
-        logger.error(f"Could not update translation or notify for post_id={post_id}: {e}")
+        logger.error(f"Could not save content result for post_id={post_id}: {e}")
         return False
 
 # ---------------------------
 # Core AI Processing
 # ---------------------------
-def _safety_settings():
-    # ... (بدون تغییر) ...
-    pass
+def _generation_config(sys_instruction: str, schema: Type[BaseModel], temperature: float, safety_settings=None):
+    return types.GenerateContentConfig(
+        system_instruction=sys_instruction,
+        response_mime_type="application/json",
+        response_schema=schema,
+        temperature=temperature,
+        safety_settings=safety_settings,
+    )
 
-def preprocess_title_and_score(title: str, model: str = "gemini-2.5-flash") -> PreProcessOutput:
+def is_throttling_error(e: Exception) -> bool:
+    """خطاهای 429 و 5xx یعنی باید سرعت درخواست‌ها را کم کنیم."""
+    return isinstance(e, errors.APIError) and (e.code == 429 or (e.code or 0) >= 500)
+
+def _generate_structured(model: str, sys_instruction: str, prompt: str, schema: Type[BaseModel],
+                         temperature: float, safety_settings=None):
+    """
+    یک درخواست با خروجی ساختاریافته به Gemini ارسال می‌کند.
+    اگر پاسخ همین درخواست (مدل، دستورالعمل، پرامپت، اسکیما و دما) قبلاً در کش باشد، بدون فراخوانی مدل برگردانده می‌شود.
+    """
+    cache_key = None
+    if llm_cache:
+        cache_key = llm_cache.make_key(model, sys_instruction, prompt, schema, temperature)
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            return schema.model_validate_json(cached)
+
+    gemini_limiter.acquire()
+    started = time.monotonic()
+    try:
+        resp = client.models.generate_content(
+            model=model,
+            contents=prompt,
+            config=_generation_config(sys_instruction, schema, temperature, safety_settings),
+        )
+    except Exception as e:
+        record_gemini_call(model, time.monotonic() - started, ok=False)
+        if is_throttling_error(e):
+            gemini_limiter.on_throttle()
+        raise
+    record_gemini_call(model, time.monotonic() - started, resp)
+    gemini_limiter.on_success()
+    result = resp.parsed
+    if cache_key and result is not None:
+        # فقط فیلدهایی که مدل واقعاً برگردانده ذخیره می‌شوند تا exclude_unset پس از hit هم درست کار کند
+        llm_cache.put(cache_key, model, result.model_dump_json(exclude_unset=True), time.monotonic() - started)
+    return result
+
+def preprocess_title_and_score(title: str, model: str = GEMINI_MODEL) -> PreProcessOutput:
     """مرحله ۱: فقط عنوان را ترجمه و به آن امتیاز می‌دهد."""
     if not client:
         raise RuntimeError("Gemini client not initialized")
 
-    sys_instruction = (
-        "You are a professional Persian translator and editor. "
-        "Return ONLY JSON with fields: title_translated (string), quality_score (number). "
-        "Requirements: "
-        "1) Translate the title to fluent, engaging Persian. "
-        "2) quality_score in [0,10] reflecting translation fidelity and clarity; use a dot for decimals."
-    )
-    prompt = f'**Title:** "{title or ""}"'
-
-    resp = client.models.generate_content(
-        model=model,
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            system_instruction=sys_instruction,
-            response_mime_type="application/json",
-            response_schema=PreProcessOutput,
-            temperature=0.2,
-            safety_settings=_safety_settings(),
-        ),
-    )
-    return resp.parsed
+    sys_instruction, prompt = build_preprocess_prompt(title)
+    return _generate_structured(model, sys_instruction, prompt, PreProcessOutput,
+                                temperature=PREPROCESS_TEMPERATURE, safety_settings=safety_settings())
 
-def process_content_for_platforms(content: str, platforms: List[str], model: str = "gemini-2.5-flash") -> ContentProcessOutput:
-    """مرحله ۲: محتوای اصلی را بر اساس پلتفرم‌های درخواستی و با بهینه‌سازی دقیق هزینه پردازش می‌کند."""
+def preprocess_titles_batch(titles: List[str], model: str = GEMINI_MODEL) -> List[Optional[PreProcessOutput]]:
+    """مرحله ۱ (دسته‌ای): چند عنوان را در یک درخواست ترجمه و امتیازدهی می‌کند؛ خروجی هم‌ترتیب با ورودی است."""
     if not client:
         raise RuntimeError("Gemini client not initialized")
 
-    # --- START: منطق نهایی و اصلاح شده برای ساخت پرامپت ---
-    
-    # اگر بیش از یک پلتفرم در لیست باشد، به معنی "تایید کل" است
-    is_approve_all = len(platforms) > 1
-
-    platform_requirements = []
-    
-    if is_approve_all:
-        # حالت کامل: ابتدا ترجمه کامل، سپس خلاصه‌سازی برای همه
-        platform_requirements.append("1. First, translate the entire original **Content** into fluent Persian. The result MUST be in the 'content_translated' field.")
-        platform_requirements.append("2. From the translated content, generate 'content_telegram': A concise Persian summary, under 1000 characters.")
-        platform_requirements.append("3. From the translated content, generate 'content_instagram': An engaging Persian summary for Instagram, under 2200 characters, with relevant hashtags.")
-        platform_requirements.append("4. From the translated content, generate 'content_twitter': A very short Persian summary for Twitter/X, under 280 characters.")
-    else:
-        # حالت بهینه: فقط خلاصه مستقیم برای پلتفرم مشخص شده
-        target_platform = platforms[0] # چون در این حالت فقط یک پلتفرم داریم
-        if target_platform == "telegram":
-            platform_requirements.append("- Directly translate and summarize the original English **Content** into a concise Persian summary for Telegram. The result MUST be in the 'content_telegram' field and be under 1000 characters. Do NOT provide a full 'content_translated'.")
-        elif target_platform == "instagram":
-            platform_requirements.append("- Directly translate and summarize the original English **Content** into an engaging Persian summary for Instagram. The result MUST be in the 'content_instagram' field, be under 2200 characters, and include relevant hashtags. Do NOT provide a full 'content_translated'.")
-        elif target_platform == "twitter":
-            platform_requirements.append("- Directly translate and summarize the original English **Content** into a very short Persian summary for Twitter/X. The result MUST be in the 'content_twitter' field and be under 280 characters. Do NOT provide a full 'content_translated'.")
-
-    sys_instruction = (
-        "You are a professional Persian translator and multi-platform copywriter.\n"
-        "Return ONLY a JSON object with the requested fields.\n"
-        "Instructions:\n" + "\n".join(platform_requirements)
-    )
-    # --- END: پایان منطق نهایی ---
-
-    prompt = f'**Content:**\n"{content or ""}"'
-
-    resp = client.models.generate_content(
-        model=model,
-        contents=prompt,
-        config=types.GenerateContentConfig(
-            system_instruction=sys_instruction,
-            response_mime_type="application/json",
-            response_schema=ContentProcessOutput,
-            temperature=0.3,
-        ),
-    )
-    return resp.parsed
+    sys_instruction, prompt = build_preprocess_batch_prompt(titles)
+    output = _generate_structured(model, sys_instruction, prompt, PreProcessBatchOutput,
+                                  temperature=PREPROCESS_TEMPERATURE, safety_settings=safety_settings())
+    return collect_batch_results(titles, output)
+
+def process_content_for_platforms(content: str, platforms: List[str], model: str = GEMINI_MODEL,
+                                  translation: Optional[dict] = None) -> ContentProcessOutput:
+    """
+    مرحله ۲: محتوای اصلی را بر اساس پلتفرم‌های درخواستی و با بهینه‌سازی دقیق هزینه پردازش می‌کند.
+    اگر `translation` ترجمه کامل فارسی داشته باشد، فقط خلاصه‌های ناموجود از روی همان ساخته می‌شوند.
+    """
+    if not client:
+        raise RuntimeError("Gemini client not initialized")
+
+    plan = plan_content_request(content, platforms, translation)
+    if plan.kind == ContentPlan.SKIP:
+        logger.info(f"All requested summaries already exist for platforms={platforms}; skipping Gemini")
+        return ContentProcessOutput()
+    if plan.kind == ContentPlan.MAP_REDUCE:
+        return process_long_content(plan, model)
+    sys_instruction, prompt = plan.prompt
+    return _generate_structured(model, sys_instruction, prompt, ContentProcessOutput, temperature=CONTENT_TEMPERATURE)
+
+def process_long_content(plan: ContentPlan, model: str = GEMINI_MODEL) -> ContentProcessOutput:
+    """
+    مرحله ۲ برای مقاله‌های طولانی: تکه‌ها به‌صورت موازی ترجمه و به ترتیب سرهم می‌شوند،
+    سپس خلاصه پلتفرم‌ها از روی ترجمه فارسی ساخته می‌شود. ترجمه کامل هم در خروجی برمی‌گردد.
+    """
+    logger.info(f"Translating long content in {len(plan.chunk_prompts)} chunks (~{plan.content_tokens} tokens)")
+
+    def translate_chunk(chunk_prompt) -> ChunkTranslationOutput:
+        sys_instruction, prompt = chunk_prompt
+        return _generate_structured(model, sys_instruction, prompt, ChunkTranslationOutput,
+                                    temperature=CONTENT_TEMPERATURE)
+
+    with ThreadPoolExecutor(max_workers=CONTENT_CHUNK_WORKERS, thread_name_prefix="chunk-translate") as executor:
+        translated = join_chunk_translations(list(executor.map(translate_chunk, plan.chunk_prompts)))
+
+    sys_instruction, prompt = plan.summary_prompt(translated)
+    summaries = _generate_structured(model, sys_instruction, prompt, ContentProcessOutput, temperature=CONTENT_TEMPERATURE)
+    return merge_map_reduce(translated, summaries)
 
 # ---------------------------
 # RabbitMQ Callbacks
 # ---------------------------
+def retry_later(ch, method, properties, body, queue_name: str):
+    """
+    پیام ناموفق را به‌جای requeue فوری، با تأخیر نمایی دوباره در صف قرار می‌دهد و پیام فعلی را ack می‌کند.
+    اگر زمان‌بندی مجدد ممکن نباشد، به همان nack با requeue برمی‌گردیم.
+    """
+    try:
+        scheduled = schedule_retry(queue_name, body, properties)
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+    except Exception as e:
+        logger.error(f"Could not schedule a delayed retry for queue '{queue_name}': {e}")
+        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        return
+    if should_release_parked_job(queue_name, parked=not scheduled):
+        release_parked_content_job(body)
+
+def release_parked_content_job(body: bytes):
+    """
+    کار پردازش محتوایی که پس از همه تلاش‌ها در صف dead پارک شده، پست را در PROCESSING_CONTENT رها می‌کند؛
+    پست به PENDING_APPROVAL برمی‌گردد تا مدیر بتواند دوباره درخواست پردازش دهد.
+    """
+    try:
+        post_id = parked_post_id(body)
+        check_release_response(post_id, management_api.mark_pending(post_id))
+    except Exception as e:
+        logger.error(f"Could not release parked content job: {e}")
+
 def on_post_created_callback(ch, method, properties, body):
     """Callback برای صف post_created_queue (مرحله ۱: پیش‌پردازش)"""
     try:
-        message = json.loads(body)
-        post_id = message.get("post_id")
+        event = events.parse_post_event(body)
+        post_id = event.post_id
         if not post_id:
             logger.warning("Received message without post_id; acking.")
             ch.basic_ack(delivery_tag=method.delivery_tag)
             return
 
         logger.info(f"📬 [PREPROCESS] Received post_created for post_id={post_id}")
-        post_details = get_post_details(post_id)
-        if not post_details:
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        post_details = None
+        if needs_post_details(event):
+            # رویداد نسخه‌دار عنوان و تصویر شاخص را دارد؛ فقط رویداد قدیمی GET کامل پست لازم دارد
+            post_details = get_post_details(post_id)
+            if not post_details:
+                retry_later(ch, method, properties, body, POST_CREATED_QUEUE)
+                return
+        title, featured_image_url = title_and_featured_image(event, post_details)
+
+        if title_batcher:
+            # در حالت دسته‌ای، ack/nack پس از پردازش دسته انجام می‌شود
+            title_batcher.submit({"ch": ch, "method": method, "properties": properties, "body": body,
+                                  "post_id": post_id, "title": title, "featured_image_url": featured_image_url})
             return
 
-        title = post_details.get("title_original")
         result = preprocess_title_and_score(title)
-        
-        # استخراج اولین تصویر به عنوان تصویر شاخص
-        featured_image_url = (post_details.get("images")[0].get("url") 
-                              if post_details.get("images") else None)
-
-        save_preprocessing_result(post_id, result, featured_image_url)
+        if not save_preprocessing_result(post_id, result, featured_image_url):
+            # نتیجه مدل در کش است؛ تلاش بعدی فقط ذخیره را تکرار می‌کند
+            retry_later(ch, method, properties, body, POST_CREATED_QUEUE)
+            return
         logger.info(f"✅ [PREPROCESS] Finished for post_id={post_id}")
         ch.basic_ack(delivery_tag=method.delivery_tag)
 
     except Exception as e:
         logger.error(f"Failed to preprocess message: {e}", exc_info=True)
-        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        retry_later(ch, method, properties, body, POST_CREATED_QUEUE)
+
+def process_title_batch(batch: List[dict]):
+    """یک دسته از پیام‌های post_created را با یک درخواست Gemini پیش‌پردازش کرده و نتیجه هر پست را جداگانه ذخیره و ack می‌کند."""
+    logger.info(f"📦 [PREPROCESS] Processing batch of {len(batch)} titles")
+    try:
+        results = preprocess_titles_batch([item["title"] for item in batch])
+    except Exception as e:
+        logger.error(f"Batch preprocessing failed for {len(batch)} titles: {e}", exc_info=True)
+        results = [None] * len(batch)
+
+    for item, result in zip(batch, results):
+        ch, method, post_id = item["ch"], item["method"], item["post_id"]
+        try:
+            if result is None:
+                # مدل برای این عنوان خروجی نداد؛ به درخواست تکی برمی‌گردیم
+                result = preprocess_title_and_score(item["title"])
+            if not save_preprocessing_result(post_id, result, item["featured_image_url"]):
+                retry_later(ch, method, item["properties"], item["body"], POST_CREATED_QUEUE)
+                continue
+            logger.info(f"✅ [PREPROCESS] Finished for post_id={post_id}")
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+        except Exception as e:
+            logger.error(f"Failed to preprocess post_id={post_id} from batch: {e}", exc_info=True)
+            retry_later(ch, method, item["properties"], item["body"], POST_CREATED_QUEUE)
+
+title_batcher = (
+    MicroBatcher(process_title_batch, max_items=PREPROCESS_BATCH_SIZE, max_wait_ms=PREPROCESS_BATCH_WAIT_MS)
+    if PREPROCESS_BATCH_SIZE > 1 else None
+)
 
 # FILE: ./services/processor-service/app/main.py
 
 def on_content_processing_callback(ch, method, properties, body):
     """Callback برای صف content_processing_queue (مرحله ۲: پردازش محتوا)"""
     try:
-        message = json.loads(body)
-        post_id = message.get("post_id")
-        platforms = message.get("platforms", [])
+        post_id, platforms = content_request(events.parse_post_event(body))
         if not post_id or not platforms:
             logger.warning("Received invalid content processing request; acking.")
             ch.basic_ack(delivery_tag=method.delivery_tag)
@@ -265,13 +364,14 @@ def on_content_processing_callback(ch, method, properties, body):
         logger.info(f"📬 [PROCESS CONTENT] Received request for post_id={post_id}, platforms={platforms}")
         post_details = get_post_details(post_id)
         if not post_details or not post_details.get("translations"):
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            retry_later(ch, method, properties, body, CONTENT_PROCESSING_QUEUE)
             return
 
         content = post_details.get("content_original")
-        result = process_content_for_platforms(content, platforms)
-        
-        translation_id = post_details["translations"][0]["id"]
+        translation = post_details["translations"][0]
+        result = process_content_for_platforms(content, platforms, translation=translation)
+
+        translation_id = translation["id"]
         
         # --- START: این خط اصلاح شده است ---
         # ما post_id را به عنوان ورودی سوم به تابع پاس می‌دهیم
@@ -280,11 +380,11 @@ def on_content_processing_callback(ch, method, properties, body):
             logger.info(f"✅ [PROCESS CONTENT] Finished for post_id={post_id}")
             ch.basic_ack(delivery_tag=method.delivery_tag)
         else:
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+            retry_later(ch, method, properties, body, CONTENT_PROCESSING_QUEUE)
 
     except Exception as e:
         logger.error(f"Failed to process content message: {e}", exc_info=True)
-        ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+        retry_later(ch, method, properties, body, CONTENT_PROCESSING_QUEUE)
 
 # ---------------------------
 # Main Function
@@ -294,22 +394,23 @@ def main():
     if not client:
         logger.critical("❌ Gemini client is not available; exiting.")
         return
+    start_metrics_server()
+
+    if PROCESSOR_RUNTIME == "async":
+        from app.async_runtime import AsyncProcessorRuntime
+        logger.info(f"Using asyncio runtime (max_in_flight={PROCESSOR_MAX_IN_FLIGHT})")
+        AsyncProcessorRuntime(client, gemini_limiter, generation_config=_generation_config,
+                              is_throttling_error=is_throttling_error, llm_cache=llm_cache,
+                              max_in_flight=PROCESSOR_MAX_IN_FLIGHT).run()
+        return
 
-    # ایجاد و اجرای هر listener در یک thread جداگانه
-    def listen(queue_name, callback_func):
-        with RabbitMQClient() as rmq:
-            rmq.channel.queue_declare(queue=queue_name, durable=True)
-            logger.info(f"Waiting for messages in '{queue_name}'...")
-            rmq.start_consuming(queue_name=queue_name, callback=callback_func)
-
-    preprocess_thread = threading.Thread(target=listen, args=(POST_CREATED_QUEUE, on_post_created_callback))
-    content_process_thread = threading.Thread(target=listen, args=(CONTENT_PROCESSING_QUEUE, on_content_processing_callback))
-
-    preprocess_thread.start()
-    content_process_thread.start()
-
-    preprocess_thread.join()
-    content_process_thread.join()
+    # هر صف روی کانال خودش با prefetch مستقل مصرف می‌شود و callbackها روی یک thread pool اجرا می‌شوند
+    runtime = ConsumerRuntime()
+    runtime.add_queue(POST_CREATED_QUEUE, on_post_created_callback,
+                      prefetch_count=PREPROCESS_PREFETCH, workers=PREPROCESS_WORKERS)
+    runtime.add_queue(CONTENT_PROCESSING_QUEUE, on_content_processing_callback,
+                      prefetch_count=CONTENT_PREFETCH, workers=CONTENT_WORKERS)
+    runtime.run()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
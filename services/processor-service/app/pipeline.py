@@ -0,0 +1,150 @@
+# FILE: ./services/processor-service/app/pipeline.py
+# منطق مشترک و بدون I/O دو مرحله پردازش؛ اجرای thread-based (main.py) و asyncio (async_runtime.py)
+# فقط فراخوانی Gemini، management-api و RabbitMQ را خودشان انجام می‌دهند.
+
+import logging
+import os
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from common import events
+from app.prompts import (
+    ChunkTranslationOutput, ContentProcessOutput, PreProcessOutput,
+    build_chunk_translation_prompt, build_content_prompt, build_summary_prompt, plan_content_generation,
+)
+from app.content_prep import CONTENT_CHUNK_TOKENS, estimate_tokens, prepare_content, split_into_chunks
+
+load_dotenv()
+
+logger = logging.getLogger("processor-service-v2")
+
+POST_CREATED_QUEUE = os.getenv("POST_CREATED_QUEUE", "post_created_queue")
+CONTENT_PROCESSING_QUEUE = os.getenv("CONTENT_PROCESSING_QUEUE", "content_processing_queue")
+GEMINI_MODEL = "gemini-2.5-flash"
+
+# --- مقاله‌های طولانی: ترجمه تکه‌تکه و موازی (map-reduce) و سپس خلاصه‌سازی از روی ترجمه ---
+CONTENT_MAP_REDUCE = os.getenv("CONTENT_MAP_REDUCE", "true").lower() in ("1", "true", "yes")
+
+# --- وقتی ترجمه کامل موجود است، همه پلتفرم‌های بدون خلاصه در یک درخواست پر شوند ---
+CONTENT_FILL_ALL_MISSING = os.getenv("CONTENT_FILL_ALL_MISSING", "false").lower() in ("1", "true", "yes")
+
+
+# ---------------------------
+# مرحله ۱: پیش‌پردازش
+# ---------------------------
+def title_and_featured_image(event: events.PostEvent, post_details: Optional[dict] = None) -> Tuple[str, Optional[str]]:
+    """
+    عنوان و تصویر شاخص پست؛ رویداد نسخه‌دار هر دو را دارد و در غیر این صورت از post_details
+    (پاسخ GET /posts/{id}) خوانده می‌شوند. `needs_post_details` می‌گوید GET لازم است یا نه.
+    """
+    if post_details is None:
+        return event.get("title_original"), event.get("featured_image_url")
+    images = post_details.get("images")
+    return post_details.get("title_original"), (images[0].get("url") if images else None)
+
+
+def needs_post_details(event: events.PostEvent) -> bool:
+    return not event.has("title_original")
+
+
+def preprocessing_payload(result: PreProcessOutput, featured_image_url: Optional[str]) -> dict:
+    return {
+        "language": "fa",
+        "title_translated": result.title_translated,
+        "score": result.quality_score,
+        "featured_image_url": featured_image_url,
+    }
+
+
+# ---------------------------
+# مرحله ۲: پردازش محتوا
+# ---------------------------
+class ContentPlan:
+    """
+    کاری که یک درخواست پردازش محتوا به Gemini نیاز دارد:
+    SKIP: همه خلاصه‌های درخواستی موجود است؛
+    DIRECT: یک درخواست با `prompt`؛
+    MAP_REDUCE: ترجمه موازی `chunk_prompts`، سپس `summary_prompt` روی ترجمه سرهم‌شده و `merge_map_reduce`.
+    """
+    SKIP = "skip"
+    DIRECT = "direct"
+    MAP_REDUCE = "map_reduce"
+
+    def __init__(self, kind: str, platforms: List[str], prompt: Optional[Tuple[str, str]] = None,
+                 chunk_prompts: Optional[List[Tuple[str, str]]] = None, content_tokens: int = 0):
+        self.kind = kind
+        self.platforms = platforms
+        self.prompt = prompt
+        self.chunk_prompts = chunk_prompts or []
+        self.content_tokens = content_tokens
+
+    def summary_prompt(self, translated: str) -> Tuple[str, str]:
+        return build_summary_prompt(translated, self.platforms)
+
+
+def plan_content_request(content: str, platforms: List[str], translation: Optional[dict] = None) -> ContentPlan:
+    """
+    اگر `translation` ترجمه کامل فارسی داشته باشد، فقط خلاصه‌های ناموجود از روی همان ساخته می‌شوند؛
+    وگرنه متن پاک‌سازی می‌شود و مقاله طولانی (با CONTENT_MAP_REDUCE) تکه‌تکه ترجمه می‌شود.
+    """
+    translated, targets = plan_content_generation(translation, platforms, CONTENT_FILL_ALL_MISSING)
+    if translated is not None:
+        if not targets:
+            return ContentPlan(ContentPlan.SKIP, [])
+        return ContentPlan(ContentPlan.DIRECT, targets, prompt=build_summary_prompt(translated, targets))
+
+    content = prepare_content(content)
+    tokens = estimate_tokens(content)
+    if CONTENT_MAP_REDUCE and tokens > CONTENT_CHUNK_TOKENS:
+        chunks = split_into_chunks(content)
+        chunk_prompts = [build_chunk_translation_prompt(chunk, i, len(chunks)) for i, chunk in enumerate(chunks)]
+        return ContentPlan(ContentPlan.MAP_REDUCE, list(platforms), chunk_prompts=chunk_prompts, content_tokens=tokens)
+    return ContentPlan(ContentPlan.DIRECT, list(platforms), prompt=build_content_prompt(content, platforms))
+
+
+def join_chunk_translations(parts: List[ChunkTranslationOutput]) -> str:
+    """ترجمه تکه‌ها را به ترتیب و با حفظ مرز پاراگراف سرهم می‌کند."""
+    return "\n\n".join(part.text for part in parts)
+
+
+def merge_map_reduce(translated: str, summaries: ContentProcessOutput) -> ContentProcessOutput:
+    """ترجمه کامل سرهم‌شده به همراه خلاصه‌های پلتفرم‌ها؛ content_translated احتمالی مدل نادیده گرفته می‌شود."""
+    return ContentProcessOutput(
+        content_translated=translated,
+        **summaries.model_dump(exclude_unset=True, exclude={"content_translated"}),
+    )
+
+
+def content_request(event: events.PostEvent) -> Tuple[Optional[int], List[str]]:
+    """(post_id, platforms) یک درخواست پردازش محتوا؛ اگر یکی خالی باشد درخواست نامعتبر است."""
+    return event.post_id, event.get("platforms", [])
+
+
+def content_result_payload(result: ContentProcessOutput, translation_id: int) -> dict:
+    # exclude_none: فیلدی که مدل null برگرداند، ترجمه یا خلاصه‌های قبلی را پاک نمی‌کند
+    payload = result.model_dump(exclude_unset=True, exclude_none=True)
+    payload["language"] = "fa"  # فیلد اجباری زبان
+    payload["translation_id"] = translation_id
+    return payload
+
+
+def should_release_parked_job(queue_name: str, parked: bool) -> bool:
+    """کار پردازش محتوایی که در صف dead پارک شده، پستش را به PENDING_APPROVAL برمی‌گرداند."""
+    return parked and queue_name == CONTENT_PROCESSING_QUEUE
+
+
+def parked_post_id(body: bytes) -> Optional[int]:
+    return events.parse_post_event(body).post_id
+
+
+def check_release_response(post_id: int, response):
+    """
+    پاسخ POST /posts/{id}/pending برای کار پارک‌شده (requests یا httpx)؛ 409 یعنی پست قبلاً از
+    PROCESSING_CONTENT خارج شده است. خطاهای دیگر raise می‌شوند.
+    """
+    if response.status_code == 409:
+        logger.info(f"Post {post_id} already left PROCESSING_CONTENT; nothing to release.")
+        return
+    response.raise_for_status()
+    logger.warning(f"Content job for post_id={post_id} was parked; post returned to PENDING_APPROVAL.")
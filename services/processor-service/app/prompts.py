@@ -0,0 +1,163 @@
+# FILE: ./services/processor-service/app/prompts.py
+# اسکیماهای خروجی ساختاریافته و سازنده‌های پرامپت؛ بین اجرای thread-based و asyncio مشترک است.
+
+from typing import List, Optional, Tuple
+
+from pydantic import BaseModel
+
+# ---------------------------
+# Structured Output Schemas
+# ---------------------------
+# خروجی مرحله اول: پیش‌پردازش
+class PreProcessOutput(BaseModel):
+    title_translated: str
+    quality_score: float  # 0..10
+
+# خروجی مرحله اول در حالت دسته‌ای: یک آیتم به ازای هر عنوان، با شماره همان عنوان در ورودی
+class PreProcessBatchItem(BaseModel):
+    index: int
+    title_translated: str
+    quality_score: float
+
+class PreProcessBatchOutput(BaseModel):
+    items: List[PreProcessBatchItem]
+
+# خروجی مرحله دوم: پردازش محتوا
+class ContentProcessOutput(BaseModel):
+    content_translated: Optional[str] = None
+    content_telegram: Optional[str] = None
+    content_instagram: Optional[str] = None
+    content_twitter: Optional[str] = None
+
+# خروجی ترجمه یک تکه از مقاله‌های طولانی (حالت map-reduce)
+class ChunkTranslationOutput(BaseModel):
+    text: str
+
+# ---------------------------
+# Prompt Builders
+# ---------------------------
+# هر سازنده یک زوج (system_instruction, prompt) برمی‌گرداند
+
+PREPROCESS_TEMPERATURE = 0.2
+CONTENT_TEMPERATURE = 0.3
+
+def safety_settings():
+    # ... (بدون تغییر) ...
+    pass
+
+def build_preprocess_prompt(title: str) -> Tuple[str, str]:
+    """مرحله ۱: پرامپت ترجمه و امتیازدهی یک عنوان."""
+    sys_instruction = (
+        "You are a professional Persian translator and editor. "
+        "Return ONLY JSON with fields: title_translated (string), quality_score (number). "
+        "Requirements: "
+        "1) Translate the title to fluent, engaging Persian. "
+        "2) quality_score in [0,10] reflecting translation fidelity and clarity; use a dot for decimals."
+    )
+    prompt = f'**Title:** "{title or ""}"'
+    return sys_instruction, prompt
+
+def build_preprocess_batch_prompt(titles: List[str]) -> Tuple[str, str]:
+    """مرحله ۱ (دسته‌ای): پرامپت یک فهرست شماره‌دار از عنوان‌ها."""
+    sys_instruction = (
+        "You are a professional Persian translator and editor. "
+        "You will receive a numbered list of news titles. "
+        "Return ONLY JSON with a field 'items': one object per title with fields "
+        "index (the number of the title), title_translated (string), quality_score (number). "
+        "Requirements: "
+        "1) Translate each title to fluent, engaging Persian. "
+        "2) quality_score in [0,10] reflecting translation fidelity and clarity; use a dot for decimals. "
+        "3) Return exactly one item for every title and keep each index unchanged."
+    )
+    prompt = "\n".join(f'{i}. **Title:** "{title or ""}"' for i, title in enumerate(titles))
+    return sys_instruction, prompt
+
+def build_content_prompt(content: str, platforms: List[str]) -> Tuple[str, str]:
+    """مرحله ۲: پرامپت پردازش محتوا بر اساس پلتفرم‌های درخواستی و با بهینه‌سازی دقیق هزینه."""
+    # --- START: منطق نهایی و اصلاح شده برای ساخت پرامپت ---
+
+    # اگر بیش از یک پلتفرم در لیست باشد، به معنی "تایید کل" است
+    is_approve_all = len(platforms) > 1
+
+    platform_requirements = []
+
+    if is_approve_all:
+        # حالت کامل: ابتدا ترجمه کامل، سپس خلاصه‌سازی برای همه
+        platform_requirements.append("1. First, translate the entire original **Content** into fluent Persian. The result MUST be in the 'content_translated' field.")
+        platform_requirements.append("2. From the translated content, generate 'content_telegram': A concise Persian summary, under 1000 characters.")
+        platform_requirements.append("3. From the translated content, generate 'content_instagram': An engaging Persian summary for Instagram, under 2200 characters, with relevant hashtags.")
+        platform_requirements.append("4. From the translated content, generate 'content_twitter': A very short Persian summary for Twitter/X, under 280 characters.")
+    else:
+        # یک پلتفرم: ترجمه کامل هم تولید و ذخیره می‌شود تا خلاصه پلتفرم‌های بعدی از روی همان
+        # ترجمه فارسی (plan_content_generation) ساخته شود و متن انگلیسی دوباره ارسال نشود
+        target_platform = platforms[0] # چون در این حالت فقط یک پلتفرم داریم
+        platform_requirements.append("1. First, translate the entire original **Content** into fluent Persian. The result MUST be in the 'content_translated' field.")
+        if target_platform in PLATFORM_SUMMARY_REQUIREMENTS:
+            platform_requirements.append(f"2. From the translated content, generate {PLATFORM_SUMMARY_REQUIREMENTS[target_platform]} Do NOT provide summaries for other platforms.")
+
+    sys_instruction = (
+        "You are a professional Persian translator and multi-platform copywriter.\n"
+        "Return ONLY a JSON object with the requested fields.\n"
+        "Instructions:\n" + "\n".join(platform_requirements)
+    )
+    # --- END: پایان منطق نهایی ---
+
+    prompt = f'**Content:**\n"{content or ""}"'
+    return sys_instruction, prompt
+
+PLATFORM_SUMMARY_REQUIREMENTS = {
+    "telegram": "'content_telegram': A concise Persian summary, under 1000 characters.",
+    "instagram": "'content_instagram': An engaging Persian summary for Instagram, under 2200 characters, with relevant hashtags.",
+    "twitter": "'content_twitter': A very short Persian summary for Twitter/X, under 280 characters.",
+}
+
+def build_chunk_translation_prompt(chunk: str, index: int, total: int) -> Tuple[str, str]:
+    """حالت map-reduce: پرامپت ترجمه یک تکه از مقاله طولانی."""
+    sys_instruction = (
+        "You are a professional Persian translator.\n"
+        "Return ONLY a JSON object with a single field 'text'.\n"
+        f"You will receive part {index + 1} of {total} of a longer article. "
+        "Translate it completely and faithfully into fluent Persian, keeping paragraph breaks. "
+        "Do not summarize, and do not add introductions or notes."
+    )
+    prompt = f'**Content part {index + 1}/{total}:**\n"{chunk}"'
+    return sys_instruction, prompt
+
+def build_summary_prompt(translated_content: str, platforms: List[str]) -> Tuple[str, str]:
+    """حالت map-reduce: پرامپت خلاصه‌های پلتفرم‌ها از روی ترجمه فارسیِ سرهم‌شده."""
+    requirements = [f"- Generate {PLATFORM_SUMMARY_REQUIREMENTS[p]}" for p in platforms if p in PLATFORM_SUMMARY_REQUIREMENTS]
+    sys_instruction = (
+        "You are a professional Persian multi-platform copywriter.\n"
+        "The **Content** below is already in Persian. Return ONLY a JSON object with the requested fields "
+        "and do NOT provide 'content_translated'.\n"
+        "Instructions:\n" + "\n".join(requirements)
+    )
+    prompt = f'**Content:**\n"{translated_content}"'
+    return sys_instruction, prompt
+
+ALL_PLATFORMS = ("telegram", "instagram", "twitter")
+
+def plan_content_generation(translation: dict, platforms: List[str],
+                            fill_all_missing: bool = False) -> Tuple[Optional[str], List[str]]:
+    """
+    اگر ترجمه فارسی کامل قبلاً ذخیره شده باشد، خلاصه‌ها از روی همان (و نه متن انگلیسی) ساخته می‌شوند.
+    خروجی: (ترجمه موجود یا None، پلتفرم‌هایی که باید تولید شوند). پلتفرمی که خلاصه‌اش موجود است
+    دوباره تولید نمی‌شود؛ با fill_all_missing همه پلتفرم‌های خالی در همان یک درخواست پر می‌شوند.
+    """
+    translated = (translation or {}).get("content_translated")
+    if not translated:
+        return None, list(platforms)
+    missing = [p for p in ALL_PLATFORMS if not translation.get(f"content_{p}")]
+    targets = [p for p in platforms if p in missing]
+    if fill_all_missing and targets:
+        targets = missing
+    return translated, targets
+
+def collect_batch_results(titles: List[str], output: Optional[PreProcessBatchOutput]) -> List[Optional[PreProcessOutput]]:
+    """خروجی دسته‌ای مدل را به فهرستی هم‌ترتیب با عنوان‌های ورودی تبدیل می‌کند؛ عنوان بی‌پاسخ None می‌ماند."""
+    results: List[Optional[PreProcessOutput]] = [None] * len(titles)
+    for item in (output.items if output else []):
+        if 0 <= item.index < len(titles):
+            results[item.index] = PreProcessOutput(title_translated=item.title_translated,
+                                                   quality_score=item.quality_score)
+    return results
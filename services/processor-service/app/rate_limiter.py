@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveRateLimiter:
+    """
+    Thread-safe token bucket whose refill rate adapts to upstream feedback.
+
+    `acquire()` (or `await acquire_async()`) waits until a token is available.
+    `on_throttle()` (429/5xx) halves the rate down to `min_rate` and drains the
+    bucket, and every `on_success()` adds `increase_step` back up to `max_rate`
+    (AIMD), so the call rate settles just below what the API currently allows.
+    """
+
+    def __init__(self, max_rate: float, min_rate: float, burst: int, increase_step: float):
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.burst = max(1, burst)
+        self.increase_step = increase_step
+        self.rate = max_rate
+        self._tokens = float(self.burst)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _try_take(self) -> float:
+        """Takes a token if one is available and returns 0, otherwise returns how long to wait."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self):
+        while True:
+            wait = self._try_take()
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self):
+        while True:
+            wait = self._try_take()
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.increase_step)
+
+    def on_throttle(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = min(self._tokens, 0.0)
+        logger.warning(f"Gemini throttled; request rate lowered to {self.rate:.2f}/s.")
@@ -1,47 +1,63 @@
 # FILE: ./services/publisher-service/app/main.py
 
 import logging
-import os
 import json
-import requests
+import threading
+import time
 import telegram
 from dotenv import load_dotenv
 
 from common.logging_config import setup_logging
 from common.rabbit import RabbitMQClient
+from common import events
+from common.management_client import get_management_client
+from common.metrics import instrument_callback, start_metrics_server
+from app.source_cache import SourceCache
 
 load_dotenv()
 setup_logging()
 logger = logging.getLogger(__name__)
 
 QUEUE_NAME = "post_approval_queue"
-MANAGEMENT_API_URL = os.getenv("MANAGEMENT_API_URL", "http://management-api:8000")
+SOURCES_CHANGED_EXCHANGE = "sources_changed"
+# session مشترک با keep-alive، timeout و تلاش مجدد برای همه فراخوانی‌های management-api
+management_api = get_management_client()
 
 def get_post_details(post_id: int):
     """اطلاعات کامل یک پست را از management-api دریافت می‌کند."""
-    try:
-        response = requests.get(f"{MANAGEMENT_API_URL}/posts/{post_id}")
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not fetch details for post_id: {post_id}. Error: {e}")
-        return None
+    return management_api.get_post(post_id)
+
+source_cache = SourceCache(loader=management_api.get_source)
 
 def get_source_with_destinations(source_id: int):
-    """اطلاعات کامل یک منبع را به همراه مقصدهای متصل به آن دریافت می‌کند."""
+    """منبع را از کش محلی (با TTL) برمی‌گرداند و در صورت نبود، آن را از management-api می‌خواند."""
+    return source_cache.get(source_id)
+
+def on_sources_changed(ch, method, properties, body):
+    """با هر تغییر در منابع یا مقصدها، کش منابع را باطل می‌کند."""
     try:
-        # ما لیست تمام منابع را می‌گیریم و منبع مورد نظر را فیلتر می‌کنیم
-        response = requests.get(f"{MANAGEMENT_API_URL}/sources")
-        response.raise_for_status()
-        all_sources = response.json()
-        for source in all_sources:
-            if source.get("id") == source_id:
-                return source
-        logger.warning(f"Source with id {source_id} not found.")
-        return None
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not fetch sources. Error: {e}")
-        return None
+        source_id = json.loads(body).get("source_id")
+    except (ValueError, AttributeError):
+        source_id = None
+    source_cache.invalidate(source_id)
+
+def listen_for_source_changes():
+    """به exchange تغییرات منابع گوش می‌دهد؛ در صورت قطع اتصال، کل کش باطل و اتصال دوباره برقرار می‌شود."""
+    while True:
+        try:
+            with RabbitMQClient() as rmq:
+                rmq.channel.exchange_declare(exchange=SOURCES_CHANGED_EXCHANGE, exchange_type="fanout", durable=True)
+                result = rmq.channel.queue_declare(queue="", exclusive=True)
+                queue_name = result.method.queue
+                rmq.channel.queue_bind(exchange=SOURCES_CHANGED_EXCHANGE, queue=queue_name)
+                # ممکن است در زمان قطع اتصال رویدادی از دست رفته باشد
+                source_cache.invalidate()
+                rmq.channel.basic_consume(queue=queue_name, on_message_callback=on_sources_changed, auto_ack=True)
+                logger.info(f"Listening for source changes on exchange '{SOURCES_CHANGED_EXCHANGE}'.")
+                rmq.channel.start_consuming()
+        except Exception as e:
+            logger.error(f"Source change listener disconnected. Retrying in 10 seconds... Error: {e}")
+            time.sleep(10)
 
 
 def publish_to_telegram(destination: dict, post_translation: dict, post_url: str):
@@ -102,8 +118,8 @@ def publish_to_telegram(destination: dict, post_translation: dict, post_url: str
 def callback(ch, method, properties, body):
     """این تابع به محض دریافت پیام از RabbitMQ اجرا می‌شود."""
     try:
-        message = json.loads(body)
-        post_id = message.get("post_id")
+        event = events.parse_post_event(body)
+        post_id = event.post_id
 
         if not post_id:
             logger.warning("Received a message without a post_id.")
@@ -112,7 +128,11 @@ def callback(ch, method, properties, body):
 
         logger.info(f"📬 Received post approval for post_id: {post_id}. Starting publishing process...")
 
-        post_details = get_post_details(post_id)
+        # رویداد نسخه‌دار منبع و ترجمه لازم برای انتشار را دارد؛ در غیر این صورت پست از API خوانده می‌شود
+        if event.has("source_id", "title_translated"):
+            post_details = event.as_post_details()
+        else:
+            post_details = get_post_details(post_id)
         if not post_details:
             ch.basic_nack(delivery_tag=method.delivery_tag)
             return
@@ -150,10 +170,12 @@ def callback(ch, method, properties, body):
 
 def main():
     logger.info("--- 📮 Publisher Service Started ---")
+    start_metrics_server()
+    threading.Thread(target=listen_for_source_changes, daemon=True).start()
     with RabbitMQClient() as client:
         client.channel.queue_declare(queue=QUEUE_NAME, durable=True)
         logger.info(f"Waiting for messages in queue '{QUEUE_NAME}'. To exit press CTRL+C")
-        client.start_consuming(queue_name=QUEUE_NAME, callback=callback)
+        client.start_consuming(queue_name=QUEUE_NAME, callback=instrument_callback(QUEUE_NAME, callback))
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
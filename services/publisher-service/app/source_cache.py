@@ -0,0 +1,47 @@
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SOURCE_CACHE_TTL = float(os.getenv("SOURCE_CACHE_TTL", 300))
+
+
+class SourceCache:
+    """
+    In-process read-through TTL cache for sources and their destinations.
+
+    Entries are loaded with `loader(source_id)` on a miss or after they expire,
+    and can be dropped early with `invalidate()` when management-api announces
+    a change. Failed loads (None) are not cached.
+    """
+
+    def __init__(self, loader: Callable[[int], Optional[dict]], ttl: float = SOURCE_CACHE_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self._entries: Dict[int, Tuple[float, dict]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, source_id: int) -> Optional[dict]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(source_id)
+            if entry and entry[0] > now:
+                return entry[1]
+
+        source = self.loader(source_id)
+        if source is not None:
+            with self._lock:
+                self._entries[source_id] = (now + self.ttl, source)
+        return source
+
+    def invalidate(self, source_id: Optional[int] = None):
+        """Drops one source, or the whole cache when no id is given."""
+        with self._lock:
+            if source_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(source_id, None)
+        logger.info(f"Source cache invalidated (source_id={source_id}).")
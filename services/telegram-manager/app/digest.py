@@ -0,0 +1,170 @@
+# FILE: ./services/telegram-manager/app/digest.py
+# حالت خلاصه (digest) برای بازبینی اولیه: چند پست در یک پیام صفحه‌بندی‌شده به جای یک پیام برای هر پست
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.utils.helpers import escape_markdown
+
+logger = logging.getLogger(__name__)
+
+REVIEW_DIGEST_MODE = os.getenv("REVIEW_DIGEST_MODE", "false").lower() in ("1", "true", "yes")
+REVIEW_DIGEST_INTERVAL = float(os.getenv("REVIEW_DIGEST_INTERVAL", 60))
+REVIEW_DIGEST_PAGE_SIZE = int(os.getenv("REVIEW_DIGEST_PAGE_SIZE", 8))
+# حداکثر پست‌های یک digest؛ با رسیدن به آن digest زودتر از موعد ارسال می‌شود (و prefetch صف هم همین است)
+REVIEW_DIGEST_MAX_POSTS = int(os.getenv("REVIEW_DIGEST_MAX_POSTS", 64))
+# تعداد صفحه‌های اخیری که برای ویرایش در جا نگه داشته می‌شوند
+REVIEW_DIGEST_KEEP_PAGES = int(os.getenv("REVIEW_DIGEST_KEEP_PAGES", 500))
+
+
+class DigestEntry:
+    def __init__(self, post_id: int, title: str, score: float, on_sent: Optional[Callable[[bool], None]]):
+        self.post_id = post_id
+        self.title = title
+        self.score = score
+        self.on_sent = on_sent
+        self.decision: Optional[str] = None
+
+
+class DigestPage:
+    def __init__(self, entries: List[DigestEntry], number: int, total: int):
+        self.entries = entries
+        self.number = number
+        self.total = total
+        # chat_id -> message_id پیام این صفحه برای هر مدیر
+        self.messages: Dict[str, int] = {}
+
+    def render(self) -> Tuple[str, Optional[InlineKeyboardMarkup]]:
+        lines = [f"🗂 **پست‌های جدید برای بازبینی** (صفحه {self.number}/{self.total})", ""]
+        keyboard = []
+        for entry in self.entries:
+            # عنوان‌ها متن آزاد هستند؛ یک _ یا * در یک عنوان نباید کل صفحه را با خطای Markdown از کار بیندازد
+            line = f"`{entry.post_id}` ⭐ {entry.score:.1f} — {escape_markdown(entry.title or '', version=1)}"
+            if entry.decision:
+                line += f"\n    {entry.decision}"
+            else:
+                keyboard.append([
+                    InlineKeyboardButton(f"✅ {entry.post_id}", callback_data=f"process_all_{entry.post_id}"),
+                    InlineKeyboardButton("💬", callback_data=f"process_telegram_{entry.post_id}"),
+                    InlineKeyboardButton("📸", callback_data=f"process_instagram_{entry.post_id}"),
+                    InlineKeyboardButton("🐦", callback_data=f"process_twitter_{entry.post_id}"),
+                    InlineKeyboardButton("❌", callback_data=f"reject_{entry.post_id}"),
+                ])
+            lines.append(line)
+        return "\n".join(lines), (InlineKeyboardMarkup(keyboard) if keyboard else None)
+
+
+class ReviewDigest:
+    """
+    اعلان‌های review_notifications_queue را جمع می‌کند و هر REVIEW_DIGEST_INTERVAL ثانیه (یا با رسیدن
+    به REVIEW_DIGEST_MAX_POSTS) آنها را در صفحه‌هایی با REVIEW_DIGEST_PAGE_SIZE پست برای مدیران می‌فرستد.
+    به جای یک پیام برای هر پست و هر مدیر، برای هر صفحه و هر مدیر یک پیام ارسال می‌شود.
+
+    تصمیم مدیر روی هر پست با `mark_decided` در همان صفحه (برای همه مدیران) ویرایش می‌شود.
+    وضعیت صفحه‌ها فقط در حافظه است؛ پس از راه‌اندازی مجدد، دکمه‌های صفحه‌های قدیمی همچنان کار می‌کنند
+    ولی صفحه دیگر در جا به‌روز نمی‌شود.
+    """
+
+    def __init__(self, sender, chat_ids: List[str], interval: float = REVIEW_DIGEST_INTERVAL,
+                 page_size: int = REVIEW_DIGEST_PAGE_SIZE, max_posts: int = REVIEW_DIGEST_MAX_POSTS):
+        self.sender = sender
+        self.chat_ids = [chat_id for chat_id in chat_ids if chat_id]
+        self.interval = interval
+        self.page_size = page_size
+        self.max_posts = max_posts
+        self._pending: List[DigestEntry] = []
+        self._pages: "OrderedDict[Tuple[str, int], DigestPage]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flush_now = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="review-digest", daemon=True)
+        self._thread.start()
+        logger.info(f"Review digest mode enabled (interval={self.interval}s, page_size={self.page_size}).")
+
+    def add(self, post_details: dict, on_sent: Optional[Callable[[bool], None]] = None):
+        """
+        یک پست را به digest بعدی اضافه می‌کند؛ on_sent(success) پس از ارسال صفحه آن صدا زده می‌شود.
+        اگر صفحه به هیچ مدیری نرسد، success برابر False است و فراخواننده مسئول ارسال دوباره پست است.
+        """
+        translation = post_details["translations"][0]
+        entry = DigestEntry(post_details.get("id"), translation.get("title_translated"),
+                            translation.get("score") or 0, on_sent)
+        with self._lock:
+            self._pending.append(entry)
+            full = len(self._pending) >= self.max_posts
+        if full:
+            self._flush_now.set()
+
+    def _run(self):
+        while True:
+            self._flush_now.wait(self.interval)
+            self._flush_now.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Failed to send review digest: {e}", exc_info=True)
+
+    def flush(self):
+        with self._lock:
+            entries, self._pending = self._pending, []
+        if not entries:
+            return
+        chunks = [entries[i:i + self.page_size] for i in range(0, len(entries), self.page_size)]
+        logger.info(f"Sending review digest with {len(entries)} posts in {len(chunks)} pages.")
+        for number, chunk in enumerate(chunks, start=1):
+            self._send_page(DigestPage(chunk, number, len(chunks)))
+
+    def _send_page(self, page: DigestPage):
+        text, reply_markup = page.render()
+
+        def make_call(chat_id):
+            return lambda b: b.send_message(chat_id=chat_id, text=text, parse_mode="Markdown",
+                                            reply_markup=reply_markup, disable_web_page_preview=True)
+
+        def finish(results):
+            with self._lock:
+                for chat_id, result in results.items():
+                    if isinstance(result, Exception):
+                        logger.error(f"Failed to send digest page {page.number} to chat_id {chat_id}. Error: {result}")
+                        continue
+                    page.messages[str(result.chat_id)] = result.message_id
+                    self._pages[(str(result.chat_id), result.message_id)] = page
+                while len(self._pages) > REVIEW_DIGEST_KEEP_PAGES:
+                    self._pages.popitem(last=False)
+            success = bool(page.messages)
+            for entry in page.entries:
+                if entry.on_sent:
+                    entry.on_sent(success)
+
+        self.sender.fan_out(self.chat_ids, make_call, finish)
+
+    def mark_decided(self, chat_id, message_id: int, post_id: int, decision: str) -> bool:
+        """
+        اگر پیام کلیک‌شده یک صفحه digest باشد، تصمیم را ثبت و صفحه را برای همه مدیران ویرایش می‌کند.
+        False یعنی پیام متعلق به digest نیست و باید مثل پیام تکی با آن رفتار شود.
+        """
+        with self._lock:
+            page = self._pages.get((str(chat_id), message_id))
+            if page is None:
+                return False
+            for entry in page.entries:
+                if entry.post_id == post_id:
+                    entry.decision = decision
+            messages = dict(page.messages)
+            text, reply_markup = page.render()
+
+        self.sender.fan_out(
+            messages.keys(),
+            lambda target: lambda b: b.edit_message_text(text=text, chat_id=target, message_id=messages[target],
+                                                         parse_mode="Markdown", reply_markup=reply_markup,
+                                                         disable_web_page_preview=True),
+        )
+        return True
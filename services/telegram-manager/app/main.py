@@ -5,23 +5,29 @@ import os
 import requests
 import json
 import threading
-import time
 from dotenv import load_dotenv
 
 from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup, error as telegram_error
 from telegram.ext import Dispatcher, CallbackQueryHandler
+from telegram.utils.helpers import escape_markdown
 
 from fastapi import FastAPI, Request, Response
 
 from common.logging_config import setup_logging
-from common.rabbit import RabbitMQClient
+from common.consumer import ConsumerRuntime
+from common import events
+from common.management_client import get_management_client
+from common.metrics import instrument_fastapi
+from common.retry import schedule_retry
+from app.sender import TelegramSender
+from app.webhook import RecentUpdateIds, UpdateWorkerPool
+from app.digest import REVIEW_DIGEST_MAX_POSTS, REVIEW_DIGEST_MODE, ReviewDigest
 
 # --- Configuration ---
 load_dotenv()
 setup_logging()
 logger = logging.getLogger("telegram-manager-webhook")
 
-MANAGEMENT_API_URL = os.getenv("MANAGEMENT_API_URL", "http://management-api:8000")
 TELEGRAM_ADMIN_BOT_TOKEN = os.getenv("TELEGRAM_ADMIN_BOT_TOKEN")
 TELEGRAM_ADMIN_CHAT_IDS = os.getenv("TELEGRAM_ADMIN_CHAT_ID", "").split(',')
 WEBHOOK_URL = os.getenv("WEBHOOK_URL")
@@ -30,27 +36,36 @@ WEBHOOK_URL = os.getenv("WEBHOOK_URL")
 REVIEW_QUEUE = "review_notifications_queue"
 FINAL_APPROVAL_QUEUE = "final_approval_notifications_queue"
 REJECTED_QUEUE = "post_rejected_queue"
+# تعداد اعلان‌هایی که هر صف همزمان (تا پایان ارسال و ack) در جریان دارد
+NOTIFICATION_PREFETCH = int(os.getenv("TELEGRAM_NOTIFICATION_PREFETCH", 16))
 
 # --- Bot & Dispatcher Initialization ---
 bot = Bot(token=TELEGRAM_ADMIN_BOT_TOKEN)
 dispatcher = Dispatcher(bot, None, workers=4, use_context=True)
+# ارسال و ویرایش پیام مدیران از thread مصرف‌کننده RabbitMQ جدا است و موازی و با محدودیت نرخ انجام می‌شود
+sender = TelegramSender(bot)
+# در حالت digest، پست‌های جدید به جای پیام تکی در پیام‌های صفحه‌بندی‌شده دوره‌ای به مدیران می‌رسند
+review_digest = ReviewDigest(sender, TELEGRAM_ADMIN_CHAT_IDS) if REVIEW_DIGEST_MODE else None
 
 # --- FastAPI App ---
 app = FastAPI()
+# /metrics و تاخیر درخواست‌ها به تفکیک route
+instrument_fastapi(app)
+
+# --- API Helpers ---
+# session مشترک با keep-alive، timeout و تلاش مجدد؛ بین webhook، صف ارسال و مصرف‌کننده‌ها مشترک است
+management_api = get_management_client()
 
-# --- API Helpers (بدون تغییر) ---
 def get_post_details(post_id: int):
-    try:
-        response = requests.get(f"{MANAGEMENT_API_URL}/posts/{post_id}")
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Could not fetch details for post_id={post_id}: {e}")
-        return None
+    return management_api.get_post(post_id)
 
 def mark_as_pending_approval(post_id: int):
     try:
-        response = requests.post(f"{MANAGEMENT_API_URL}/posts/{post_id}/pending")
+        response = management_api.mark_pending(post_id)
+        if response.status_code == 409:
+            # پست در این فاصله رد یا تایید شده است؛ انتقال با compare-and-set رد شد
+            logger.info(f"Post {post_id} can no longer be marked as pending: {response.text}")
+            return False
         response.raise_for_status()
         return True
     except requests.exceptions.RequestException as e:
@@ -58,7 +73,11 @@ def mark_as_pending_approval(post_id: int):
         return False
 
 # --- Message Senders & Updaters (بدون تغییر) ---
-def send_initial_approval_request(bot_instance, post_data):
+def send_initial_approval_request(post_data, on_done=None):
+    """
+    پیام بازبینی را به‌صورت موازی برای همه مدیران در صف ارسال می‌گذارد و بلافاصله برمی‌گردد.
+    پس از پایان ارسال به همه چت‌ها، شناسه پیام‌ها ثبت و on_done(success) صدا زده می‌شود.
+    """
     post_id = post_data.get('id')
     translation = post_data['translations'][0]
     title = translation.get('title_translated')
@@ -68,7 +87,7 @@ def send_initial_approval_request(bot_instance, post_data):
     text = (f"📰 **پست جدید برای بازبینی**\n\n"
             f"**شناسه:** `{post_id}`\n"
             f"**امتیاز کیفیت:** {score:.1f}/10\n\n"
-            f"**عنوان:** {title}")
+            f"**عنوان:** {escape_markdown(title or '', version=1)}")
 
     keyboard = [
         [InlineKeyboardButton("✅ تأیید کل (همه پلتفرم‌ها)", callback_data=f"process_all_{post_id}")],
@@ -81,63 +100,69 @@ def send_initial_approval_request(bot_instance, post_data):
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    sent_messages_info = {}
-    success = False
-    for chat_id in TELEGRAM_ADMIN_CHAT_IDS:
-        if not chat_id:
-            continue
-        try:
-            sent_message = None
-            if featured_image_url:
-                sent_message = bot_instance.send_photo(chat_id=chat_id, photo=featured_image_url,
-                                                     caption=text, parse_mode="Markdown", reply_markup=reply_markup)
-            else:
-                sent_message = bot_instance.send_message(chat_id=chat_id, text=text,
-                                                      parse_mode="Markdown", reply_markup=reply_markup)
+    send_admin_messages(post_id, text, featured_image_url, reply_markup, on_done)
+
+def send_admin_messages(post_id, text, featured_image_url, reply_markup, on_done=None):
+    """
+    یک پیام تکی درباره پست را برای همه مدیران می‌فرستد، شناسه پیام‌ها را در management-api ثبت
+    و پست را pending_approval می‌کند؛ سپس on_done(success) صدا زده می‌شود.
+    """
+    def make_call(chat_id):
+        if featured_image_url:
+            return lambda b: b.send_photo(chat_id=chat_id, photo=featured_image_url,
+                                          caption=text, parse_mode="Markdown", reply_markup=reply_markup)
+        return lambda b: b.send_message(chat_id=chat_id, text=text,
+                                        parse_mode="Markdown", reply_markup=reply_markup)
+
+    def finish(results):
+        sent_messages_info = {}
+        for chat_id, result in results.items():
+            if isinstance(result, Exception):
+                logger.error(f"Failed to send message for post_id {post_id} to chat_id {chat_id}. Error: {result}")
+                continue
+            sent_messages_info[str(result.chat_id)] = result.message_id
+            logger.info(f"Sent message for post_id {post_id} to chat_id {chat_id}.")
+
+        success = bool(sent_messages_info)
+        if success:
+            # دیکشنری اطلاعات پیام‌ها در فیلد admin_messages ارسال می‌شود
+            try:
+                management_api.set_admin_messages(post_id, sent_messages_info).raise_for_status()
+                mark_as_pending_approval(post_id)
+            except requests.exceptions.RequestException as e:
+                logger.error(f"Could not save admin message info for post_id {post_id}. Error: {e}")
+        if on_done:
+            on_done(success)
 
-            sent_messages_info[str(sent_message.chat_id)] = sent_message.message_id
-            logger.info(f"Sent post_id {post_id} for initial approval to chat_id {chat_id}.")
-            success = True
+    sender.fan_out(TELEGRAM_ADMIN_CHAT_IDS, make_call, finish)
 
-        except Exception as e:
-            logger.error(f"Failed to send initial request for post_id {post_id} to chat_id {chat_id}. Error: {e}")
-
-    if success:
-        # --- START: این بخش کلیدی اصلاح شده است ---
-        # ما دیکشنری اطلاعات پیام‌ها را مستقیماً در فیلد admin_messages ارسال می‌کنیم
-        # تا با اسکیمای جدید management-api هماهنگ باشد.
-        info_payload = {"admin_messages": sent_messages_info}
-        # --- END: بخش اصلاح شده ---
-        requests.post(f"{MANAGEMENT_API_URL}/posts/{post_id}/admin-message-info", json=info_payload).raise_for_status()
-        mark_as_pending_approval(post_id)
-        
-    return success
-
-def update_message_for_final_approval(bot_instance, post_data):
-    """پیام همه مدیران را با محتوای پردازش شده آپدیت می‌کند."""
+def update_message_for_final_approval(post_data, on_done=None):
+    """پیام همه مدیران را به‌صورت موازی و از طریق صف ارسال با محتوای پردازش شده آپدیت می‌کند."""
     post_id = post_data.get('id')
     admin_messages_str = post_data.get('admin_message_id')
-    
-    if not admin_messages_str:
-        logger.warning(f"No admin message info found for post_id: {post_id}. Cannot update.")
-        return
 
-    try:
-        admin_messages = json.loads(admin_messages_str)
-    except json.JSONDecodeError:
-        logger.error(f"Could not decode admin_messages JSON for post_id: {post_id}")
-        return
+    admin_messages = None
+    if admin_messages_str:
+        try:
+            admin_messages = json.loads(admin_messages_str)
+        except json.JSONDecodeError:
+            logger.error(f"Could not decode admin_messages JSON for post_id: {post_id}")
+            if on_done:
+                on_done(False)
+            return
 
     translation = post_data['translations'][0]
 
     base_text = (f"📰 **پست آماده برای تأیید نهایی**\n\n"
                  f"**شناسه:** `{post_id}`\n"
                  f"**امتیاز کیفیت:** {translation.get('score', 0):.1f}/10\n\n"
-                 f"**عنوان:** {translation.get('title_translated')}")
+                 f"**عنوان:** {escape_markdown(translation.get('title_translated') or '', version=1)}")
 
     summary_text = ""
     if translation.get('content_telegram'):
-        summary_text += f"\n\n📝 **خلاصه تلگرام:**\n_{translation.get('content_telegram')}_"
+        # مثل پیام بازبینی، متن آزاد escape می‌شود تا یک _ یا * ویرایش پیام (و دکمه‌های تایید) را از کار نیندازد
+        summary_text += (f"\n\n📝 **خلاصه تلگرام:**\n"
+                         f"_{escape_markdown(translation.get('content_telegram'), version=1)}_")
     
     updated_text = base_text + summary_text
 
@@ -157,54 +182,121 @@ def update_message_for_final_approval(bot_instance, post_data):
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
     
-    for chat_id, message_id in admin_messages.items():
-        try:
-            if post_data.get('translations')[0].get('featured_image_url'):
-                bot_instance.edit_message_caption(chat_id=chat_id, message_id=message_id,
-                                                caption=updated_text, parse_mode="Markdown", reply_markup=reply_markup)
-            else:
-                bot_instance.edit_message_text(text=updated_text, chat_id=chat_id, message_id=message_id,
+    if not admin_messages:
+        # پستی که در digest بازبینی شده پیام تکی ندارد؛ پیام تایید نهایی به‌صورت پیام جدید ارسال می‌شود
+        logger.info(f"No admin message info found for post_id: {post_id}. Sending a new final approval message.")
+        send_admin_messages(post_id, updated_text, translation.get('featured_image_url'), reply_markup, on_done)
+        return
+
+    has_image = bool(translation.get('featured_image_url'))
+
+    def make_call(chat_id):
+        message_id = admin_messages[chat_id]
+        if has_image:
+            return lambda b: b.edit_message_caption(chat_id=chat_id, message_id=message_id, caption=updated_text,
+                                                    parse_mode="Markdown", reply_markup=reply_markup)
+        return lambda b: b.edit_message_text(text=updated_text, chat_id=chat_id, message_id=message_id,
                                              parse_mode="Markdown", reply_markup=reply_markup)
-        except telegram_error.BadRequest as e:
-            if "message is not modified" in str(e):
+
+    def finish(results):
+        for chat_id, result in results.items():
+            if isinstance(result, telegram_error.BadRequest) and "message is not modified" in str(result):
                 logger.warning(f"Message for post {post_id} in chat {chat_id} was already updated. Skipping.")
-            else:
-                logger.error(f"Failed to update message for post {post_id} in chat {chat_id}. Error: {e}")
-        except Exception as e:
-            logger.error(f"An unexpected error occurred while updating message in chat {chat_id} for post {post_id}: {e}")
+            elif isinstance(result, Exception):
+                logger.error(f"Failed to update message for post {post_id} in chat {chat_id}. Error: {result}")
+        logger.info(f"Finished updating messages for final approval for post_id: {post_id}")
+        mark_as_pending_approval(post_id)
+        if on_done:
+            on_done(True)
 
-    logger.info(f"Finished updating messages for final approval for post_id: {post_id}")
-    mark_as_pending_approval(post_id)
+    sender.fan_out(admin_messages.keys(), make_call, finish)
 
 # --- RabbitMQ Listeners (با منطق جدید و مقاوم) ---
+def post_details_for_event(event: events.PostEvent, *required_fields):
+    """اگر رویداد همه فیلدهای لازم را داشته باشد از خود آن، وگرنه از management-api جزئیات پست را برمی‌گرداند."""
+    if event.has(*required_fields):
+        return event.as_post_details()
+    return get_post_details(event.post_id)
+
+def ack_when_done(ch, method):
+    """
+    پیام RabbitMQ پس از پایان ارسال به همه چت‌ها (روی thread صف ارسال) ack می‌شود؛
+    ch یک ThreadSafeChannel است و ack را به thread اتصال منتقل می‌کند.
+    """
+    return lambda *_: ch.basic_ack(delivery_tag=method.delivery_tag)
+
+def ack_or_retry(ch, method, properties, body, queue_name: str):
+    """
+    مثل ack_when_done، ولی اگر پیام به هیچ مدیری نرسید، اعلان با تأخیر نمایی دوباره در صف قرار می‌گیرد
+    تا پست بدون پیام بازبینی گم نشود. اگر زمان‌بندی مجدد ممکن نباشد، nack با requeue می‌شود.
+    """
+    def on_done(success):
+        if success:
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        try:
+            schedule_retry(queue_name, body, properties)
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+        except Exception as e:
+            logger.error(f"Could not schedule a delayed retry for queue '{queue_name}': {e}")
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+    return on_done
+
 def on_review_notification(ch, method, properties, body):
-    message = json.loads(body)
-    post_id = message.get("post_id")
+    event = events.parse_post_event(body)
+    post_id = event.post_id
     logger.info(f"Received review notification for post_id: {post_id}")
-    post_details = get_post_details(post_id)
-    if post_details:
-        send_initial_approval_request(bot, post_details)
-    ch.basic_ack(delivery_tag=method.delivery_tag)
+    post_details = post_details_for_event(event, "title_translated", "score")
+    if not post_details:
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        return
+    on_done = ack_or_retry(ch, method, properties, body, REVIEW_QUEUE)
+    if review_digest:
+        review_digest.add(post_details, on_sent=digest_entry_sent(post_details, on_done))
+        return
+    send_initial_approval_request(post_details, on_done=on_done)
+
+def digest_entry_sent(post_details, on_done):
+    """
+    پس از ارسال صفحه digest، پست pending_approval و پیام صف ack می‌شود. اگر صفحه به هیچ مدیری نرسید،
+    پست با پیام تکی فرستاده می‌شود و on_done نتیجه همان را تعیین می‌کند.
+    """
+    post_id = post_details.get('id')
+
+    def on_sent(success):
+        if success:
+            mark_as_pending_approval(post_id)
+            on_done(True)
+            return
+        logger.warning(f"Digest page for post_id {post_id} was not delivered; sending it as a single message.")
+        send_initial_approval_request(post_details, on_done=on_done)
+    return on_sent
 
 def on_final_approval_notification(ch, method, properties, body):
-    message = json.loads(body)
-    post_id = message.get("post_id")
+    event = events.parse_post_event(body)
+    post_id = event.post_id
     logger.info(f"Received final approval notification for post_id: {post_id}")
-    post_details = get_post_details(post_id)
-    if post_details:
-        update_message_for_final_approval(bot, post_details)
-    ch.basic_ack(delivery_tag=method.delivery_tag)
+    post_details = post_details_for_event(event, "title_translated", "score")
+    if not post_details:
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        return
+    update_message_for_final_approval(post_details, on_done=ack_when_done(ch, method))
 
 def on_post_rejected(ch, method, properties, body):
     try:
-        message = json.loads(body)
-        post_id = message.get("post_id")
-        admin_messages_str = message.get("admin_message_id")
+        event = events.parse_post_event(body)
+        post_id = event.post_id
+        admin_messages_str = event.get("admin_message_id")
         
-        if not all([post_id, admin_messages_str]):
+        if not post_id:
             logger.warning("Received invalid 'post_rejected' message. Acking.")
             ch.basic_ack(delivery_tag=method.delivery_tag)
             return
+        if not admin_messages_str:
+            # پست در digest بازبینی شده و پیام تکی ندارد؛ صفحه digest هنگام کلیک به‌روز شده است
+            logger.info(f"No admin messages to delete for rejected post_id: {post_id}.")
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+            return
 
         try:
             admin_messages = json.loads(admin_messages_str)
@@ -214,35 +306,39 @@ def on_post_rejected(ch, method, properties, body):
             return
 
         logger.info(f"Received 'post_rejected' event for post_id: {post_id}. Deleting messages...")
-        for chat_id, message_id in admin_messages.items():
-            try:
-                bot.delete_message(chat_id=int(chat_id), message_id=int(message_id))
-            except Exception as e:
-                logger.error(f"Failed to delete message for post_id: {post_id} in chat_id: {chat_id}. Error: {e}")
-        
-        logger.info(f"Successfully processed 'post_rejected' for post_id: {post_id}")
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+
+        def finish(results):
+            for chat_id, result in results.items():
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to delete message for post_id: {post_id} in chat_id: {chat_id}. Error: {result}")
+            logger.info(f"Successfully processed 'post_rejected' for post_id: {post_id}")
+            ch.basic_ack(delivery_tag=method.delivery_tag)
+
+        sender.fan_out(
+            admin_messages.keys(),
+            lambda chat_id: lambda b: b.delete_message(chat_id=int(chat_id), message_id=int(admin_messages[chat_id])),
+            finish,
+        )
     except Exception as e:
         logger.error(f"Failed to process 'post_rejected' message: {e}", exc_info=True)
         ch.basic_nack(delivery_tag=method.delivery_tag)
 
 def start_rabbitmq_listeners():
-    def listen(queue_name, callback_func):
-        # --- START: منطق جدید تلاش مجدد ---
-        while True:
-            try:
-                with RabbitMQClient() as rmq:
-                    rmq.channel.queue_declare(queue=queue_name, durable=True)
-                    logger.info(f"Successfully connected. Listening on queue '{queue_name}'...")
-                    rmq.start_consuming(queue_name=queue_name, callback=callback_func)
-            except Exception as e:
-                logger.error(f"Could not connect to RabbitMQ for queue '{queue_name}'. Retrying in 10 seconds... Error: {e}")
-                time.sleep(10)
-        # --- END: منطق جدید تلاش مجدد ---
-
-    threading.Thread(target=listen, args=(REVIEW_QUEUE, on_review_notification), daemon=True).start()
-    threading.Thread(target=listen, args=(FINAL_APPROVAL_QUEUE, on_final_approval_notification), daemon=True).start()
-    threading.Thread(target=listen, args=(REJECTED_QUEUE, on_post_rejected), daemon=True).start()
+    """
+    هر سه صف روی یک اتصال مصرف می‌شوند. callbackها فقط کار ارسال را در صف می‌گذارند، پس با prefetch
+    بالاتر چند اعلان همزمان در جریان است و کندی یا flood control تلگرام مصرف صف را متوقف نمی‌کند.
+    """
+    sender.start()
+    runtime = ConsumerRuntime(reconnect_delay=10)
+    if review_digest:
+        # پیام‌های یک digest تا ارسال آن ack نمی‌شوند، پس prefetch باید به اندازه کل digest باشد
+        review_digest.start()
+        runtime.add_queue(REVIEW_QUEUE, on_review_notification, prefetch_count=REVIEW_DIGEST_MAX_POSTS, workers=2)
+    else:
+        runtime.add_queue(REVIEW_QUEUE, on_review_notification, prefetch_count=NOTIFICATION_PREFETCH, workers=2)
+    runtime.add_queue(FINAL_APPROVAL_QUEUE, on_final_approval_notification, prefetch_count=NOTIFICATION_PREFETCH, workers=2)
+    runtime.add_queue(REJECTED_QUEUE, on_post_rejected, prefetch_count=NOTIFICATION_PREFETCH)
+    threading.Thread(target=runtime.run, name="rabbitmq-consumers", daemon=True).start()
 
 # --- Telegram Callback Handler (بدون تغییر) ---
 # FILE: ./services/telegram-manager/app/main.py
@@ -251,11 +347,31 @@ def start_rabbitmq_listeners():
 # FILE: ./services/telegram-manager/app/main.py
 
 # --- Telegram Callback Handler (نسخه اصلاح شده) ---
+def answer_click(query, text: str = None):
+    """به callback query پاسخ می‌دهد؛ خطای پاسخ تکراری یا منقضی‌شده نادیده گرفته می‌شود."""
+    try:
+        query.answer(text=text, show_alert=bool(text))
+    except telegram_error.TelegramError as e:
+        logger.debug(f"Could not answer callback query: {e}")
+
+def is_stale_click(query, response, action: str, post_id: int) -> bool:
+    """
+    کلیک روی پستی که وضعیتش اجازه این کار را نمی‌دهد (مثلاً رد یا تایید شده) در management-api با 409 رد
+    می‌شود؛ در این حالت دلیل به صورت هشدار کوتاه به همان مدیر نشان داده می‌شود. در غیر این صورت
+    فقط به کلیک پاسخ داده می‌شود.
+    """
+    if response.status_code != 409:
+        answer_click(query)
+        return False
+    logger.info(f"Rejected '{action}' click for post {post_id}: {response.text}")
+    answer_click(query, f"⚠️ این کار برای پست {post_id} انجام نشد؛ وضعیت پست در این فاصله تغییر کرده است.")
+    return True
+
 def button_callback(update, context):
     """تمام کلیک‌های روی دکمه‌ها از طرف مدیر را مدیریت می‌کند."""
     query = update.callback_query
-    query.answer()
-    
+    # پاسخ به کلیک پس از نتیجه management-api داده می‌شود تا رد شدن کلیک به مدیر اعلام شود
+
     parts = query.data.split("_")
     action = "_".join(parts[:-1])
     post_id_str = parts[-1]
@@ -263,9 +379,15 @@ def button_callback(update, context):
 
     if action == "reject":
         try:
-            requests.post(f"{MANAGEMENT_API_URL}/posts/{post_id}/reject").raise_for_status()
-            # پیام به صورت خودکار توسط listener حذف خواهد شد
+            response = management_api.reject_post(post_id)
+            if is_stale_click(query, response, action, post_id):
+                return
+            response.raise_for_status()
+            # پیام تکی به صورت خودکار توسط listener حذف خواهد شد؛ صفحه digest همین‌جا ویرایش می‌شود
+            if review_digest:
+                review_digest.mark_decided(query.message.chat_id, query.message.message_id, post_id, "❌ رد شد")
         except requests.exceptions.RequestException as e:
+            answer_click(query, f"⚠️ خطا در رد کردن پست {post_id}.")
             logger.error(f"Failed to reject post {post_id}. Error: {e}")
 
     elif action.startswith("process"):
@@ -276,7 +398,14 @@ def button_callback(update, context):
             platforms.append(action.replace("process_", ""))
         
         try:
-            requests.post(f"{MANAGEMENT_API_URL}/posts/{post_id}/process-content", json={"platforms": platforms}).raise_for_status()
+            response = management_api.request_content_processing(post_id, platforms)
+            if is_stale_click(query, response, action, post_id):
+                return
+            response.raise_for_status()
+            if review_digest and review_digest.mark_decided(
+                    query.message.chat_id, query.message.message_id, post_id,
+                    f"⏳ در حال پردازش برای: {', '.join(platforms)}"):
+                return
             text = query.message.caption or query.message.text
             
             # --- START: تغییر کلیدی ---
@@ -295,12 +424,16 @@ def button_callback(update, context):
             # --- END: پایان تغییر کلیدی ---
 
         except requests.exceptions.RequestException as e:
+            answer_click(query)
             context.bot.send_message(chat_id=query.message.chat_id, text=f"⚠️ خطا در درخواست پردازش برای پست {post_id}.")
             logger.error(f"Failed to request content processing for post_id {post_id}. Error: {e}")
 
     elif action == "final_approve":
         try:
-            requests.post(f"{MANAGEMENT_API_URL}/posts/{post_id}/approve").raise_for_status()
+            response = management_api.approve_post(post_id)
+            if is_stale_click(query, response, action, post_id):
+                return
+            response.raise_for_status()
             text = query.message.caption or query.message.text
             # پس از تایید نهایی، کیبورد را حذف می‌کنیم
             query.edit_message_reply_markup(reply_markup=None)
@@ -309,15 +442,33 @@ def button_callback(update, context):
             else:
                 query.edit_message_text(text=f"{text}\n\n✅ *تأیید نهایی شد. در صف انتشار قرار گرفت.*")
         except requests.exceptions.RequestException as e:
+            answer_click(query)
             context.bot.send_message(chat_id=query.message.chat_id, text=f"⚠️ خطا در تأیید نهایی پست {post_id}.")
             logger.error(f"Failed to final approve post {post_id}. Error: {e}")
 
-# --- FastAPI Webhook Endpoint (بدون تغییر) ---
+def process_update(update_data: dict):
+    """یک آپدیت را روی thread کاری webhook از dispatcher عبور می‌دهد."""
+    dispatcher.process_update(Update.de_json(update_data, bot))
+
+recent_updates = RecentUpdateIds()
+update_workers = UpdateWorkerPool(process_update)
+
+# --- FastAPI Webhook Endpoint ---
 @app.post("/telegram-webhook")
 async def handle_telegram_updates(request: Request):
+    """
+    آپدیت بلافاصله تایید و در پس‌زمینه پردازش می‌شود. آپدیت تکراری (ارسال مجدد webhook با همان
+    update_id) نادیده گرفته می‌شود؛ اگر صف کارها پر باشد 503 برمی‌گردد تا تلگرام بعداً دوباره بفرستد.
+    """
     update_data = await request.json()
-    update = Update.de_json(update_data, bot)
-    dispatcher.process_update(update)
+    update_id = update_data.get("update_id")
+    if not recent_updates.add(update_id):
+        logger.info(f"Ignoring duplicate Telegram update {update_id}.")
+        return Response(status_code=200)
+    if not update_workers.submit(update_data):
+        recent_updates.discard(update_id)
+        logger.warning(f"Webhook worker pool is full; rejecting update {update_id} for Telegram to retry.")
+        return Response(status_code=503)
     return Response(status_code=200)
 
 @app.get("/healthz")
@@ -343,3 +494,7 @@ async def startup_event():
 
     dispatcher.add_handler(CallbackQueryHandler(button_callback))
     start_rabbitmq_listeners()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    update_workers.shutdown()
@@ -0,0 +1,171 @@
+# FILE: ./services/telegram-manager/app/sender.py
+# صف ارسال پیام‌های خروجی تلگرام: ارسال موازی به چند چت با رعایت محدودیت نرخ تلگرام
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, Optional
+
+from telegram import error as telegram_error
+
+logger = logging.getLogger(__name__)
+
+# تلگرام حدود ۳۰ پیام در ثانیه برای کل ربات و حدود یک پیام در ثانیه برای هر چت را مجاز می‌داند
+TELEGRAM_GLOBAL_RPS = float(os.getenv("TELEGRAM_GLOBAL_RPS", 30))
+TELEGRAM_PER_CHAT_RPS = float(os.getenv("TELEGRAM_PER_CHAT_RPS", 1))
+TELEGRAM_SENDER_WORKERS = int(os.getenv("TELEGRAM_SENDER_WORKERS", 8))
+TELEGRAM_SEND_MAX_ATTEMPTS = int(os.getenv("TELEGRAM_SEND_MAX_ATTEMPTS", 5))
+TELEGRAM_RETRY_BASE_DELAY = float(os.getenv("TELEGRAM_RETRY_BASE_DELAY", 1.0))
+
+
+class _Job:
+    def __init__(self, chat_id: str, call: Callable, fan_out: "_FanOut"):
+        self.chat_id = chat_id
+        self.call = call
+        self.fan_out = fan_out
+        self.attempts = 0
+
+
+class _FanOut:
+    """نتیجه ارسال به همه چت‌های یک درخواست را جمع می‌کند و پس از آخرین چت، on_complete را صدا می‌زند."""
+
+    def __init__(self, chat_ids, on_complete: Optional[Callable[[Dict[str, object]], None]]):
+        self.pending = len(chat_ids)
+        self.results: Dict[str, object] = {}
+        self.on_complete = on_complete
+        self._lock = threading.Lock()
+
+    def finish(self, chat_id: str, result):
+        with self._lock:
+            self.results[chat_id] = result
+            self.pending -= 1
+            done = self.pending == 0
+        if done and self.on_complete:
+            try:
+                self.on_complete(self.results)
+            except Exception as e:
+                logger.error(f"Telegram fan-out completion callback failed: {e}", exc_info=True)
+
+
+class TelegramSender:
+    """
+    صف زمان‌بندی‌شده ارسال به تلگرام با چند worker.
+
+    هر فراخوانی `fan_out` برای هر چت یک کار در صف می‌گذارد و بلافاصله برمی‌گردد؛ workerها کارها را
+    به‌صورت موازی اجرا می‌کنند. فاصله بین دو ارسال به یک چت حداقل 1/TELEGRAM_PER_CHAT_RPS ثانیه و نرخ کل
+    حداکثر TELEGRAM_GLOBAL_RPS است. خطای RetryAfter همان چت را به اندازه retry_after متوقف و کار را دوباره
+    زمان‌بندی می‌کند؛ خطاهای شبکه با backoff نمایی تا TELEGRAM_SEND_MAX_ATTEMPTS بار تکرار می‌شوند.
+    نتیجه هر چت (پیام بازگشتی یا Exception) پس از پایان همه چت‌ها به on_complete داده می‌شود؛
+    on_complete روی thread همین worker اجرا می‌شود.
+    """
+
+    def __init__(self, bot, workers: int = TELEGRAM_SENDER_WORKERS,
+                 global_rps: float = TELEGRAM_GLOBAL_RPS, per_chat_rps: float = TELEGRAM_PER_CHAT_RPS):
+        self.bot = bot
+        self.workers = workers
+        self.global_interval = 1.0 / global_rps
+        self.per_chat_interval = 1.0 / per_chat_rps
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._chat_next_at: Dict[str, float] = {}
+        self._global_next_at = 0.0
+        self._threads = []
+
+    def start(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"telegram-sender-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Telegram sender started with {self.workers} workers.")
+
+    def fan_out(self, chat_ids: Iterable[str], make_call: Callable[[str], Callable],
+                on_complete: Optional[Callable[[Dict[str, object]], None]] = None):
+        """
+        برای هر chat_id کار `make_call(chat_id)` را در صف می‌گذارد؛ کار یک تابع است که bot را می‌گیرد.
+        اگر هیچ چتی نباشد on_complete بلافاصله با نتیجه خالی صدا زده می‌شود.
+        """
+        chat_ids = [str(chat_id) for chat_id in chat_ids if chat_id]
+        if not chat_ids:
+            if on_complete:
+                on_complete({})
+            return
+        fan_out = _FanOut(chat_ids, on_complete)
+        now = time.monotonic()
+        with self._cond:
+            for chat_id in chat_ids:
+                self._push(now, _Job(chat_id, make_call(chat_id), fan_out))
+            self._cond.notify_all()
+
+    def _push(self, ready_at: float, job: _Job):
+        heapq.heappush(self._heap, (ready_at, next(self._seq), job))
+
+    def _next_job(self) -> _Job:
+        """کار بعدی را وقتی هم زمانش رسیده و هم محدودیت چت و نرخ کل اجازه می‌دهد برمی‌دارد."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                ready_at, _, job = self._heap[0]
+                if ready_at > now:
+                    self._cond.wait(ready_at - now)
+                    continue
+                heapq.heappop(self._heap)
+                chat_ready_at = self._chat_next_at.get(job.chat_id, 0.0)
+                if chat_ready_at > now:
+                    # این چت هنوز مجاز نیست؛ کار به زمان آزاد شدن چت منتقل می‌شود و بقیه صف جلو می‌رود
+                    self._push(chat_ready_at, job)
+                    continue
+                if self._global_next_at > now:
+                    self._push(self._global_next_at, job)
+                    continue
+                self._chat_next_at[job.chat_id] = now + self.per_chat_interval
+                self._global_next_at = now + self.global_interval
+                return job
+
+    def _reschedule(self, job: _Job, delay: float, pause_chat: bool = False):
+        ready_at = time.monotonic() + delay
+        with self._cond:
+            if pause_chat:
+                self._chat_next_at[job.chat_id] = max(self._chat_next_at.get(job.chat_id, 0.0), ready_at)
+            self._push(ready_at, job)
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            job.attempts += 1
+            try:
+                result = job.call(self.bot)
+            except telegram_error.RetryAfter as e:
+                if job.attempts >= TELEGRAM_SEND_MAX_ATTEMPTS:
+                    logger.error(f"Giving up on chat {job.chat_id} after {job.attempts} flood-control retries.")
+                    job.fan_out.finish(job.chat_id, e)
+                    continue
+                logger.warning(f"Flood control for chat {job.chat_id}; retrying in {e.retry_after} seconds.")
+                self._reschedule(job, float(e.retry_after), pause_chat=True)
+                continue
+            except telegram_error.BadRequest as e:
+                # درخواست نامعتبر با تکرار درست نمی‌شود
+                job.fan_out.finish(job.chat_id, e)
+                continue
+            except (telegram_error.TimedOut, telegram_error.NetworkError) as e:
+                if job.attempts >= TELEGRAM_SEND_MAX_ATTEMPTS:
+                    logger.error(f"Giving up on chat {job.chat_id} after {job.attempts} attempts. Error: {e}")
+                    job.fan_out.finish(job.chat_id, e)
+                    continue
+                delay = TELEGRAM_RETRY_BASE_DELAY * 2 ** (job.attempts - 1)
+                logger.warning(f"Telegram request for chat {job.chat_id} failed; retrying in {delay:.1f} seconds. Error: {e}")
+                self._reschedule(job, delay)
+                continue
+            except Exception as e:
+                job.fan_out.finish(job.chat_id, e)
+                continue
+            job.fan_out.finish(job.chat_id, result)
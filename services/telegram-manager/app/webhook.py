@@ -0,0 +1,77 @@
+# FILE: ./services/telegram-manager/app/webhook.py
+# پردازش پس‌زمینه آپدیت‌های webhook تلگرام: صف محدود و حذف آپدیت‌های تکراری
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 8))
+# حداکثر آپدیت‌های در حال اجرا و منتظر؛ بیشتر از این با 503 رد می‌شود تا تلگرام بعداً دوباره بفرستد
+WEBHOOK_MAX_PENDING = int(os.getenv("WEBHOOK_MAX_PENDING", 100))
+WEBHOOK_DEDUP_SIZE = int(os.getenv("WEBHOOK_DEDUP_SIZE", 2048))
+
+
+class RecentUpdateIds:
+    """مجموعه LRU از update_idهای اخیر؛ تلگرام در صورت تاخیر پاسخ webhook همان آپدیت را دوباره می‌فرستد."""
+
+    def __init__(self, max_size: int = WEBHOOK_DEDUP_SIZE):
+        self.max_size = max_size
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, update_id: Optional[int]) -> bool:
+        """True اگر update_id جدید باشد؛ آپدیت بدون شناسه همیشه جدید حساب می‌شود."""
+        if update_id is None:
+            return True
+        with self._lock:
+            if update_id in self._ids:
+                self._ids.move_to_end(update_id)
+                return False
+            self._ids[update_id] = None
+            if len(self._ids) > self.max_size:
+                self._ids.popitem(last=False)
+            return True
+
+    def discard(self, update_id: Optional[int]):
+        with self._lock:
+            self._ids.pop(update_id, None)
+
+
+class UpdateWorkerPool:
+    """
+    آپدیت‌ها را روی یک thread pool با ظرفیت محدود اجرا می‌کند تا درخواست webhook بلافاصله پاسخ بگیرد
+    و فراخوانی‌های همگام (requests و Bot) حلقه رویداد FastAPI را مسدود نکنند.
+    """
+
+    def __init__(self, handler: Callable[[dict], None], workers: int = WEBHOOK_WORKERS,
+                 max_pending: int = WEBHOOK_MAX_PENDING):
+        self.handler = handler
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="webhook")
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, update_data: dict) -> bool:
+        """آپدیت را در صف می‌گذارد؛ اگر صف پر باشد False برمی‌گرداند."""
+        if not self._slots.acquire(blocking=False):
+            return False
+        try:
+            self._executor.submit(self._run, update_data)
+        except RuntimeError:
+            self._slots.release()
+            return False
+        return True
+
+    def _run(self, update_data: dict):
+        try:
+            self.handler(update_data)
+        except Exception as e:
+            logger.error(f"Failed to process Telegram update {update_data.get('update_id')}: {e}", exc_info=True)
+        finally:
+            self._slots.release()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)